@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import WebhookDelivery
 
-# Register your models here.
+
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'status', 'attempts', 'received_at', 'next_attempt_at', 'processed_at')
+    list_filter = ('status',)
+
+
+admin.site.register(WebhookDelivery, WebhookDeliveryAdmin)
@@ -0,0 +1,157 @@
+import hashlib
+from datetime import datetime, timedelta
+from django.utils import timezone
+from django.db import transaction, IntegrityError
+from django.contrib.auth.models import User
+from apps.api.models import WebhookDelivery
+from apps.home.models import Meeting, Task
+from apps.home.search import index_many
+
+
+# Meeting webhook inbox: the view only validates and stores the payload (see accept), the meeting is created by
+# a worker (see process). Deliveries are keyed, so provider retries of the same meeting are no-ops.
+
+REQUIRED_FIELDS = ('title', 'start_time', 'end_time', 'owner', 'participants', 'summary', 'topics', 'key_questions',
+                   'action_items', 'report_url')
+INTERNAL_DOMAIN = '@infinitefoundry.com'
+MAX_ATTEMPTS = 6
+RETRY_DELAY = 30  # seconds, doubled after each failure
+STALE_AFTER = timedelta(minutes=30)
+
+
+class InvalidPayload(Exception):
+    pass
+
+
+def delivery_key(payload, body):
+    meeting_id = payload.get('session_id') or payload.get('id')
+    if meeting_id:
+        return f'meeting:{meeting_id}'[:100]
+
+    return f'sha256:{hashlib.sha256(body).hexdigest()}'
+
+
+def accept(payload, body):
+    missing = [field for field in REQUIRED_FIELDS if field not in payload]
+    if missing:
+        raise InvalidPayload(f'Missing fields: {", ".join(missing)}')
+
+    key = delivery_key(payload, body)
+    try:
+        with transaction.atomic():
+            return WebhookDelivery.objects.get_or_create(key=key, defaults={'payload': payload})
+    except IntegrityError:
+        # The same delivery arrived concurrently
+        return WebhookDelivery.objects.get(key=key), False
+
+
+def parse_time(value):
+    for date_format in ('%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%dT%H:%M:%S.%f%z'):
+        try:
+            return datetime.strptime(value, date_format)
+        except (TypeError, ValueError):
+            pass
+
+    return None
+
+
+def create_meeting(payload):
+    start, end = parse_time(payload['start_time']), parse_time(payload['end_time'])
+    if start is None or end is None:
+        start, end = None, None
+
+    participants = payload.get('participants') or []
+    owner_email = (payload.get('owner') or {}).get('email')
+
+    collaborators = [
+        collaborator['email'] for collaborator in participants if
+        str(collaborator.get('email')).endswith(INTERNAL_DOMAIN)
+    ]
+
+    external = [
+        collaborator['email'] for collaborator in participants if not
+        str(collaborator.get('email')).endswith(INTERNAL_DOMAIN) and collaborator.get('email') is not None
+    ]
+
+    invited = [
+        collaborator.get('name') for collaborator in participants if
+        collaborator.get('email') is None
+    ]
+
+    # Owner and participants in one query
+    users = {user.username: user for user in User.objects.filter(username__in=[owner_email, *collaborators])}
+    owner = users.get(owner_email)
+
+    meeting = Meeting.objects.create(
+        title=payload['title'],
+        start=start,
+        end=end,
+        owner=owner,
+        external_owner='' if owner else owner_email or '',
+        external_participants=external,
+        invited_participants=invited,
+        summary=payload['summary'],
+        topics=payload['topics'],
+        questions=payload['key_questions'],
+        url=payload['report_url'],
+    )
+
+    meeting.participants.set([users[email] for email in collaborators if email in users])
+
+    # Meeting tasks have no project, so there are no counters to maintain; only the search index needs them
+    tasks = Task.objects.bulk_create([
+        Task(meeting=meeting, title=task['text'], created_by=None) for task in payload['action_items']
+    ])
+    index_many(tasks)
+
+    return meeting
+
+
+def process(delivery_id):
+    with transaction.atomic():
+        delivery = WebhookDelivery.objects.select_for_update().filter(pk=delivery_id).first()
+        if delivery is None or delivery.status == 'done':
+            return None
+
+        delivery.meeting = create_meeting(delivery.payload)
+        delivery.status = 'done'
+        delivery.error = ''
+        delivery.attempts += 1
+        delivery.processed_at = timezone.now()
+        delivery.save()
+
+    return delivery.meeting
+
+
+def record_failure(delivery_id, error):
+    # Returns the delay before the next attempt (30s, 1min, 2min, 4min...), None once the delivery gave up
+    with transaction.atomic():
+        delivery = WebhookDelivery.objects.select_for_update().filter(pk=delivery_id, status='pending').first()
+        if delivery is None:
+            return None
+
+        delivery.attempts += 1
+        delivery.error = str(error)
+        delay = None
+        if delivery.attempts >= MAX_ATTEMPTS:
+            delivery.status = 'failed'
+        else:
+            delay = RETRY_DELAY * 2 ** (delivery.attempts - 1)
+            delivery.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        delivery.save(update_fields=['attempts', 'error', 'status', 'next_attempt_at'])
+
+    return delay
+
+
+def stale_deliveries():
+    # Pending deliveries whose job was lost (broker down, worker restarted): their attempt was due more than
+    # STALE_AFTER ago. Deliveries waiting out a retry backoff aren't due yet. The returned ones are due again now,
+    # so the next run doesn't dispatch them twice.
+    now = timezone.now()
+    with transaction.atomic():
+        deliveries = list(WebhookDelivery.objects.select_for_update().filter(
+            status='pending', next_attempt_at__lt=now - STALE_AFTER
+        ).values_list('id', flat=True))
+        WebhookDelivery.objects.filter(id__in=deliveries).update(next_attempt_at=now)
+
+    return deliveries
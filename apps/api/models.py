@@ -0,0 +1,29 @@
+from django.db import models
+from django.utils import timezone
+from apps.home.models import Meeting
+
+
+# Raw webhook payloads, stored before processing. The key (the provider's meeting id, or a hash of the payload)
+# is unique, so retried deliveries are acknowledged without being processed twice.
+class WebhookDelivery(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    key = models.CharField(max_length=100, unique=True)
+    payload = models.JSONField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(default='', blank=True)
+    meeting = models.ForeignKey(Meeting, related_name='deliveries', on_delete=models.SET_NULL, null=True, blank=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    # When the current job is due: on arrival, then after each failure's backoff (see apps.api.inbox)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.key} ({self.status})'
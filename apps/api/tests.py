@@ -1,3 +1,103 @@
+import json
+from datetime import timedelta
+from unittest import mock
+from celery.exceptions import Retry
 from django.test import TestCase
+from django.utils import timezone
+from apps.api.inbox import MAX_ATTEMPTS, STALE_AFTER, stale_deliveries
+from apps.api.models import WebhookDelivery
+from apps.home.models import Meeting
+from apps.tasks import process_webhook_celery
 
-# Create your tests here.
+
+PAYLOAD = {
+    'trigger': 'meeting_end',
+    'session_id': 'meeting-1',
+    'title': 'Weekly',
+    'start_time': '2030-01-01T10:00:00Z',
+    'end_time': '2030-01-01T11:00:00Z',
+    'owner': {'name': 'Owner', 'email': 'owner@example.com'},
+    'participants': [{'name': 'Guest', 'email': 'guest@example.com'}, {'name': 'Invited', 'email': None}],
+    'summary': 'Summary',
+    'topics': [],
+    'key_questions': [],
+    'action_items': [{'text': 'Follow up'}],
+    'report_url': 'https://example.com/report',
+}
+
+
+class MeetingWebhookTests(TestCase):
+    # The view stores deliveries in the inbox (apps.api.inbox); meetings are created by process_webhook_celery
+
+    def post(self, payload=PAYLOAD):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/meeting/', json.dumps(payload), content_type='application/json',
+                                    HTTP_HOST='127.0.0.1', HTTP_X_READ_WEBHOOK_NAME='YOUR-WEBHOOK-NAME')
+
+    def test_retried_delivery_creates_one_meeting(self):
+        with mock.patch('apps.api.views.process_webhook_celery') as task:
+            self.assertEqual(self.post().status_code, 202)
+            self.assertEqual(self.post().status_code, 202)
+
+        delivery = WebhookDelivery.objects.get()
+        task.delay.assert_called_once_with(delivery.id)
+
+        process_webhook_celery.apply(args=[delivery.id])
+        process_webhook_celery.apply(args=[delivery.id])
+
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts), ('done', 1))
+        self.assertEqual(Meeting.objects.get(), delivery.meeting)
+        self.assertEqual(delivery.meeting.external_participants, ['guest@example.com'])
+        self.assertEqual(delivery.meeting.tasks.count(), 1)
+
+    def test_invalid_deliveries_are_rejected(self):
+        with mock.patch('apps.api.views.process_webhook_celery') as task:
+            self.assertEqual(self.post({**PAYLOAD, 'trigger': 'meeting_start'}).status_code, 403)
+            self.assertEqual(self.post({'trigger': 'meeting_end'}).status_code, 400)
+
+        task.delay.assert_not_called()
+        self.assertFalse(WebhookDelivery.objects.exists())
+
+    def test_failed_attempts_back_off(self):
+        delivery = WebhookDelivery.objects.create(key='meeting:1', payload=PAYLOAD)
+
+        with mock.patch('apps.api.inbox.create_meeting', side_effect=RuntimeError('down')), \
+                mock.patch.object(process_webhook_celery, 'retry', side_effect=Retry) as retry:
+            for attempt, delay in enumerate([30, 60], start=1):
+                before = timezone.now()
+                process_webhook_celery.apply(args=[delivery.id])
+                after = timezone.now()
+
+                self.assertEqual(retry.call_args.kwargs['countdown'], delay)
+
+                delivery.refresh_from_db()
+                self.assertEqual((delivery.status, delivery.attempts, delivery.error), ('pending', attempt, 'down'))
+                self.assertTrue(before + timedelta(seconds=delay) <= delivery.next_attempt_at
+                                <= after + timedelta(seconds=delay))
+
+        self.assertFalse(Meeting.objects.exists())
+
+    def test_delivery_fails_after_max_attempts(self):
+        delivery = WebhookDelivery.objects.create(key='meeting:1', payload=PAYLOAD)
+
+        # Eager retries run right away, one after the other
+        with mock.patch('apps.api.inbox.create_meeting', side_effect=RuntimeError('down')) as create_meeting:
+            process_webhook_celery.apply(args=[delivery.id])
+
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts), ('failed', MAX_ATTEMPTS))
+        self.assertEqual(create_meeting.call_count, MAX_ATTEMPTS)
+        self.assertEqual(stale_deliveries(), [])
+
+    def test_stale_deliveries_skip_retry_backoff(self):
+        lost = WebhookDelivery.objects.create(key='meeting:1', payload=PAYLOAD,
+                                              next_attempt_at=timezone.now() - STALE_AFTER - timedelta(minutes=1))
+        WebhookDelivery.objects.create(key='meeting:2', payload=PAYLOAD,
+                                       next_attempt_at=timezone.now() + timedelta(minutes=4))
+        WebhookDelivery.objects.create(key='meeting:3', payload=PAYLOAD, status='done',
+                                       next_attempt_at=timezone.now() - STALE_AFTER - timedelta(minutes=1))
+
+        self.assertEqual(stale_deliveries(), [lost.id])
+        # Due again now: the next run does not dispatch it twice
+        self.assertEqual(stale_deliveries(), [])
@@ -1,18 +1,18 @@
-import json
 import pytz
 from decouple import config
-from core.settings import CORE_DIR
 from django.contrib import messages
+from django.db import transaction
 from cryptography.fernet import Fernet
 from datetime import datetime, timedelta
 from .models import AuthEmail, PasswordReset
 from apps.home.models import Profile, Office
+from apps.home.lookups import world
 from django.shortcuts import render, redirect
 from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import User, Permission
 from django.contrib.auth import authenticate, login, logout
 from .forms import LoginForm, SignUpForm, PasswordResetForm
-from apps.tasks import confirm_register_email, reset_password_email, reset_password_confirmation_email
+from apps.tasks import confirm_register_email, reset_password_email, reset_password_confirmation_email, profile_qrcode_celery
 
 
 admin_group = config('ADMIN_USERS', 'admin').split(',')
@@ -76,11 +76,9 @@ staff_permissions_list = [
     'view_session',
 ] + collaborators_permissions_list
 
-admin_permissions = Permission.objects.filter(codename__in=admin_permissions_list)
 
-collaborators_permissions = Permission.objects.filter(codename__in=collaborators_permissions_list)
-
-staff_permissions = Permission.objects.filter(codename__in=staff_permissions_list)
+def group_permissions(codenames):
+    return Permission.objects.filter(codename__in=codenames)
 
 
 def encrypt_tag(key, message):
@@ -230,11 +228,11 @@ def validate_email(request, token):
         auth_object.user.is_active = True
 
         if auth_object.user.username in admin_group:
-            auth_object.user.user_permissions.set(admin_permissions)
+            auth_object.user.user_permissions.set(group_permissions(admin_permissions_list))
         elif auth_object.user.username in staff_group:
-            auth_object.user.user_permissions.set(staff_permissions)
+            auth_object.user.user_permissions.set(group_permissions(staff_permissions_list))
         elif collaborators_key in auth_object.user.username:
-            auth_object.user.user_permissions.set(collaborators_permissions)
+            auth_object.user.user_permissions.set(group_permissions(collaborators_permissions_list))
         else:
             pass
 
@@ -382,7 +380,7 @@ def fill_profile(request):
         profile.save()
 
         if not profile.qrcode:
-            profile.generate_qrcode()
+            transaction.on_commit(lambda: profile_qrcode_celery.delay(profile.id))
 
         return redirect("profile")
 
@@ -393,7 +391,7 @@ def fill_profile(request):
             user_profile = None
 
         context = {
-            "world": json.load(open(f'{CORE_DIR}/apps/static/assets/world.json', 'r', encoding='utf-8')),
+            "world": world(),
             "offices": Office.objects.all(),
             "user": user_profile,
         }
@@ -30,3 +30,8 @@ admin.site.register(Link)
 admin.site.register(Meeting, MeetingAdmin)
 admin.site.register(BankAccount)
 admin.site.register(BillProof)
+admin.site.register(JobWatermark)
+admin.site.register(CashFlowMonth)
+admin.site.register(Favicon)
+admin.site.register(UploadSession)
+admin.site.register(Blob)
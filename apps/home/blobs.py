@@ -0,0 +1,166 @@
+import hashlib
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F
+from django.core.files.storage import default_storage
+from apps.home.models import Blob, UploadedFile, Document
+
+
+# Content-addressed storage for UploadedFile and Document: uploads are hashed before they reach storage and rows
+# with the same bytes share one stored file (Blob), which is only deleted when its last reference goes away.
+# The stored file keeps the path of its first upload, so downloads and existing links are unchanged.
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    size = 0
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+    chunks = file.chunks(HASH_CHUNK_SIZE) if hasattr(file, 'chunks') else iter(lambda: file.read(HASH_CHUNK_SIZE), b'')
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+    return digest.hexdigest(), size
+
+
+def stored_hash(name, storage=default_storage):
+    with storage.open(name, 'rb') as file:
+        return content_hash(file)
+
+
+def reference(blob):
+    Blob.objects.filter(pk=blob.pk).update(references=F('references') + 1)
+    blob.references += 1
+    return blob
+
+
+def adopt(field_file, digest, size):
+    # The file is already in storage: it becomes the blob, or is dropped in favour of the one with the same content
+    blob, created = Blob.objects.get_or_create(sha256=digest, defaults={
+        'name': field_file.name, 'size': size, 'references': 1,
+    })
+
+    if not created:
+        reference(blob)
+        if field_file.name != blob.name:
+            duplicate, storage = field_file.name, field_file.storage
+            transaction.on_commit(lambda: storage.delete(duplicate))
+            field_file.name = blob.name
+
+    return blob
+
+
+def deduplicate(instance, field='file'):
+    field_file = getattr(instance, field)
+    if not field_file or field_file._committed:
+        return
+
+    digest, size = content_hash(field_file.file)
+    blob = Blob.objects.filter(sha256=digest).first()
+
+    if blob:
+        # Metadata only: the upload is never written to storage
+        reference(blob)
+        field_file.name = blob.name
+        field_file._committed = True
+    else:
+        field_file.save(field_file.name, field_file.file, save=False)
+        blob = adopt(field_file, digest, size)
+
+    if instance.pk and instance.blob_id and instance.blob_id != blob.pk:
+        instance._released_blob = instance.blob_id
+
+    instance.blob = blob
+
+
+def release(blob_id):
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return False
+
+        if blob.references > 1:
+            Blob.objects.filter(pk=blob_id).update(references=F('references') - 1)
+            return False
+
+        blob.delete()
+
+    transaction.on_commit(lambda: default_storage.delete(blob.name))
+    return True
+
+
+def release_file(instance, field='file'):
+    if instance.blob_id:
+        return release(instance.blob_id)
+
+    field_file = getattr(instance, field)
+    if field_file:
+        field_file.storage.delete(field_file.name)
+        return True
+
+    return False
+
+
+def audit(apply=False, storage=default_storage):
+    # Hashes the files stored before deduplication, reports what sharing them would reclaim and checks the
+    # reference counts. With apply, legacy rows are adopted into blobs (dropping their copies) and counts are fixed.
+    report = defaultdict(int)
+    legacy = defaultdict(list)
+    counts = defaultdict(int)
+
+    for model in (UploadedFile, Document):
+        for instance in model.objects.exclude(file='').exclude(file__isnull=True).only('id', 'file', 'blob'):
+            report['rows'] += 1
+            if instance.blob_id:
+                counts[instance.blob_id] += 1
+                continue
+
+            try:
+                digest, size = stored_hash(instance.file.name, storage)
+            except (FileNotFoundError, OSError):
+                report['missing'] += 1
+                continue
+
+            legacy[digest].append((instance, size))
+
+    blobs = {blob.sha256: blob for blob in Blob.objects.all()}
+
+    for blob in blobs.values():
+        report['stored'] += blob.size
+        report['shared'] += blob.size * max(counts[blob.pk] - 1, 0)
+        if blob.references != counts[blob.pk]:
+            report['drift'] += 1
+        if not counts[blob.pk]:
+            report['orphans'] += 1
+
+    for digest, copies in legacy.items():
+        size = copies[0][1]
+        distinct = {instance.file.name for instance, _ in copies}
+        report['stored'] += size * len(distinct)
+        report['reclaimable'] += size * (len(distinct) - (0 if digest in blobs else 1))
+
+    if apply:
+        for digest, copies in legacy.items():
+            for instance, size in copies:
+                with transaction.atomic():
+                    blob = adopt(instance.file, digest, size)
+                    counts[blob.pk] += 1
+                    type(instance).objects.filter(pk=instance.pk).update(file=instance.file.name, blob=blob)
+
+        # References are recounted from the rows, which also undoes any drift
+        for blob in Blob.objects.all():
+            if not counts[blob.pk]:
+                blob.delete()
+                storage.delete(blob.name)
+            elif blob.references != counts[blob.pk]:
+                Blob.objects.filter(pk=blob.pk).update(references=counts[blob.pk])
+
+    return report
@@ -0,0 +1,31 @@
+from decimal import Decimal
+from django.db.models import Min, Max
+from apps.home.models import Bill
+from apps.home.pickers import versioned
+
+
+# Bounds of the value range slider on the balance pages: one MIN/MAX aggregate (served by the currency + total
+# index) instead of two sorted queries and two counts. Values are Decimals with two places ('0.00' without bills),
+# the format the slider posts back.
+
+CENTS = Decimal('0.01')
+
+
+def bounds(low, high):
+    return Decimal(low or 0).quantize(CENTS), Decimal(high or 0).quantize(CENTS)
+
+
+def queryset_bounds(bills):
+    values = bills.order_by().aggregate(low=Min('total'), high=Max('total'))
+    return bounds(values['low'], values['high'])
+
+
+def bill_bounds(currency):
+    # All bills, per currency; cached under the 'bills' version, bumped on bill saves and by ledger.flush
+    def build():
+        return {
+            row['total_currency']: bounds(row['low'], row['high'])
+            for row in Bill.objects.order_by().values('total_currency').annotate(low=Min('total'), high=Max('total'))
+        }
+
+    return versioned('bills', 'bounds', build).get(currency) or bounds(0, 0)
@@ -0,0 +1,48 @@
+from decimal import Decimal
+from django.db.models import F, Sum
+from apps.home.models import Project, UploadedFile
+
+
+# Project.budget is the sum of its uploaded files' values, kept up to date with one UPDATE per file change
+# instead of re-aggregating every file of the project on each save.
+
+def amount(value):
+    return getattr(value, 'amount', value) or Decimal(0)
+
+
+def apply_budget_delta(project_id, delta):
+    if project_id and delta:
+        Project.objects.filter(pk=project_id).update(budget=F('budget') + delta)
+
+
+def file_saved(instance, previous):
+    value = amount(instance.value)
+
+    if previous is None:
+        apply_budget_delta(instance.project_id, value)
+    elif previous['project_id'] != instance.project_id:
+        apply_budget_delta(previous['project_id'], -amount(previous['value']))
+        apply_budget_delta(instance.project_id, value)
+    else:
+        apply_budget_delta(instance.project_id, value - amount(previous['value']))
+
+
+def file_deleted(instance):
+    apply_budget_delta(instance.project_id, -amount(instance.value))
+
+
+def reconcile_budgets(fix=False):
+    totals = dict(
+        UploadedFile.objects.filter(project__isnull=False).values('project').annotate(
+            total=Sum('value')).values_list('project', 'total')
+    )
+
+    drifted = 0
+    for project_id, budget in Project.objects.values_list('id', 'budget'):
+        total = amount(totals.get(project_id))
+        if amount(budget) != total:
+            drifted += 1
+            if fix:
+                Project.objects.filter(pk=project_id).update(budget=total)
+
+    return drifted
@@ -0,0 +1,110 @@
+from datetime import date
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from apps.home.models import Bill, BillInstallment, CashFlowMonth, INCOME_CATEGORIES, EXPENSE_CATEGORIES
+
+
+# Paid bills are rolled up by (office, client, kind, currency, month). At sight bills count their partial
+# on the bill paid_at, bills with installments count each installment value on its own paid_at.
+
+KIND_CATEGORIES = {
+    'income': INCOME_CATEGORIES,
+    'expense': EXPENSE_CATEGORIES,
+}
+
+
+def category_kind(category):
+    for kind, categories in KIND_CATEGORIES.items():
+        if category in categories:
+            return kind
+
+    return None
+
+
+def next_month(month):
+    return date(month.year + 1, 1, 1) if month.month == 12 else date(month.year, month.month + 1, 1)
+
+
+def at_sight_rows(bills):
+    return bills.filter(installments_number=0, paid_at__isnull=False).annotate(
+        month=TruncMonth('paid_at')
+    ).values('office_id', 'client_id', 'category', 'partial_currency', 'month').annotate(amount=Sum('partial'))
+
+
+def installment_rows(installments):
+    return installments.filter(bill__installments_number__gt=1, paid_at__isnull=False).annotate(
+        month=TruncMonth('paid_at')
+    ).values(
+        'bill__office_id', 'bill__client_id', 'bill__category', 'value_currency', 'month'
+    ).annotate(amount=Sum('value'))
+
+
+def iter_rows(bills, installments):
+    for row in at_sight_rows(bills):
+        yield (row['office_id'], row['client_id'], category_kind(row['category']),
+               row['partial_currency'], row['month'], row['amount'])
+
+    for row in installment_rows(installments):
+        yield (row['bill__office_id'], row['bill__client_id'], category_kind(row['bill__category']),
+               row['value_currency'], row['month'], row['amount'])
+
+
+def collect(bills, installments):
+    totals = {}
+    for office_id, client_id, kind, currency, month, amount in iter_rows(bills, installments):
+        if kind is None:
+            continue
+
+        key = (office_id, client_id, kind, currency, month)
+        totals[key] = totals.get(key, 0) + (amount or 0)
+
+    return totals
+
+
+def bill_keys(bill_ids):
+    totals = collect(Bill.objects.filter(id__in=bill_ids), BillInstallment.objects.filter(bill__id__in=bill_ids))
+    return set(totals)
+
+
+def installment_keys(installment_ids):
+    totals = collect(Bill.objects.none(), BillInstallment.objects.filter(id__in=installment_ids))
+    return set(totals)
+
+
+def refresh_cash_flow(keys):
+    # Recompute only the touched months from the ledger, so edits, moves and deletes all end up consistent.
+    for office_id, client_id, kind, currency, month in keys:
+        bills = Bill.objects.filter(
+            office_id=office_id, client_id=client_id, category__in=KIND_CATEGORIES[kind],
+            paid_at__gte=month, paid_at__lt=next_month(month), partial_currency=currency
+        )
+        installments = BillInstallment.objects.filter(
+            bill__office_id=office_id, bill__client_id=client_id, bill__category__in=KIND_CATEGORIES[kind],
+            paid_at__gte=month, paid_at__lt=next_month(month), value_currency=currency
+        )
+        total = collect(bills, installments).get((office_id, client_id, kind, currency, month), 0)
+
+        with transaction.atomic():
+            CashFlowMonth.objects.filter(
+                office_id=office_id, client_id=client_id, kind=kind, currency=currency, month=month
+            ).delete()
+            if total:
+                CashFlowMonth.objects.create(
+                    office_id=office_id, client_id=client_id, kind=kind, currency=currency, month=month, total=total
+                )
+
+
+def rebuild_cash_flow():
+    rows = [
+        CashFlowMonth(office_id=office_id, client_id=client_id, kind=kind, currency=currency, month=month, total=total)
+        for (office_id, client_id, kind, currency, month), total in collect(
+            Bill.objects.all(), BillInstallment.objects.all()
+        ).items() if total
+    ]
+
+    with transaction.atomic():
+        CashFlowMonth.objects.all().delete()
+        CashFlowMonth.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
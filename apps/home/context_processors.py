@@ -0,0 +1,7 @@
+from django.utils.functional import SimpleLazyObject
+from apps.home.profiles import request_profile
+
+
+def user_profile(request):
+    # Lazy: pages that don't show the profile don't load it
+    return {'user_profile': SimpleLazyObject(lambda: request_profile(request))}
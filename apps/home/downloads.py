@@ -0,0 +1,109 @@
+import re
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+
+# Downloads are streamed from storage in chunks instead of being read into memory, with single Range requests
+# (resumable downloads) and ETag/Last-Modified revalidation. With PRESIGNED_DOWNLOADS on S3 the browser is
+# redirected to a short-lived signed URL and the file never goes through the web worker.
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def presigned_url(storage, name, filename):
+    if not getattr(settings, 'PRESIGNED_DOWNLOADS', False) or not isinstance(storage, S3Boto3Storage):
+        return None
+
+    return storage.bucket.meta.client.generate_presigned_url('get_object', Params={
+        'Bucket': storage.bucket.name,
+        'Key': storage._normalize_name(clean_name(name)),
+        'ResponseContentDisposition': f'attachment; filename="{filename}"',
+    }, ExpiresIn=getattr(settings, 'PRESIGNED_DOWNLOADS_EXPIRE', 300))
+
+
+def file_validators(storage, name, size):
+    try:
+        modified = storage.get_modified_time(name).timestamp()
+    except (NotImplementedError, AttributeError, OSError):
+        return None, None
+
+    return f'"{size:x}-{int(modified):x}"', int(modified)
+
+
+def parse_range(header, size):
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    start, end = match.groups()
+    if start == '':
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+
+    return (start, end) if start <= end else None
+
+
+def iter_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(DOWNLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def download_response(request, name, storage=default_storage, filename=None):
+    filename = filename or name.split('/')[-1]
+
+    url = presigned_url(storage, name, filename)
+    if url:
+        return HttpResponseRedirect(url)
+
+    size = storage.size(name)
+    etag, last_modified = file_validators(storage, name, size)
+
+    if etag:
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+
+    byte_range = None
+    if request.headers.get('Range') and request.headers.get('If-Range', etag) == etag:
+        byte_range = parse_range(request.headers['Range'], size)
+        if byte_range is None:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = storage.open(name, 'rb')
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_range(file, start, end - start + 1), status=206, content_type='application/octet-stream'
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    else:
+        response = FileResponse(file, as_attachment=True, filename=filename, content_type='application/octet-stream')
+        response.block_size = DOWNLOAD_CHUNK_SIZE
+        response['Content-Length'] = str(size)
+
+    response['Accept-Ranges'] = 'bytes'
+    if etag:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+
+    return response
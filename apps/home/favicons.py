@@ -0,0 +1,92 @@
+import logging
+from datetime import timedelta
+from urllib.parse import urljoin, urlparse
+from django.utils import timezone
+from apps.home.models import Link, Favicon, FAVICON_PLACEHOLDER
+
+logger = logging.getLogger(__name__)
+
+FAVICON_TIMEOUT = (3, 5)  # connect, read
+FAVICON_MAX_BYTES = 256 * 1024
+FAVICON_TTL = timedelta(days=30)
+FAVICON_MISSING_TTL = timedelta(days=1)
+
+
+def link_domain(url):
+    return urlparse(url).netloc.lower()
+
+
+def get_favicon(url):
+    # Imported here: only the worker fetches pages, web processes shouldn't pay for these at startup
+    import requests
+    from bs4 import BeautifulSoup
+
+    # Only the start of the page is read, the <link rel="icon"> tags live in <head>
+    try:
+        with requests.get(url, timeout=FAVICON_TIMEOUT, stream=True) as response:
+            if response.status_code != 200:
+                return None
+
+            content = b''
+            for chunk in response.iter_content(chunk_size=16 * 1024):
+                content += chunk
+                if len(content) >= FAVICON_MAX_BYTES or b'</head>' in content.lower():
+                    break
+
+        soup = BeautifulSoup(content, 'html.parser')
+        favicon_link = soup.find('link', rel='icon') or soup.find('link', rel='shortcut icon')
+
+        if favicon_link and favicon_link.get('href'):
+            favicon_url = urljoin(url, favicon_link.get('href'))
+            if len(favicon_url) <= Link._meta.get_field('icon').max_length:
+                return favicon_url
+
+    except Exception:
+        logger.warning('Error fetching favicon for %s', url, exc_info=True)
+
+    return None
+
+
+def is_fresh(favicon):
+    ttl = FAVICON_TTL if favicon.icon else FAVICON_MISSING_TTL
+    return favicon.fetched_at + ttl > timezone.now()
+
+
+def cached_favicon(url):
+    # Returns (found, icon); found is False when the domain must be fetched
+    favicon = Favicon.objects.filter(domain=link_domain(url)).first()
+    if favicon is None or not is_fresh(favicon):
+        return False, None
+
+    return True, favicon.icon
+
+
+def store_favicon(url, icon):
+    Favicon.objects.update_or_create(domain=link_domain(url), defaults={'icon': icon, 'fetched_at': timezone.now()})
+
+
+def resolve_favicon(url, force=False):
+    if not force:
+        found, icon = cached_favicon(url)
+        if found:
+            return icon
+
+    icon = get_favicon(url)
+    store_favicon(url, icon)
+
+    return icon
+
+
+def apply_favicon(url, icon, previous=None):
+    # Links of the domain still showing the placeholder (or the previous icon) get the new one
+    if not icon:
+        return 0
+
+    domain = link_domain(url)
+    replaced = [FAVICON_PLACEHOLDER, previous] if previous else [FAVICON_PLACEHOLDER]
+    links = [
+        link.id for link in Link.objects.filter(icon__in=replaced, path__icontains=domain).only('id', 'path')
+        if link_domain(link.path) == domain
+    ]
+
+    return Link.objects.filter(id__in=links).update(icon=icon)
@@ -0,0 +1,103 @@
+from datetime import datetime
+from functools import lru_cache
+from dataclasses import dataclass
+from django.db.models import Q
+
+
+# Filters travel in the URL as 'key=value&key=value' (see the filter_* views).
+# They are parsed once into a FilterSpec and cached by their raw string, so views
+# and template filters rendering the same page share the parsed object.
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    raw: str = ''
+    pairs: tuple = ()
+
+    def __bool__(self):
+        return bool(self.pairs)
+
+    def __str__(self):
+        return self.raw
+
+    def keys(self):
+        return [key for key, value in self.pairs]
+
+    def has(self, key):
+        return key in self.keys()
+
+    def get(self, key, default=None):
+        for item_key, value in reversed(self.pairs):
+            if item_key == key:
+                return value
+
+        return default
+
+    def date(self, key):
+        value = self.get(key)
+        if not value:
+            return None
+
+        try:
+            return datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            return None
+
+    def ids(self, key):
+        value = self.get(key)
+        return [int(item) for item in value.split('-') if item.isdigit()] if value else []
+
+
+EMPTY_FILTERS = FilterSpec()
+
+
+@lru_cache(maxsize=512)
+def parse_filter_string(raw):
+    pairs = []
+    for item in raw.split('&'):
+        key, separator, value = item.partition('=')
+        if separator and key:
+            pairs.append((key, value))
+
+    return FilterSpec(raw=raw, pairs=tuple(pairs))
+
+
+def parse_filters(filters):
+    if isinstance(filters, FilterSpec):
+        return filters
+
+    if not filters or filters in ['None', '%']:
+        return EMPTY_FILTERS
+
+    return parse_filter_string(str(filters))
+
+
+############################################################
+
+
+def date_range_query(spec, field, ordered=True):
+    # With ordered=True a reversed range (from >= to) only keeps the lower bound, as the list pages always did.
+    from_date, to_date = spec.date('from'), spec.date('to')
+
+    if from_date and to_date and (from_date < to_date or not ordered):
+        return Q(**{f'{field}__gte': from_date, f'{field}__lte': to_date})
+    elif from_date:
+        return Q(**{f'{field}__gte': from_date})
+    elif to_date:
+        return Q(**{f'{field}__lte': to_date})
+
+    return Q()
+
+
+def document_query(spec):
+    query = date_range_query(spec, 'expiration')
+
+    category = spec.get('category', 'all')
+    if category != 'all':
+        query &= Q(category=category if category else None)
+
+    regional = spec.get('regional', 'all')
+    if regional != 'all':
+        query &= Q(branch__id=regional)
+
+    return query
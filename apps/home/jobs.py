@@ -0,0 +1,92 @@
+from datetime import datetime
+from django.db import transaction
+from django.db.models import Q, Max
+from apps.home.models import Bill, Document, Office, Profile, JobWatermark
+
+
+def get_watermark(name):
+    return JobWatermark.objects.filter(name=name).values_list('watermark', flat=True).first()
+
+
+def set_watermark(name, value):
+    JobWatermark.objects.update_or_create(name=name, defaults={'watermark': value})
+
+
+def flag_late_bills(today=None, force=False):
+    # Bulk UPDATEs only: Bill.save and its post_save signals are never triggered here.
+    today = today or datetime.now().date()
+
+    if not force and get_watermark('late_bills') == today:
+        return None
+
+    with transaction.atomic():
+        late = Bill.objects.filter(
+            paid=False, late=False, due_date__lt=today
+        ).update(late=True)
+
+        unlate = Bill.objects.filter(late=True).filter(
+            Q(paid=True) | Q(due_date__isnull=True) | Q(due_date__gte=today)
+        ).update(late=False)
+
+        set_watermark('late_bills', today)
+
+    return {'late': late, 'unlate': unlate}
+
+
+def latest_expirations(category, owner):
+    # One aggregate query per category: {owner_id: latest expiration}
+    rows = Document.objects.filter(
+        category__iexact=category, **{f'{owner}__isnull': False}
+    ).order_by().values(owner).annotate(latest=Max('expiration'))
+
+    return {row[owner]: row['latest'] for row in rows}
+
+
+def stale_rows(objects, key, field, latest):
+    changed = []
+    for obj in objects:
+        value = latest.get(getattr(obj, key))
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            changed.append(obj)
+
+    return changed
+
+
+def expire_documents(today=None, force=False, dry_run=False):
+    # Bulk UPDATEs and bulk_update only: Document.save and Profile/Office.save are never triggered here.
+    today = today or datetime.now().date()
+
+    if not force and not dry_run and get_watermark('expired_documents') == today:
+        return None
+
+    to_expire = Document.objects.filter(expired=False, expiration__lt=today)
+    to_unexpire = Document.objects.filter(expired=True).filter(
+        Q(expiration__isnull=True) | Q(expiration__gte=today)
+    )
+
+    aso = latest_expirations('ASO', 'user')
+    pgr = latest_expirations('PGR', 'office')
+    pcmso = latest_expirations('PCMSO', 'office')
+
+    profiles = stale_rows(Profile.objects.only('id', 'user_id', 'aso'), 'user_id', 'aso', aso)
+    offices = list(Office.objects.only('id', 'pgr', 'pcmso'))
+    pgr_offices = stale_rows(offices, 'id', 'pgr', pgr)
+    pcmso_offices = stale_rows(offices, 'id', 'pcmso', pcmso)
+
+    result = {'aso': len(profiles), 'pgr': len(pgr_offices), 'pcmso': len(pcmso_offices)}
+
+    if dry_run:
+        result.update(expired=to_expire.count(), unexpired=to_unexpire.count())
+        return result
+
+    with transaction.atomic():
+        result['expired'] = to_expire.update(expired=True)
+        result['unexpired'] = to_unexpire.update(expired=False)
+
+        Profile.objects.bulk_update(profiles, ['aso'])
+        Office.objects.bulk_update(set(pgr_offices + pcmso_offices), ['pgr', 'pcmso'])
+
+        set_watermark('expired_documents', today)
+
+    return result
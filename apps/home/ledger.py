@@ -0,0 +1,170 @@
+import threading
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models import F, Sum
+from apps.home.models import Bill, BillInstallment
+from apps.home.cashflow import installment_keys, refresh_cash_flow
+from apps.home.pickers import bump_version
+
+
+# Bill totals are maintained from installment deltas instead of re-summing every installment on each write.
+# Changes are collected per bill and flushed as one UPDATE with F() increments, together with the due date and
+# late flag. Outside of bill_batch() every change is flushed right away; inside it, once when the block exits.
+
+_local = threading.local()
+
+
+def current_batch():
+    return getattr(_local, 'batch', None)
+
+
+@contextmanager
+def bill_batch():
+    if current_batch() is not None:
+        yield current_batch()
+        return
+
+    batch = {'bills': {}, 'cash_flow': set()}
+    _local.batch = batch
+    try:
+        with transaction.atomic():
+            yield batch
+            flush(batch)
+    finally:
+        _local.batch = None
+
+
+def record(bill_id, total=0, partial=0, count=0, bill=None):
+    with bill_batch() as batch:
+        entry = batch['bills'].setdefault(bill_id, {'total': 0, 'partial': 0, 'count': 0, 'instances': []})
+        entry['total'] += total
+        entry['partial'] += partial
+        entry['count'] += count
+
+        # Only the changes made through an instance are mirrored on it
+        if bill is not None:
+            held = next((held for held in entry['instances'] if held['bill'] is bill), None)
+            if held is None:
+                held = {'bill': bill, 'total': 0, 'partial': 0, 'count': 0}
+                entry['instances'].append(held)
+
+            held['total'] += total
+            held['partial'] += partial
+            held['count'] += count
+
+
+def record_cash_flow(keys):
+    with bill_batch() as batch:
+        batch['cash_flow'] |= set(keys)
+
+
+def paid_amount(value, paid):
+    return value if paid else 0
+
+
+def flush(batch):
+    today = datetime.now().date()
+
+    for bill_id, entry in batch['bills'].items():
+        current = Bill.objects.filter(id=bill_id).values('due_date', 'paid', 'installments_number').first()
+        if current is None:
+            continue
+
+        bill = Bill(id=bill_id, due_date=current['due_date'])
+        if current['installments_number'] + entry['count'] > 1:
+            bill.snap_due_date(bill.installment_schedule())
+
+        late = bool(bill.due_date and not current['paid'] and bill.due_date < today)
+
+        Bill.objects.filter(id=bill_id).update(
+            total=F('total') + entry['total'],
+            partial=F('partial') + entry['partial'],
+            installments_number=F('installments_number') + entry['count'],
+            due_date=bill.due_date,
+            late=late,
+        )
+
+        # Keep the instances the caller is holding in line with the row, so a later save() does not undo the deltas
+        for held in entry['instances']:
+            instance = held['bill']
+            instance.total += type(instance.total)(held['total'], instance.total.currency)
+            instance.partial += type(instance.partial)(held['partial'], instance.partial.currency)
+            instance.installments_number = int(instance.installments_number) + held['count']
+            instance.due_date = bill.due_date
+            instance.late = late
+
+    if any(entry['total'] for entry in batch['bills'].values()):
+        # Value range bounds (apps.home.bounds)
+        bump_version('bills')
+
+    refresh_cash_flow(batch['cash_flow'])
+
+
+def installment_saved(installment, previous=None):
+    value, paid = installment.value.amount, installment.paid
+    old_value, old_paid = (previous['value'], previous['paid']) if previous else (0, False)
+
+    record(
+        installment.bill_id,
+        total=value - old_value,
+        partial=paid_amount(value, paid) - paid_amount(old_value, old_paid),
+        bill=cached_bill(installment),
+    )
+
+
+def installment_deleted(installment):
+    record(
+        installment.bill_id,
+        total=-installment.value.amount,
+        partial=-paid_amount(installment.value.amount, installment.paid),
+        count=-1,
+        bill=cached_bill(installment),
+    )
+
+
+def cached_bill(installment):
+    return installment.bill if BillInstallment.bill.is_cached(installment) else None
+
+
+############################################################
+
+
+def create_installments(bill, number, value, first_due_date=None, frequency=0, first=1):
+    # One INSERT for the whole schedule; the bill is reconciled once when the surrounding batch flushes
+    if isinstance(first_due_date, str):
+        first_due_date = datetime.strptime(first_due_date, '%Y-%m-%d')
+
+    with bill_batch():
+        installments = BillInstallment.objects.bulk_create([
+            BillInstallment(
+                bill=bill,
+                partial_id=i,
+                value=value,
+                due_date=first_due_date + timedelta(days=int(frequency) * (i - first)) if first_due_date else None,
+            )
+            for i in range(first, first + int(number))
+        ])
+
+        record(bill.id, total=sum(installment.value.amount for installment in installments), bill=bill)
+
+    return installments
+
+
+def set_installments_paid(bill, installments, paid, paid_at=None):
+    # One UPDATE for every installment that changes state, plus the matching partial delta on the bill
+    installments = installments.filter(bill=bill, paid=not paid)
+
+    with bill_batch():
+        ids = list(installments.values_list('id', flat=True))
+        if not ids:
+            return 0
+
+        record_cash_flow(installment_keys(ids))
+        amount = installments.aggregate(amount=Sum('value'))['amount'] or 0
+        updated = BillInstallment.objects.filter(id__in=ids).update(paid=paid, paid_at=paid_at if paid else None)
+
+        record(bill.id, partial=amount if paid else -amount, bill=bill)
+        record_cash_flow(installment_keys(ids))
+
+    return updated
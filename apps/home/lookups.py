@@ -0,0 +1,51 @@
+import json
+import time
+from functools import cache
+from django.conf import settings
+from core.settings import CORE_DIR
+from apps.home.models import Office
+from apps.home.pickers import cache_version, bump_version
+
+
+# Id -> name tables read by template filters, once per row. They are built once and kept in process memory,
+# tagged with the 'lookups' version, which signals bump when offices change. The shared version is read at most
+# once per LOOKUPS_VERSION_TTL (not once per filter call); changes made by this process are seen at once (see
+# forget_lookups).
+
+_loaded = {}
+_version = [None, 0.0]  # version, read at (monotonic)
+
+
+def current_version():
+    now = time.monotonic()
+    if _version[0] is None or now - _version[1] > settings.LOOKUPS_VERSION_TTL:
+        _version[:] = [cache_version('lookups'), now]
+
+    return _version[0]
+
+
+def forget_lookups():
+    bump_version('lookups')
+    _loaded.clear()
+    _version[0] = None
+
+
+def lookup(name, build):
+    version = current_version()
+    loaded = _loaded.get(name)
+
+    # The age limit covers a version lost from the cache (eviction, restart of a shared backend)
+    if loaded is None or loaded[0] != version or time.monotonic() - loaded[1] > settings.PICKERS_CACHE_TIMEOUT:
+        loaded = _loaded[name] = (version, time.monotonic(), build())
+
+    return loaded[2]
+
+
+def office_names():
+    return lookup('offices', lambda: dict(Office.objects.values_list('id', 'company_name')))
+
+
+@cache
+def world():
+    with open(f'{CORE_DIR}/apps/static/assets/world.json', 'r', encoding='utf-8') as file:
+        return json.load(file)
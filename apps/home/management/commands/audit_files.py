@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from apps.home.blobs import audit
+
+
+def megabytes(size):
+    return f'{size / 1024 / 1024:.1f} MB'
+
+
+class Command(BaseCommand):
+    help = 'Report storage shared and reclaimable by deduplicating uploaded files and documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--apply', action='store_true',
+                            help='Deduplicate files stored before blobs and fix reference counts')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Auditing files...', ending=' ')
+        report = audit(apply=options['apply'])
+        self.stdout.write(self.style.SUCCESS('OK'))
+
+        self.stdout.write(f'Rows: {report["rows"]} ({report["missing"]} missing files)')
+        self.stdout.write(f'Stored: {megabytes(report["stored"])}')
+        self.stdout.write(f'Shared by blobs: {megabytes(report["shared"])}')
+        self.stdout.write(f'Reclaimable: {megabytes(report["reclaimable"])}'
+                          + (' (reclaimed)' if options['apply'] else ''))
+        self.stdout.write(f'Reference drift: {report["drift"]} blobs, orphans: {report["orphans"]}'
+                          + (' (fixed)' if options['apply'] else ''))
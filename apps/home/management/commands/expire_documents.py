@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from apps.home.jobs import expire_documents
+
+
+class Command(BaseCommand):
+    help = 'Flag expired documents and refresh ASO/PGR/PCMSO dates of collaborators and offices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Run even if the job already ran today')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        self.stdout.write(f'{"Checking" if dry_run else "Updating"} expired documents...', ending=' ')
+        result = expire_documents(force=options['force'], dry_run=dry_run)
+
+        if result is None:
+            self.stdout.write(self.style.WARNING('SKIPPED (already up to date)'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('OK'))
+
+        prefix = 'Would update' if dry_run else 'Updated'
+        self.stdout.write(f'{prefix} documents to expired: {result["expired"]}')
+        self.stdout.write(f'{prefix} documents to up to date: {result["unexpired"]}')
+        self.stdout.write(f'{prefix} collaborators ASO: {result["aso"]}')
+        self.stdout.write(f'{prefix} offices PGR: {result["pgr"]}')
+        self.stdout.write(f'{prefix} offices PCMSO: {result["pcmso"]}')
@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
 from django.contrib.sessions.models import Session
-from apps.home.models import Project, Office, Bill, BillProof
+from apps.home.models import Project, Client, Bill, BillProof
+from apps.home.slugs import reslug
 
 
 class Command(BaseCommand):
@@ -17,17 +19,17 @@ class Command(BaseCommand):
 
         # Update Projects
         self.stdout.write(f'Updating projects...', ending=' ')
-        for project in Project.objects.all():
-            project.save()
-        else:
-            self.stdout.write(self.style.SUCCESS('OK'))
+        # Projects still showing the placeholder take their client's avatar (as Project.save does), in one UPDATE
+        Project.objects.filter(img__contains='placeholder', client__isnull=False).exclude(
+            client__avatar__contains='placeholder'
+        ).update(img=Subquery(Client.objects.filter(pk=OuterRef('client_id')).values('avatar')[:1]))
+        reslug('projects')
+        self.stdout.write(self.style.SUCCESS('OK'))
 
         # Update Offices
         self.stdout.write(f'Updating offices...', ending=' ')
-        for office in Office.objects.all():
-            office.save()
-        else:
-            self.stdout.write(self.style.SUCCESS('OK'))
+        reslug('offices')
+        self.stdout.write(self.style.SUCCESS('OK'))
 
         # Update Bill Proofs
         bills = Bill.objects.exclude(proof='')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from apps.home.jobs import flag_late_bills
+
+
+class Command(BaseCommand):
+    help = 'Flag overdue bills as late and clear the flag on bills that are no longer overdue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Run even if the job already ran today')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Updating late bills...', ending=' ')
+        result = flag_late_bills(force=options['force'])
+
+        if result is None:
+            self.stdout.write(self.style.WARNING('SKIPPED (already up to date)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('OK'))
+            self.stdout.write(f'Bills flagged as late: {result["late"]}')
+            self.stdout.write(f'Bills no longer late: {result["unlate"]}')
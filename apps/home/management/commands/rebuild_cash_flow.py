@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from apps.home.cashflow import rebuild_cash_flow
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly cash flow rollup from all paid bills and installments'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding cash flow...', ending=' ')
+        rows = rebuild_cash_flow()
+        self.stdout.write(self.style.SUCCESS('OK'))
+        self.stdout.write(f'Monthly rows: {rows}')
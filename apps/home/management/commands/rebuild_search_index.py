@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from apps.home.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of projects, clients, documents, meetings and tasks'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding search index...', ending=' ')
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS('OK'))
+        self.stdout.write(f'Indexed entries: {count}')
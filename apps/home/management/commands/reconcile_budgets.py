@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from apps.home.budgets import reconcile_budgets
+
+
+class Command(BaseCommand):
+    help = 'Compare project budgets with the sum of their uploaded files and fix the ones that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted projects')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling project budgets...', ending=' ')
+        drifted = reconcile_budgets(fix=not options['dry_run'])
+        self.stdout.write(self.style.SUCCESS('OK'))
+        self.stdout.write(f'Drifted projects: {drifted}' + ('' if options['dry_run'] else ' (fixed)'))
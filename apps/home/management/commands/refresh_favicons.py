@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from apps.home.models import Link, Favicon, FAVICON_PLACEHOLDER
+from apps.home.favicons import link_domain, is_fresh, get_favicon, store_favicon, apply_favicon
+
+
+class Command(BaseCommand):
+    help = 'Fetch favicons of stale domains and of links still showing the placeholder icon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refresh every known domain, even fresh ones')
+        parser.add_argument('--workers', type=int, default=8, help='Parallel fetches')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Collecting domains...', ending=' ')
+
+        urls = {}
+        for path in Link.objects.filter(Q(icon=FAVICON_PLACEHOLDER) | Q(icon__startswith='http')).values_list('path', flat=True):
+            urls.setdefault(link_domain(path), path)
+
+        cache = {favicon.domain: favicon for favicon in Favicon.objects.filter(domain__in=urls)}
+        urls = {
+            domain: url for domain, url in urls.items()
+            if options['all'] or domain not in cache or not is_fresh(cache[domain])
+        }
+        self.stdout.write(self.style.SUCCESS('OK'))
+
+        self.stdout.write(f'Fetching {len(urls)} favicons...', ending=' ')
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            icons = dict(zip(urls.values(), executor.map(get_favicon, urls.values())))
+        self.stdout.write(self.style.SUCCESS('OK'))
+
+        self.stdout.write('Updating links...', ending=' ')
+        updated = 0
+        for url, icon in icons.items():
+            previous = cache.get(link_domain(url))
+            store_favicon(url, icon)
+            updated += apply_favicon(url, icon, previous.icon if previous else None)
+        self.stdout.write(self.style.SUCCESS('OK'))
+
+        self.stdout.write(f'Links updated: {updated}')
@@ -0,0 +1,38 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.db import connections
+from django.core.management.base import BaseCommand
+from apps.home.models import Equipments, Profile
+from apps.home.qrcodes import (
+    equipment_needs_qrcode, profile_needs_qrcode, refresh_equipment_qrcode, refresh_profile_qrcode
+)
+
+
+TARGETS = {
+    'equipments': (Equipments.objects.all, equipment_needs_qrcode, refresh_equipment_qrcode),
+    'profiles': (Profile.objects.select_related('user').all, profile_needs_qrcode, refresh_profile_qrcode),
+}
+
+
+class Command(BaseCommand):
+    help = 'Render missing or outdated QR codes of equipments and collaborators in parallel processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', nargs='?', choices=['all', *TARGETS], default='all')
+        parser.add_argument('--force', action='store_true', help='Render even if the payload did not change')
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes')
+
+    def handle(self, *args, **options):
+        targets = TARGETS if options['target'] == 'all' else {options['target']: TARGETS[options['target']]}
+
+        for name, (queryset, needs_qrcode, refresh) in targets.items():
+            self.stdout.write(f'Regenerating {name} QR codes...', ending=' ')
+
+            ids = [instance.pk for instance in queryset() if options['force'] or needs_qrcode(instance)]
+
+            # Forked workers must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['processes']) as executor:
+                rendered = sum(executor.map(refresh, ids, [options['force']] * len(ids), chunksize=16))
+
+            self.stdout.write(self.style.SUCCESS('OK'))
+            self.stdout.write(f'Rendered: {rendered} of {len(ids)}')
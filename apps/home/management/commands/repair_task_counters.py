@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from apps.home.progress import repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the task and subtask counters of tasks and projects and refresh project progress'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Repairing task counters...', ending=' ')
+        tasks, projects = repair_counters()
+        self.stdout.write(self.style.SUCCESS('OK'))
+        self.stdout.write(f'Fixed tasks: {tasks}, fixed projects: {projects}')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.home.slugs import SLUGGED, reslug
+
+
+class Command(BaseCommand):
+    help = 'Recompute the slugs of projects, profiles, offices and clients in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help=f'Any of {", ".join(SLUGGED)} (default: all)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        unknown = set(options['targets']) - set(SLUGGED)
+        if unknown:
+            raise CommandError(f'Unknown targets: {", ".join(sorted(unknown))}')
+
+        for name in options['targets'] or SLUGGED:
+            self.stdout.write(f'Updating {name} slugs...', ending=' ')
+            changed = reslug(name, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS('OK'))
+            self.stdout.write(f'Changed: {changed}')
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.settings import CORE_DIR
+
+# Imports what a server process imports at boot: settings, apps and models, then the URLconf (every view)
+STARTUP_CODE = (
+    'import time; started = time.perf_counter(); import django; django.setup(); import importlib, sys; '
+    'importlib.import_module(sys.argv[1]); print(time.perf_counter() - started)'
+)
+
+
+def parse_importtime(output):
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Start the project in a fresh interpreter and report the import time per module'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Number of modules to list (default: 20)')
+        parser.add_argument('--module', default=settings.ROOT_URLCONF, help='Module imported after django.setup()')
+        parser.add_argument('--project', action='store_true', help='Only list modules of this project')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Profiling startup...', ending=' ')
+
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings'))
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE, options['module']],
+            cwd=CORE_DIR, env=env, capture_output=True, text=True,
+        )
+        elapsed = time.perf_counter() - started
+
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'Startup failed')
+
+        self.stdout.write(self.style.SUCCESS('OK'))
+
+        modules = parse_importtime(result.stderr)
+        if options['project']:
+            modules = [module for module in modules if module[0].split('.')[0] in ('apps', 'core')]
+
+        setup = float(result.stdout.strip().splitlines()[-1])
+        self.stdout.write(f'Cold start: {setup:.2f}s setup, {elapsed:.2f}s with interpreter start and exit')
+        self.stdout.write('(import times include -X importtime overhead)')
+        self.stdout.write(f'{"self ms":>9} {"total ms":>9}  module')
+        for name, self_ms, cumulative_ms in sorted(modules, key=lambda module: -module[1])[:options['limit']]:
+            self.stdout.write(f'{self_ms:>9.1f} {cumulative_ms:>9.1f}  {name}')
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0106_jobwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense')], max_length=10)),
+                ('currency', models.CharField(default='BRL', max_length=3)),
+                ('month', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cash_flow', to='home.client')),
+                ('office', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cash_flow', to='home.office')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'kind'], name='home_cashfl_month_5d0d5a_idx')],
+                'unique_together': {('office', 'client', 'kind', 'currency', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0107_cashflowmonth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Favicon',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255, unique=True)),
+                ('icon', models.CharField(blank=True, max_length=100, null=True)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:21
+
+import hashlib
+from django.db import migrations, models
+
+
+# QR codes rendered before this migration already encode their current payload: their hash is stored so they
+# aren't rendered and uploaded again. Payloads are built as in apps.home.qrcodes; rows are read with
+# values_list because the historical Equipments can't be instantiated with its MoneyField.
+
+def payload_hash(payload):
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def equipment_payload(name, series, custom_id, acquisition_date):
+    return (f'Name: {name}\n'
+            f'Series: {series}\n'
+            f'ID: {custom_id}\n'
+            f'Acquisition: {acquisition_date.strftime("%d/%m/%Y")}')
+
+
+def profile_payload(username):
+    return "https://hub.infinitefoundry.com/members/" + username.split('@')[0]
+
+
+def hash_rendered_qrcodes(apps, schema_editor):
+    Equipments = apps.get_model('home', 'Equipments')
+    Profile = apps.get_model('home', 'Profile')
+
+    equipments = Equipments.objects.exclude(qrcode='placeholder.webp').exclude(qrcode='').values_list(
+        'id', 'name', 'series', 'custom_id', 'acquisition_date')
+    for pk, name, series, custom_id, acquisition_date in equipments.iterator():
+        Equipments.objects.filter(pk=pk).update(
+            qrcode_hash=payload_hash(equipment_payload(name, series, custom_id, acquisition_date))
+        )
+
+    profiles = Profile.objects.exclude(qrcode__isnull=True).exclude(qrcode='').values_list('id', 'user__username')
+    for pk, username in profiles.iterator():
+        Profile.objects.filter(pk=pk).update(qrcode_hash=payload_hash(profile_payload(username)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0108_favicon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipments',
+            name='qrcode_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='qrcode_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(hash_rendered_qrcodes, migrations.RunPython.noop),
+    ]
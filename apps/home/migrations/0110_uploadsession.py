@@ -0,0 +1,38 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('home', '0109_qrcode_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=500)),
+                ('filename', models.CharField(max_length=255)),
+                ('checksum', models.CharField(blank=True, default='', max_length=64)),
+                ('multipart_id', models.CharField(blank=True, default='', max_length=255)),
+                ('size', models.BigIntegerField()),
+                ('received', models.BigIntegerField(default=0)),
+                ('parts', models.JSONField(default=list)),
+                ('metadata', models.JSONField(default=dict)),
+                ('completed', models.BooleanField(default=False)),
+                ('verified', models.BooleanField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='home.project')),
+                ('uploaded_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+                ('uploaded_file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_sessions', to='home.uploadedfile')),
+            ],
+        ),
+    ]
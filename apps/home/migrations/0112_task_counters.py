@@ -0,0 +1,66 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:33
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_tasks(apps, schema_editor):
+    Project = apps.get_model('home', 'Project')
+    Task = apps.get_model('home', 'Task')
+
+    for task in Task.objects.annotate(total=Count('subtasks'), done=Count('subtasks', filter=Q(subtasks__completed=True))):
+        Task.objects.filter(pk=task.pk).update(subtasks_total=task.total, subtasks_completed=task.done)
+
+    for project in Project.objects.annotate(
+        total=Count('tasks', distinct=True),
+        done=Count('tasks', filter=Q(tasks__completed=True), distinct=True),
+        sub_total=Count('tasks__subtasks', distinct=True),
+        sub_done=Count('tasks__subtasks', filter=Q(tasks__subtasks__completed=True), distinct=True),
+    ):
+        units = project.total + project.sub_total
+        Project.objects.filter(pk=project.pk).update(
+            tasks_total=project.total, tasks_completed=project.done,
+            subtasks_total=project.sub_total, subtasks_completed=project.sub_done,
+            completition=(project.done + project.sub_done) * 100 // units if units else 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0111_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='subtasks_completed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='subtasks_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tasks_completed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tasks_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='subtasks_completed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='subtasks_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:37
+
+from django.db import migrations, models
+
+
+# The full-text index lives outside the ORM: an FTS5 table kept in sync by triggers on SQLite, a GIN expression
+# index on PostgreSQL. Existing rows are indexed here (the triggers fill the FTS table); `manage.py
+# rebuild_search_index` rebuilds everything later on.
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE home_searchentry_fts USING fts5(
+        title, body, content='home_searchentry', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER home_searchentry_ai AFTER INSERT ON home_searchentry BEGIN
+        INSERT INTO home_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER home_searchentry_ad AFTER DELETE ON home_searchentry BEGIN
+        INSERT INTO home_searchentry_fts(home_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER home_searchentry_au AFTER UPDATE ON home_searchentry BEGIN
+        INSERT INTO home_searchentry_fts(home_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO home_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+SQLITE_FTS_DROP = [
+    'DROP TRIGGER IF EXISTS home_searchentry_au',
+    'DROP TRIGGER IF EXISTS home_searchentry_ad',
+    'DROP TRIGGER IF EXISTS home_searchentry_ai',
+    'DROP TABLE IF EXISTS home_searchentry_fts',
+]
+
+POSTGRES_INDEX = [
+    "CREATE INDEX home_searchentry_tsv ON home_searchentry "
+    "USING GIN (to_tsvector('simple', title || ' ' || body))",
+]
+
+POSTGRES_INDEX_DROP = ['DROP INDEX IF EXISTS home_searchentry_tsv']
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+def flatten(value):
+    if isinstance(value, dict):
+        return ' '.join(flatten(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return ' '.join(flatten(item) for item in value)
+
+    return '' if value is None else str(value)
+
+
+def join(*parts):
+    return '\n'.join(part for part in parts if part)
+
+
+# Same text as apps.home.search.SOURCES, written against the historical models
+SOURCES = {
+    'project': (
+        'Project', ('title', 'about', 'client_str', 'country'),
+        lambda project: (project.title, join(project.about, project.client_str, project.country)),
+    ),
+    'client': (
+        'Client', ('name', 'area', 'location', 'cnpj', 'description'),
+        lambda client: (client.name, join(client.area, client.location, client.cnpj, client.description)),
+    ),
+    'document': (
+        'Document', ('name', 'category', 'description'),
+        lambda document: (document.name, join(document.category, document.description)),
+    ),
+    'meeting': (
+        'Meeting', ('title', 'summary', 'topics', 'questions'),
+        lambda meeting: (meeting.title, join(meeting.summary, flatten(meeting.topics), flatten(meeting.questions))),
+    ),
+    'task': (
+        'Task', ('title', 'description'),
+        lambda task: (task.title, task.description),
+    ),
+}
+
+BATCH_SIZE = 500
+
+
+def backfill(apps, schema_editor):
+    SearchEntry = apps.get_model('home', 'SearchEntry')
+
+    for kind, (model_name, fields, text) in SOURCES.items():
+        model = apps.get_model('home', model_name)
+
+        batch = []
+        for instance in model.objects.only('id', *fields).iterator(chunk_size=BATCH_SIZE):
+            title, body = text(instance)
+            batch.append(SearchEntry(kind=kind, object_id=instance.pk, title=(title or '')[:255], body=body or ''))
+
+            if len(batch) >= BATCH_SIZE:
+                SearchEntry.objects.bulk_create(batch)
+                batch = []
+
+        SearchEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0112_task_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(default='', max_length=255)),
+                ('body', models.TextField(default='')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FTS, 'postgresql': POSTGRES_INDEX}),
+            run({'sqlite': SQLITE_FTS_DROP, 'postgresql': POSTGRES_INDEX_DROP}),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The pickled lists are decoded by the historical PickledObjectField and copied into JSON columns in batches,
+# then the JSON columns take the old names.
+
+FIELDS = ('questions', 'topics', 'external_participants', 'invited_participants')
+BATCH_SIZE = 500
+
+
+def email_domain(email):
+    return email.rsplit('@', 1)[-1].strip().lower() if '@' in email else ''
+
+
+def as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else []
+
+
+def pickled_to_json(apps, schema_editor):
+    Meeting = apps.get_model('home', 'Meeting')
+    ExternalParticipant = apps.get_model('home', 'ExternalParticipant')
+
+    batch, externals = [], []
+    for meeting in Meeting.objects.only('id', *FIELDS).iterator(chunk_size=BATCH_SIZE):
+        for field in FIELDS:
+            setattr(meeting, f'{field}_json', as_list(getattr(meeting, field)))
+        batch.append(meeting)
+
+        externals += [
+            ExternalParticipant(meeting_id=meeting.id, email=email, domain=email_domain(email))
+            for email in meeting.external_participants_json if email
+        ]
+
+        if len(batch) >= BATCH_SIZE:
+            Meeting.objects.bulk_update(batch, [f'{field}_json' for field in FIELDS])
+            ExternalParticipant.objects.bulk_create(externals)
+            batch, externals = [], []
+
+    Meeting.objects.bulk_update(batch, [f'{field}_json' for field in FIELDS])
+    ExternalParticipant.objects.bulk_create(externals)
+
+
+def json_to_pickled(apps, schema_editor):
+    Meeting = apps.get_model('home', 'Meeting')
+
+    batch = []
+    for meeting in Meeting.objects.only('id', *[f'{field}_json' for field in FIELDS]).iterator(chunk_size=BATCH_SIZE):
+        for field in FIELDS:
+            setattr(meeting, field, getattr(meeting, f'{field}_json'))
+        batch.append(meeting)
+
+        if len(batch) >= BATCH_SIZE:
+            Meeting.objects.bulk_update(batch, FIELDS)
+            batch = []
+
+    Meeting.objects.bulk_update(batch, FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0113_searchentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='questions_json',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='meeting',
+            name='topics_json',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='meeting',
+            name='external_participants_json',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='meeting',
+            name='invited_participants_json',
+            field=models.JSONField(default=list),
+        ),
+        migrations.CreateModel(
+            name='ExternalParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(max_length=254)),
+                ('domain', models.CharField(db_index=True, max_length=254)),
+                ('meeting', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='externals', to='home.meeting')),
+            ],
+        ),
+        migrations.RunPython(pickled_to_json, json_to_pickled),
+        migrations.RemoveField(
+            model_name='meeting',
+            name='questions',
+        ),
+        migrations.RemoveField(
+            model_name='meeting',
+            name='topics',
+        ),
+        migrations.RemoveField(
+            model_name='meeting',
+            name='external_participants',
+        ),
+        migrations.RemoveField(
+            model_name='meeting',
+            name='invited_participants',
+        ),
+        migrations.RenameField(
+            model_name='meeting',
+            old_name='questions_json',
+            new_name='questions',
+        ),
+        migrations.RenameField(
+            model_name='meeting',
+            old_name='topics_json',
+            new_name='topics',
+        ),
+        migrations.RenameField(
+            model_name='meeting',
+            old_name='external_participants_json',
+            new_name='external_participants',
+        ),
+        migrations.RenameField(
+            model_name='meeting',
+            old_name='invited_participants_json',
+            new_name='invited_participants',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0114_meeting_json'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['total_currency', 'total'], name='home_bill_total_c_502844_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-18 16:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0115_bill_total_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='uploadsession',
+            name='blob',
+        ),
+    ]
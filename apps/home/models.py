@@ -1,45 +1,36 @@
 import json
-import qrcode
-import requests
-from io import BytesIO
-from django.db import models
-from bs4 import BeautifulSoup
+import uuid
+from functools import cache
+from django.db import models, transaction
 from datetime import datetime
-from djmoney.money import Money
-from urllib.parse import urljoin
-from django.core.files import File
 from django.utils.text import slugify
 from djmoney.models.fields import MoneyField
 from apps.authentication.models import AuthEmail
-from picklefield.fields import PickledObjectField
 from django.contrib.auth.models import User, Group
 from apps.home.storage_backends import PublicMediaStorage
 from core.settings import CORE_DIR
 
 
-BANKS = json.load(open(f'{CORE_DIR}/apps/static/assets/banks.json', 'r', encoding='utf-8'))
-BANK_CODES = ((k, f'{k} ({v})') for k, v in BANKS.items())
-BANK_NAMES = ((v, f'{v} ({k})') for k, v in BANKS.items())
+@cache
+def banks():
+    with open(f'{CORE_DIR}/apps/static/assets/banks.json', 'r', encoding='utf-8') as file:
+        return json.load(file)
 
 
-def get_favicon(url):
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            html_content = response.text
-            soup = BeautifulSoup(html_content, 'html.parser')
-            favicon_link = soup.find('link', rel='icon') or soup.find('link', rel='shortcut icon')
+class BankChoices:
+    # banks.json is read on first use (forms, validation, checks), not when the models are imported
+    def __init__(self, label):
+        self.label = label
 
-            if favicon_link:
-                favicon_url = favicon_link.get('href')
-                absolute_favicon_url = urljoin(url, favicon_url)
+    def __iter__(self):
+        return iter([self.label(code, name) for code, name in banks().items()])
 
-                return absolute_favicon_url
+    def __len__(self):
+        return len(banks())
 
-    except Exception as e:
-        print(f"Error fetching favicon: {e}")
 
-    return None
+BANK_CODES = BankChoices(lambda code, name: (code, f'{code} ({name})'))
+BANK_NAMES = BankChoices(lambda code, name: (name, f'{name} ({code})'))
 
 
 def unmask_money(value, currency):
@@ -104,6 +95,53 @@ def custom_upload_path_documents(instance, filename):
     return f'documents/{path}/{category}/{filename}'
 
 
+class SlugMixin(models.Model):
+    # Slugs end with an id: rows whose id is known are saved once with their slug. New rows only get their id from
+    # the INSERT, so their slug is written by an UPDATE right after it, in the same transaction and before post_save
+    # is sent: receivers always see the final slug, and the row is signalled once.
+    slug_source = None
+
+    class Meta:
+        abstract = True
+
+    def slug_id(self):
+        return self.id
+
+    def slug_text(self):
+        return getattr(self, self.slug_source)
+
+    def build_slug(self):
+        text = self.slug_text()
+        if text == '':
+            return slugify(str(self.slug_id()))
+
+        return slugify(text + '-' + str(self.slug_id()))
+
+    def save(self, *args, **kwargs):
+        # slug=True is accepted for compatibility, the slug is always recomputed
+        kwargs.pop('slug', None)
+
+        if self.slug_id() is not None:
+            slug = self.build_slug()
+            if slug != self.slug and kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'slug'}
+            self.slug = slug
+
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def _save_table(self, raw=False, cls=None, force_insert=False, force_update=False, using=None,
+                    update_fields=None):
+        updated = super()._save_table(raw, cls, force_insert, force_update, using, update_fields)
+
+        slug = self.slug if raw else self.build_slug()
+        if slug != self.slug:
+            self.slug = slug
+            type(self)._base_manager.using(using).filter(pk=self.pk).update(slug=slug)
+
+        return updated
+
+
 ############################################################
 
 
@@ -117,56 +155,33 @@ class Equipments(models.Model):
     custom_id = models.CharField(max_length=100, default='')
     qrcode = models.ImageField(upload_to=f'qrcodes/equipments/{datetime.now().strftime("%Y")}/',
                                default='placeholder.webp')
+    qrcode_hash = models.CharField(max_length=64, blank=True, default='')
 
     def __str__(self):
         return self.name
 
-    def generate_qrcode(self):
-        info = (f'Name: {self.name}\n'
-                f'Series: {self.series}\n'
-                f'ID: {self.custom_id}\n'
-                f'Acquisition: {self.acquisition_date.strftime("%d/%m/%Y")}')
-
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-
-        qr.add_data(info)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        temp_file = BytesIO()
-        img.save(temp_file, format='PNG')
-        temp_file.seek(0)
-
-        self.qrcode.save(f'{self.custom_id}_{self.name.lower()}.png', File(temp_file))
-
-        self.save()
-
     def generate_custom_id(self):
         return f'{self.acquisition_date.strftime("%Y%m")}{self.id:03d}'
 
     def save(self, *args, **kwargs):
-
-        super().save()
-
         if self.series == '':
             self.series = 'N/A'
 
-        if not self.custom_id or self.custom_id == '':
+        super().save(*args, **kwargs)
+
+        # The custom id needs the primary key; the QR code is rendered in the background (see apps.home.qrcodes)
+        if not self.custom_id:
             self.custom_id = self.generate_custom_id()
+            Equipments.objects.filter(pk=self.pk).update(custom_id=self.custom_id)
 
-        if self.qrcode.name == 'placeholder.webp':
-            self.generate_qrcode()
 
-        super(Equipments, self).save(*args, **kwargs)
+PROJECT_MAINTAINED_FIELDS = ('budget', 'budget_currency', 'completition', 'tasks_total', 'tasks_completed',
+                             'subtasks_total', 'subtasks_completed')
 
 
-class Project(models.Model):
+class Project(SlugMixin):
+    slug_source = 'title'
+
     slug = models.SlugField(max_length=100, default='')
 
     # Foreign Keys and Relationships
@@ -203,39 +218,36 @@ class Project(models.Model):
     completition = models.IntegerField(default=0)
     identification = models.IntegerField(null=True, blank=True)
 
+    # Task counters, maintained by apps.home.progress
+    tasks_total = models.PositiveIntegerField(default=0)
+    tasks_completed = models.PositiveIntegerField(default=0)
+    subtasks_total = models.PositiveIntegerField(default=0)
+    subtasks_completed = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if kwargs.get('update_tasks'):
-            total_tasks = self.tasks.count()
-            completed_tasks = self.tasks.filter(completed=True).count()
-
-            self.completition = int((completed_tasks / total_tasks) * 100)
-
         if self.client and 'placeholder' in self.img.name:
             if 'placeholder' not in self.client.avatar.name:
                 self.img = self.client.avatar
 
-        super().save()
+        # The budget and task progress are only maintained from deltas (apps.home.budgets, apps.home.progress),
+        # a stale instance must not overwrite them
+        if self.pk and not self._state.adding and not kwargs.get('force_insert'):
+            allowed = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in PROJECT_MAINTAINED_FIELDS
+            ]
+            update_fields = kwargs.get('update_fields')
+            kwargs['update_fields'] = allowed if update_fields is None else [
+                name for name in update_fields if name in allowed
+            ]
 
-        if not self.slug and self.title != '':
-            self.slug = slugify(self.title + '-' + str(self.id))
-            self.save()
-        elif self.slug != slugify(self.title + '-' + str(self.id)) or kwargs.get('slug'):
-            self.slug = slugify(self.title + '-' + str(self.id))
-            self.save()
-        elif self.title == '':
-            self.slug = slugify(str(self.id))
-            self.save()
-        elif self.slug.endswith('none'):
-            self.slug = self.slug.replace('none', str(self.id))
-            self.save()
-        else:
-            pass
+        super().save(*args, **kwargs)
 
 
-class Profile(models.Model):
+class Profile(SlugMixin):
     slug = models.SlugField(max_length=100, default='')
 
     # Foreign Keys and Relationships
@@ -250,6 +262,7 @@ class Profile(models.Model):
     qrcode = models.ImageField(upload_to=f'qrcodes/members/',
                                storage=PublicMediaStorage(),
                                null=True, blank=True)
+    qrcode_hash = models.CharField(max_length=64, blank=True, default='')
 
     # Char Fields
     cpf = models.CharField(max_length=20, default='')
@@ -287,46 +300,11 @@ class Profile(models.Model):
     def __str__(self):
         return self.user.username
 
-    def generate_qrcode(self):
-        info = "https://hub.infinitefoundry.com/members/" + self.user.username.split('@')[0]
+    def slug_id(self):
+        return self.user_id
 
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-
-        qr.add_data(info)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        temp_file = BytesIO()
-        img.save(temp_file, format='PNG')
-        temp_file.seek(0)
-
-        self.qrcode.save(f'{slugify(self.user.get_full_name())}_{self.id}.png', File(temp_file))
-
-        self.save()
-
-    def save(self, *args, **kwargs):
-        super().save()
-
-        if not self.slug and self.user.get_full_name() != '':
-            self.slug = slugify(self.user.get_full_name() + '-' + str(self.user.id))
-            self.save()
-        elif self.slug != slugify(self.user.get_full_name() + '-' + str(self.user.id)) or kwargs.get('slug'):
-            self.slug = slugify(self.user.get_full_name() + '-' + str(self.user.id))
-            self.save()
-        elif self.user.get_full_name() == '' and not self.slug:
-            self.slug = slugify(str(self.user.id))
-            self.save()
-        elif self.slug.endswith('none'):
-            self.slug = self.slug.replace('none', str(self.user.id))
-            self.save()
-        else:
-            pass
+    def slug_text(self):
+        return self.user.get_full_name()
 
 
 class UploadedFile(models.Model):
@@ -335,6 +313,7 @@ class UploadedFile(models.Model):
     uploaded_by = models.ForeignKey(User, related_name='uploaded_files', on_delete=models.SET_NULL, default=1, null=True)
 
     file = models.FileField(upload_to=custom_upload_path_projects, max_length=500)
+    blob = models.ForeignKey('Blob', related_name='uploaded_files', on_delete=models.SET_NULL, null=True, blank=True)
 
     custom_name = models.CharField(max_length=100, default='')
     category = models.CharField(max_length=100, default='others')
@@ -375,20 +354,6 @@ class UploadedFile(models.Model):
             if self.fileExtension() in value:
                 return key
 
-    def save(self, *args, **kwargs):
-
-        super().save()
-
-        project = self.project
-
-        if project:
-            total_budget = project.uploaded_files.aggregate(models.Sum('value'))['value__sum'] or Money(0, 'USD')
-            project.budget = total_budget
-            project.save()
-            client = self.project.client
-
-        super().save()
-
 
 class Task(models.Model):
     project = models.ForeignKey(Project, related_name='tasks', on_delete=models.CASCADE, null=True, blank=True)
@@ -409,17 +374,22 @@ class Task(models.Model):
 
     owner = models.ForeignKey(User, related_name='user_tasks', on_delete=models.SET_NULL, null=True, blank=True)
 
+    # Subtask counters, maintained by apps.home.progress
+    subtasks_total = models.PositiveIntegerField(default=0)
+    subtasks_completed = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.title
 
-    def save(self, *arg, **kwargs):
-        super().save()
+    def save(self, *args, **kwargs):
+        # A stale instance must not overwrite the counters
+        if self.pk and not kwargs.get('update_fields'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('subtasks_total', 'subtasks_completed')
+            ]
 
-        if self.project:
-            total_tasks = self.project.tasks.count()
-            completed_tasks = self.project.tasks.filter(completed=True).count()
-            self.project.completition = int((completed_tasks / total_tasks) * 100)
-            self.project.save()
+        super().save(*args, **kwargs)
 
 
 class SubTask(models.Model):
@@ -442,17 +412,10 @@ class SubTask(models.Model):
     def __str__(self):
         return self.title
 
-    def save(self, *arg, **kwargs):
-        super().save()
-
-        if self.task:
-            total_subtasks = self.task.subtasks.count()
-            completed_subtasks = self.task.subtasks.filter(completed=True).count()
-            self.task.completed = total_subtasks == completed_subtasks
-            self.task.save()
 
+class Office(SlugMixin):
+    slug_source = 'company_name'
 
-class Office(models.Model):
     slug = models.SlugField(max_length=100, default='')
 
     avatar = models.ImageField(upload_to='uploads/offices/avatar',
@@ -477,26 +440,10 @@ class Office(models.Model):
 
         super(Office, self).delete(*args, **kwargs)
 
-    def save(self, *args, **kwargs):
-        super().save()
-
-        if not self.slug and self.company_name != '':
-            self.slug = slugify(self.company_name + '-' + str(self.id))
-            self.save()
-        elif self.slug != slugify(self.company_name + '-' + str(self.id)) or kwargs.get('slug'):
-            self.slug = slugify(self.company_name + '-' + str(self.id))
-            self.save()
-        elif self.company_name == '':
-            self.slug = slugify(str(self.id))
-            self.save()
-        elif self.slug.endswith('none'):
-            self.slug = self.slug.replace('none', str(self.id))
-            self.save()
-        else:
-            pass
 
+class Client(SlugMixin):
+    slug_source = 'name'
 
-class Client(models.Model):
     slug = models.SlugField(max_length=100, default='')
     avatar = models.ImageField(upload_to='client_pics',
                                default='placeholder.webp')
@@ -528,24 +475,6 @@ class Client(models.Model):
 
         super(Client, self).delete(*args, **kwargs)
 
-    def save(self, *args, **kwargs):
-        super().save()
-
-        if not self.slug and self.name != '':
-            self.slug = slugify(self.name + '-' + str(self.id))
-            self.save()
-        elif self.slug != slugify(self.name + '-' + str(self.id)) or kwargs.get('slug'):
-            self.slug = slugify(self.name + '-' + str(self.id))
-            self.save()
-        elif self.name == '':
-            self.slug = slugify(str(self.id))
-            self.save()
-        elif self.slug.endswith('none'):
-            self.slug = self.slug.replace('none', str(self.id))
-            self.save()
-        else:
-            pass
-
 
 class Branch(models.Model):
     # Foreign Keys and Relationships
@@ -565,6 +494,116 @@ class Branch(models.Model):
         return f'{self.name} ({self.client.name})'
 
 
+INCOME_CATEGORIES = [
+    ############ Receita Bruta ###########
+    'Juros Obtidos',
+    'Integralização de capital',
+    'Rendimentos de aplicações financeiras',
+    'Vendas de mercadorias',
+    'Vendas de equipamentos',
+    'Prestação de serviços',
+    'Royalties',
+    'Outros não operacionais',
+]
+
+EXPENSE_CATEGORIES = [
+    ######### Deduções de impostos ########
+    'COFINS',
+    'CSLL',
+    'ICMS',
+    'IPI',
+    'IRPJ',
+    'PIS',
+    'ISS',
+    'Simples nacional',
+    'IRPJ trimestral',
+    'CSLL trimestral',
+    ############ Custos diretos ###########
+    'Custos diretos',
+    ########## Despesas comerciais ########
+    'Endomarketing',
+    'Taxa de propaganda e publicidade',
+    ### Despesas administrativas/gerais ###
+    'Agua',
+    'Aluguel',
+    'Aluguel de máquinas',
+    'Associações/Convênios',
+    'Cartorio/Documentos',
+    'Cetificado Digital',
+    'Combustível/Estacionamento',
+    'Condomínio',
+    'Consultoria',
+    'Contabilidade',
+    'Energia elétrica',
+    'Jurídico',
+    'Marketing e publicidade',
+    'Material de escritório',
+    'Monitoramento e segurança',
+    'Multas gerais',
+    'Reembolso geral',
+    'Seguro',
+    'Software/Sistemas',
+    'Suporte TI',
+    'Telefone/Internet/TV',
+    'Transporte/Uber',
+    'Uso interno',
+    'Viagem/Hospedagem',
+    'Depreciação e amortização',
+    ######## Despesas com ocupação #######
+    'Estadual',
+    'IPTU',
+    'Licenças/Alvarás',
+    'Municipal',
+    'Prefeitura',
+    'Sindicato patronal',
+    ########## Despesas pessoal ##########
+    'Adiantamento salarial',
+    'Alimentação',
+    'Contribuição sindical',
+    'FGTS',
+    'Imposto de renda IRPF',
+    'INSS',
+    'Medicina do trabalho',
+    'Premiação/Bonificação/Confraternização',
+    'Provisão 13',
+    'Provisão férias',
+    'Rescisão',
+    'Salário',
+    'Terceirização de pessoal',
+    'Treinamento',
+    'Uniforme/EPI',
+    'Vale transporte',
+    ###### Despesas de provisionados ######
+    'Amortização de empréstimo',
+    'FGTS 13',
+    'INSS 13',
+    'Pagamento 13',
+    'Pagamento férias',
+    ####### Despesas com manutenção #######
+    'Manutenção de veículos',
+    'Manutenção de equipamentos',
+    'Material de limpeza e higiene',
+    'Reparos/Obras',
+    'Utensílios',
+    ######### Despesas com banco ##########
+    'Tarifas bancárias',
+    ######### Despesas financeiras ########
+    'Cartão pré-pago',
+    'IOF/IR sobre aplicações',
+    'Juros e multa (atraso)',
+    'Juros empréstimos',
+    ############ Investimentos ############
+    'Aplicações financeiras',
+    'Equipamentos',
+    'Cotas outras empresas',
+    'Colaboradores',
+    'Veículos',
+    'Obras',
+    # Imposto de renda e contribuição social #
+    'Imposto de renda e contribuição social',
+]
+
+
 # TODO: Add currency
 class Bill(models.Model):
     # Foreign Keys and Relationships
@@ -611,6 +650,10 @@ class Bill(models.Model):
     # Text Fields
     payment_info = models.TextField(default='')
 
+    class Meta:
+        # Per-currency MIN/MAX of the balance slider (see apps.home.bounds)
+        indexes = [models.Index(fields=['total_currency', 'total'])]
+
     def __str__(self):
         return self.title
 
@@ -621,28 +664,30 @@ class Bill(models.Model):
 
         super(Bill, self).delete(*args, **kwargs)
 
-    def save(self, *args, **kwargs):
-        if self.due_date:
-            check_late = datetime.strptime(str(self.due_date), '%Y-%m-%d').date() < datetime.now().date()
-            if check_late and not self.paid:
-                self.late = True
-        else:
-            self.late = False
+    def installment_schedule(self):
+        return self.installments.aggregate(
+            next_due=models.Min('due_date', filter=models.Q(paid=False)), last_due=models.Max('due_date')
+        )
 
-        super().save(*args, **kwargs)
+    def snap_due_date(self, schedule):
+        # Bills with installments are due on the next unpaid installment, or on the last one once all are paid
+        if schedule['last_due'] is None or self.due_date in [schedule['next_due'], schedule['last_due']]:
+            return
 
-        if self.paid:
-            self.late = False
-            if self.installments_number > 1:
-                self.partial = sum([installment.value for installment in self.installments.filter(paid=True)])
-            else:
-                self.partial = self.total
+        self.due_date = schedule['next_due'] or schedule['last_due']
 
+    def save(self, *args, **kwargs):
+        # total and partial of bills with installments are kept up to date by apps.home.ledger
+        if self.pk and int(self.installments_number) > 1:
+            self.snap_due_date(self.installment_schedule())
+
+        if self.due_date and not self.paid:
+            self.late = datetime.strptime(str(self.due_date), '%Y-%m-%d').date() < datetime.now().date()
         else:
-            if int(self.installments_number) > 1 and self.installments.exists():
-                self.partial = sum([installment.value for installment in self.installments.filter(paid=True)])
-            else:
-                self.partial = 0
+            self.late = False
+
+        if int(self.installments_number) <= 1:
+            self.partial = self.total if self.paid else 0
 
         super().save(*args, **kwargs)
 
@@ -673,10 +718,6 @@ class BillInstallment(models.Model):
     def __str__(self):
         return f'[{self.partial_id}/{self.bill.installments}] {self.bill.title} - {self.due_date}'
 
-    def save(self, *args, **kwargs):
-        super().save()
-        self.bill.save()
-
 
 class BillProof(models.Model):
     bill = models.ForeignKey(Bill, related_name='proofs', on_delete=models.CASCADE, null=True)
@@ -722,12 +763,12 @@ class Document(models.Model):
 
     # File Fields
     file = models.FileField(upload_to=custom_upload_path_documents, max_length=500, blank=True, null=True)
+    blob = models.ForeignKey('Blob', related_name='documents', on_delete=models.SET_NULL, null=True, blank=True)
 
     def __str__(self):
         return self.name
 
     def delete(self, *args, **kwargs):
-        self.file.delete(save=False)
         super(Document, self).delete(*args, **kwargs)
 
         if self.category == 'ASO':
@@ -785,6 +826,17 @@ class Document(models.Model):
             office.save()
 
 
+COMMON_LINK_ICONS = {
+    'my.sharepoint.com': 'onedrive.svg',
+    'onedrive': 'onedrive.svg',
+    'drive.google.com': 'google-drive.svg',
+    'youtube': 'youtube.svg',
+    'github': 'github.svg',
+}
+
+FAVICON_PLACEHOLDER = 'https://img.icons8.com/ios/50/ios-application-placeholder.png'
+
+
 class Link(models.Model):
     # Foreign Keys and Relationships
     project = models.ForeignKey(Project, related_name='links', on_delete=models.SET_NULL, null=True, blank=True)
@@ -805,32 +857,16 @@ class Link(models.Model):
         return self.path
 
     def save(self, *args, **kwargs):
-        super().save()
-
-        # Correlation
-        correlation = {
-            'my.sharepoint.com': 'onedrive.svg',
-            'onedrive': 'onedrive.svg',
-            'drive.google.com': 'google-drive.svg',
-            'youtube': 'youtube.svg',
-            'github': 'github.svg',
-        }
-
         if not self.icon:
-            for key, value in correlation.items():
-                if key in self.path:
-                    self.icon = f'/static/assets/img/icons/common/{value}'
-                    break
-
-            if not self.icon:
-                favicon = get_favicon(self.path)
-                self.icon = favicon if favicon else 'https://img.icons8.com/ios/50/ios-application-placeholder.png'
-
-            self.save()
+            self.icon = next((
+                f'/static/assets/img/icons/common/{value}' for key, value in COMMON_LINK_ICONS.items() if key in self.path
+            ), FAVICON_PLACEHOLDER)
 
         if not self.title:
             self.title = self.path.split('//')[-1]
-            self.save()
+
+        # Placeholder icons are resolved in the background (see apps.home.favicons)
+        super().save(*args, **kwargs)
 
 
 class Meeting(models.Model):
@@ -845,16 +881,26 @@ class Meeting(models.Model):
     start = models.DateTimeField(null=True, blank=True)
     end = models.DateTimeField(null=True, blank=True)
 
-    questions = PickledObjectField(default=list)
-    topics = PickledObjectField(default=list)
-    external_participants = PickledObjectField(default=list)
-    invited_participants = PickledObjectField(default=list)
+    questions = models.JSONField(default=list)
+    topics = models.JSONField(default=list)
+    external_participants = models.JSONField(default=list)
+    invited_participants = models.JSONField(default=list)
 
     summary = models.TextField(default='')
 
     url = models.URLField()
 
 
+# Queryable copy of Meeting.external_participants, kept in sync by signals (see apps.home.participants)
+class ExternalParticipant(models.Model):
+    meeting = models.ForeignKey(Meeting, related_name='externals', on_delete=models.CASCADE)
+    email = models.CharField(max_length=254)
+    domain = models.CharField(max_length=254, db_index=True)
+
+    def __str__(self):
+        return self.email
+
+
 class BankAccount(models.Model):
     # Foreign Keys and Relationships
     user = models.ForeignKey(User, related_name='bank_accounts', on_delete=models.CASCADE, null=True, blank=True)
@@ -880,7 +926,98 @@ class BankAccount(models.Model):
         return f'{self.bank_name} - {self.agency} - {self.account}'
 
     def save(self, *args, **kwargs):
-        if not self.bank_name or self.bank_name != BANKS[self.bank_code]:
-            self.bank_name = BANKS[self.bank_code]
+        if not self.bank_name or self.bank_name != banks()[self.bank_code]:
+            self.bank_name = banks()[self.bank_code]
 
         super().save(*args, **kwargs)
+
+
+class JobWatermark(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    watermark = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.watermark})'
+
+
+class CashFlowMonth(models.Model):
+    # Monthly rollup of paid bills, kept up to date by apps.home.cashflow
+    office = models.ForeignKey(Office, related_name='cash_flow', on_delete=models.CASCADE, null=True, blank=True)
+    client = models.ForeignKey(Client, related_name='cash_flow', on_delete=models.CASCADE, null=True, blank=True)
+
+    kind = models.CharField(max_length=10, choices=[('income', 'Income'), ('expense', 'Expense')])
+    currency = models.CharField(max_length=3, default='BRL')
+    month = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('office', 'client', 'kind', 'currency', 'month')
+        indexes = [models.Index(fields=['month', 'kind'])]
+
+    def __str__(self):
+        return f'{self.month:%Y-%m} {self.kind} {self.currency} {self.total}'
+
+
+class Favicon(models.Model):
+    # Per-domain favicon cache; icon is empty when the domain had none (negative cache)
+    domain = models.CharField(max_length=255, unique=True)
+    icon = models.CharField(max_length=100, blank=True, null=True)
+    fetched_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.domain} ({self.icon or "none"})'
+
+
+class UploadSession(models.Model):
+    # Resumable chunked upload of an UploadedFile (see apps.home.uploads)
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(Project, related_name='upload_sessions', on_delete=models.CASCADE)
+    uploaded_by = models.ForeignKey(User, related_name='upload_sessions', on_delete=models.CASCADE)
+    uploaded_file = models.ForeignKey(UploadedFile, related_name='upload_sessions', on_delete=models.SET_NULL,
+                                      null=True, blank=True)
+    name = models.CharField(max_length=500)
+    filename = models.CharField(max_length=255)
+    checksum = models.CharField(max_length=64, blank=True, default='')
+    multipart_id = models.CharField(max_length=255, blank=True, default='')
+
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+
+    parts = models.JSONField(default=list)
+    metadata = models.JSONField(default=dict)
+
+    completed = models.BooleanField(default=False)
+    verified = models.BooleanField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.received}/{self.size})'
+
+
+class Blob(models.Model):
+    # Stored content shared by every UploadedFile and Document with the same bytes (see apps.home.blobs)
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=500)
+    size = models.BigIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
+
+
+class SearchEntry(models.Model):
+    # One row per searchable object, mirrored into the full-text index (see apps.home.search)
+    kind = models.CharField(max_length=20)
+    object_id = models.PositiveIntegerField()
+
+    title = models.CharField(max_length=255, default='')
+    body = models.TextField(default='')
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}: {self.title}'
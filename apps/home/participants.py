@@ -0,0 +1,33 @@
+from apps.home.models import Meeting, ExternalParticipant
+
+
+# Meeting.external_participants stays the list the API sends; ExternalParticipant rows mirror it so meetings can be
+# filtered by participant domain through an index.
+
+def email_domain(email):
+    return email.rsplit('@', 1)[-1].strip().lower() if '@' in email else ''
+
+
+def sync_external_participants(meeting):
+    emails = {email for email in meeting.external_participants or [] if email}
+    stored = set(meeting.externals.values_list('email', flat=True))
+
+    if emails == stored:
+        return
+
+    meeting.externals.filter(email__in=stored - emails).delete()
+    ExternalParticipant.objects.bulk_create([
+        ExternalParticipant(meeting=meeting, email=email, domain=email_domain(email)) for email in emails - stored
+    ])
+
+
+def meetings_with_domain(queryset, domain):
+    domain = domain.strip().lstrip('@').lower()
+    return queryset.filter(pk__in=ExternalParticipant.objects.filter(domain=domain).values('meeting_id'))
+
+
+def listed_meetings():
+    # The lists are only shown on the details page
+    return Meeting.objects.defer(
+        'questions', 'topics', 'external_participants', 'invited_participants'
+    ).select_related('project__client').order_by('-start')
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.cache import cache
+from apps.home.models import Client, Profile
+
+
+# Select options shared by many pages, cached under a version number per namespace. Saving or deleting a model
+# the options come from bumps the version (see signals), so stale entries are simply never read again.
+
+def cache_version(namespace):
+    return cache.get_or_set(f'{namespace}:version', 1, None)
+
+
+def bump_version(namespace):
+    try:
+        cache.incr(f'{namespace}:version')
+    except ValueError:
+        cache.set(f'{namespace}:version', 1, None)
+
+
+def versioned(namespace, name, build, timeout=None):
+    key = f'{namespace}:{cache_version(namespace)}:{name}'
+
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout or settings.PICKERS_CACHE_TIMEOUT)
+
+    return value
+
+
+def client_picker():
+    return versioned('pickers', 'clients', lambda: list(Client.objects.order_by('name').values('id', 'name')))
+
+
+def collaborator_picker():
+    def build():
+        profiles = Profile.objects.filter(user__username__endswith='@infinitefoundry.com').exclude(
+            user__username__startswith='admin@').values('id', 'user_id', 'user__first_name', 'user__last_name')
+
+        return [{
+            'id': profile['id'],
+            'user_id': profile['user_id'],
+            'name': f'{profile["user__first_name"]} {profile["user__last_name"]}'.strip(),
+        } for profile in profiles]
+
+    return versioned('pickers', 'collaborators', build)
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.cache import cache
+from apps.home.models import Profile
+
+
+# The signed-in user's profile, shown by every page (navigation, avatar). Loaded once per request and kept in the
+# cache for a short time; saving the profile, its user or its office drops the entry (see signals).
+
+def profile_key(user_id):
+    return f'profile:{user_id}'
+
+
+def load_profile(user):
+    profile = cache.get(profile_key(user.pk))
+    if profile is None:
+        profile, created = Profile.objects.select_related('user', 'office').get_or_create(user=user)
+        cache.set(profile_key(user.pk), profile, settings.PROFILE_CACHE_TIMEOUT)
+
+    return profile
+
+
+def request_profile(request):
+    if not hasattr(request, '_user_profile'):
+        request._user_profile = load_profile(request.user) if request.user.is_authenticated else None
+
+    return request._user_profile
+
+
+def forget_profiles(user_ids):
+    cache.delete_many([profile_key(user_id) for user_id in user_ids])
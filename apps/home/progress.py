@@ -0,0 +1,140 @@
+from datetime import datetime
+from django.db import transaction
+from django.db.models import F, Q, Case, When, Value, Count
+from apps.home.models import Project, Task
+
+
+# Projects and tasks keep counters of their (sub)tasks, adjusted by one UPDATE per change instead of COUNT queries.
+# Project progress is weighted by subtasks: every task and every subtask is one unit of work.
+
+def progress_expression():
+    return Case(
+        When(Q(tasks_total__gt=0) | Q(subtasks_total__gt=0),
+             then=(F('tasks_completed') + F('subtasks_completed')) * 100 / (F('tasks_total') + F('subtasks_total'))),
+        default=Value(0),
+    )
+
+
+def apply_project_delta(project_id, **deltas):
+    deltas = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not project_id or not deltas:
+        return
+
+    with transaction.atomic():
+        Project.objects.filter(pk=project_id).update(**deltas)
+        # Separate statement: not every database sees the new counters within the same UPDATE
+        Project.objects.filter(pk=project_id).update(completition=progress_expression())
+
+
+def task_saved(instance, previous):
+    completed = int(instance.completed)
+
+    if previous is None:
+        apply_project_delta(instance.project_id, tasks_total=1, tasks_completed=completed)
+    elif previous['project_id'] != instance.project_id:
+        apply_project_delta(
+            previous['project_id'], tasks_total=-1, tasks_completed=-int(previous['completed']),
+            subtasks_total=-instance.subtasks_total, subtasks_completed=-instance.subtasks_completed,
+        )
+        apply_project_delta(
+            instance.project_id, tasks_total=1, tasks_completed=completed,
+            subtasks_total=instance.subtasks_total, subtasks_completed=instance.subtasks_completed,
+        )
+    else:
+        apply_project_delta(instance.project_id, tasks_completed=completed - int(previous['completed']))
+
+
+def task_deleted(instance, previous=None):
+    # Its subtasks are deleted first (cascade) and already took their counts off the project
+    previous = previous or {'completed': instance.completed, 'project_id': instance.project_id}
+    apply_project_delta(previous['project_id'], tasks_total=-1, tasks_completed=-int(previous['completed']))
+
+
+def apply_subtask_delta(task_id, total, completed):
+    if not task_id or not (total or completed):
+        return None
+
+    Task.objects.filter(pk=task_id).update(
+        subtasks_total=F('subtasks_total') + total, subtasks_completed=F('subtasks_completed') + completed
+    )
+    task = Task.objects.filter(pk=task_id).only(
+        'id', 'project_id', 'completed', 'subtasks_total', 'subtasks_completed').first()
+
+    if task is not None:
+        apply_project_delta(task.project_id, subtasks_total=total, subtasks_completed=completed)
+
+    return task
+
+
+def sync_task_completion(task):
+    # A task with subtasks is completed when all of them are
+    completed = task.subtasks_total == task.subtasks_completed
+    if task.subtasks_total and task.completed != completed:
+        task.completed = completed
+        task.save(update_fields=['completed'])
+
+
+def subtask_saved(instance, previous):
+    completed = int(instance.completed)
+
+    if previous is None:
+        task = apply_subtask_delta(instance.task_id, 1, completed)
+    elif previous['task_id'] != instance.task_id:
+        apply_subtask_delta(previous['task_id'], -1, -int(previous['completed']))
+        task = apply_subtask_delta(instance.task_id, 1, completed)
+    else:
+        task = apply_subtask_delta(instance.task_id, 0, completed - int(previous['completed']))
+        if task is None:
+            task = Task.objects.filter(pk=instance.task_id).only(
+                'id', 'completed', 'subtasks_total', 'subtasks_completed').first()
+
+    if task is not None:
+        sync_task_completion(task)
+
+
+def subtask_deleted(instance, previous=None):
+    previous = previous or {'completed': instance.completed, 'task_id': instance.task_id}
+    apply_subtask_delta(previous['task_id'], -1, -int(previous['completed']))
+
+
+def complete_subtasks(task, user):
+    # Bulk UPDATE without signals, so the counters are adjusted here
+    completed = task.subtasks.filter(completed=False).update(
+        completed=True, completed_by=user, completed_at=datetime.now()
+    )
+    apply_subtask_delta(task.id, 0, completed)
+    task.subtasks_completed += completed
+
+
+def repair_counters():
+    # Recounts everything from the rows, for data written around the signals (bulk updates, raw SQL, fixtures)
+    tasks = Task.objects.annotate(
+        total=Count('subtasks'), done=Count('subtasks', filter=Q(subtasks__completed=True))
+    ).only('id', 'subtasks_total', 'subtasks_completed')
+
+    fixed_tasks = [task for task in tasks if (task.subtasks_total, task.subtasks_completed) != (task.total, task.done)]
+    for task in fixed_tasks:
+        task.subtasks_total, task.subtasks_completed = task.total, task.done
+    Task.objects.bulk_update(fixed_tasks, ['subtasks_total', 'subtasks_completed'], batch_size=500)
+
+    projects = Project.objects.annotate(
+        total=Count('tasks', distinct=True),
+        done=Count('tasks', filter=Q(tasks__completed=True), distinct=True),
+        sub_total=Count('tasks__subtasks', distinct=True),
+        sub_done=Count('tasks__subtasks', filter=Q(tasks__subtasks__completed=True), distinct=True),
+    ).only('id', 'tasks_total', 'tasks_completed', 'subtasks_total', 'subtasks_completed')
+
+    fixed_projects = []
+    for project in projects:
+        counters = (project.total, project.done, project.sub_total, project.sub_done)
+        if (project.tasks_total, project.tasks_completed, project.subtasks_total,
+                project.subtasks_completed) != counters:
+            project.tasks_total, project.tasks_completed, project.subtasks_total, project.subtasks_completed = counters
+            fixed_projects.append(project)
+
+    Project.objects.bulk_update(
+        fixed_projects, ['tasks_total', 'tasks_completed', 'subtasks_total', 'subtasks_completed'], batch_size=500
+    )
+    Project.objects.update(completition=progress_expression())
+
+    return len(fixed_tasks), len(fixed_projects)
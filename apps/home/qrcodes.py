@@ -0,0 +1,86 @@
+import hashlib
+from io import BytesIO
+from django.utils.text import slugify
+from django.core.files.base import ContentFile
+from apps.home.models import Equipments, Profile
+
+
+# QR codes are rendered off the request and keyed by a hash of their payload: a row whose stored hash matches
+# its current payload already has the right image, so it is neither rendered nor uploaded again.
+
+def equipment_payload(equipment):
+    return (f'Name: {equipment.name}\n'
+            f'Series: {equipment.series}\n'
+            f'ID: {equipment.custom_id}\n'
+            f'Acquisition: {equipment.acquisition_date.strftime("%d/%m/%Y")}')
+
+
+def profile_payload(profile):
+    return "https://hub.infinitefoundry.com/members/" + profile.user.username.split('@')[0]
+
+
+def payload_hash(payload):
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def render_qrcode(payload):
+    import qrcode  # only needed by the worker, kept out of startup
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    temp_file = BytesIO()
+    img.save(temp_file, format='PNG')
+
+    return temp_file.getvalue()
+
+
+def equipment_needs_qrcode(equipment):
+    return equipment.qrcode.name == 'placeholder.webp' or equipment.qrcode_hash != payload_hash(
+        equipment_payload(equipment))
+
+
+def profile_needs_qrcode(profile):
+    return not profile.qrcode or profile.qrcode_hash != payload_hash(profile_payload(profile))
+
+
+def store_qrcode(model, instance, file_name, payload):
+    digest = payload_hash(payload)
+
+    previous = instance.qrcode.name if instance.qrcode else None
+    instance.qrcode.save(file_name, ContentFile(render_qrcode(payload)), save=False)
+    model.objects.filter(pk=instance.pk).update(qrcode=instance.qrcode.name, qrcode_hash=digest)
+
+    if previous and previous != instance.qrcode.name and previous != 'placeholder.webp':
+        instance.qrcode.storage.delete(previous)
+
+    return True
+
+
+def refresh_equipment_qrcode(equipment_id, force=False):
+    equipment = Equipments.objects.filter(pk=equipment_id).first()
+    if equipment is None or not (force or equipment_needs_qrcode(equipment)):
+        return False
+
+    return store_qrcode(
+        Equipments, equipment, f'{equipment.custom_id}_{equipment.name.lower()}.png', equipment_payload(equipment)
+    )
+
+
+def refresh_profile_qrcode(profile_id, force=False):
+    profile = Profile.objects.select_related('user').filter(pk=profile_id).first()
+    if profile is None or not (force or profile_needs_qrcode(profile)):
+        return False
+
+    return store_qrcode(
+        Profile, profile, f'{slugify(profile.user.get_full_name())}_{profile.id}.png', profile_payload(profile)
+    )
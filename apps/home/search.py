@@ -0,0 +1,231 @@
+import re
+from django.urls import reverse
+from django.db import connection, transaction
+from apps.home.models import SearchEntry, Project, Client, Document, Meeting, Task
+
+
+# Global search: every project, client, document, meeting and task has a SearchEntry row (title + body text),
+# indexed by SQLite FTS5 or a PostgreSQL tsvector expression index (see migration 0113_searchentry). Signals keep
+# the rows in sync and the index follows them (FTS5 triggers / the expression index). Other databases fall back
+# to a LIKE scan. Project has no description, its "about" text is indexed instead.
+
+FTS_TABLE = 'home_searchentry_fts'
+TSVECTOR = "to_tsvector('simple', title || ' ' || body)"
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def flatten(value):
+    # Meeting topics and questions are free-form lists (of strings or dicts)
+    if isinstance(value, dict):
+        return ' '.join(flatten(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return ' '.join(flatten(item) for item in value)
+
+    return '' if value is None else str(value)
+
+
+def join(*parts):
+    return '\n'.join(part for part in parts if part)
+
+
+SOURCES = {
+    'project': (
+        Project, ('title', 'about', 'client_str', 'country'),
+        lambda project: (project.title, join(project.about, project.client_str, project.country)),
+    ),
+    'client': (
+        Client, ('name', 'area', 'location', 'cnpj', 'description'),
+        lambda client: (client.name, join(client.area, client.location, client.cnpj, client.description)),
+    ),
+    'document': (
+        Document, ('name', 'category', 'description'),
+        lambda document: (document.name, join(document.category, document.description)),
+    ),
+    'meeting': (
+        Meeting, ('title', 'summary', 'topics', 'questions'),
+        lambda meeting: (meeting.title, join(meeting.summary, flatten(meeting.topics), flatten(meeting.questions))),
+    ),
+    'task': (
+        Task, ('title', 'description'),
+        lambda task: (task.title, task.description),
+    ),
+}
+
+KINDS = {model: kind for kind, (model, _, _) in SOURCES.items()}
+
+
+def entry_for(kind, instance):
+    title, body = SOURCES[kind][2](instance)
+    return SearchEntry(kind=kind, object_id=instance.pk, title=(title or '')[:255], body=body or '')
+
+
+def needs_index(instance, update_fields=None):
+    # Counter and status updates (save(update_fields=...)) don't touch the indexed text
+    return not update_fields or bool(set(update_fields) & set(SOURCES[KINDS[type(instance)]][1]))
+
+
+def index(instance):
+    kind = KINDS[type(instance)]
+    entry = entry_for(kind, instance)
+
+    SearchEntry.objects.update_or_create(
+        kind=kind, object_id=instance.pk, defaults={'title': entry.title, 'body': entry.body}
+    )
+
+
+def index_many(instances):
+    # For rows written with bulk_create, which sends no signals
+    SearchEntry.objects.bulk_create([entry_for(KINDS[type(instance)], instance) for instance in instances])
+
+
+def unindex(instance):
+    SearchEntry.objects.filter(kind=KINDS[type(instance)], object_id=instance.pk).delete()
+
+
+def rebuild_index(batch_size=500):
+    with transaction.atomic():
+        SearchEntry.objects.all().delete()
+
+        count = 0
+        for kind, (model, fields, _) in SOURCES.items():
+            queryset = model.objects.only('id', *fields).iterator(chunk_size=batch_size)
+            entries = [entry_for(kind, instance) for instance in queryset]
+            SearchEntry.objects.bulk_create(entries, batch_size=batch_size)
+            count += len(entries)
+
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+
+    return count
+
+
+def match_expression(query):
+    # Every word must match, as a prefix; the user's input never reaches the FTS5 query syntax
+    return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(query))
+
+
+def like_escape(query):
+    # % and _ typed by the user are matched literally
+    return query.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+
+
+def search_sql(query):
+    # (FROM/WHERE clause, its params, rank expression (lower is better), its params, snippet expression)
+    if connection.vendor == 'sqlite':
+        return (
+            f'FROM {FTS_TABLE} JOIN home_searchentry e ON e.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH %s',
+            [match_expression(query)],
+            f'bm25({FTS_TABLE}, 10.0, 1.0)', [],
+            f"snippet({FTS_TABLE}, 1, '', '', '...', 16)",
+        )
+
+    if connection.vendor == 'postgresql':
+        return (
+            f"FROM home_searchentry e WHERE {TSVECTOR} @@ websearch_to_tsquery('simple', %s)", [query],
+            f"-ts_rank({TSVECTOR}, websearch_to_tsquery('simple', %s))", [query],
+            'substr(e.body, 1, 160)',
+        )
+
+    pattern = f'%{like_escape(query)}%'
+    return (
+        "FROM home_searchentry e WHERE (e.title LIKE %s ESCAPE '!' OR e.body LIKE %s ESCAPE '!')", [pattern, pattern],
+        "CASE WHEN e.title LIKE %s ESCAPE '!' THEN 0 ELSE 1 END", [pattern],
+        'substr(e.body, 1, 160)',
+    )
+
+
+class SearchResults:
+    # Lazy, sliceable result set so django.core.paginator.Paginator can page it with COUNT + LIMIT/OFFSET
+    def __init__(self, query, kinds=None):
+        self.query = query.strip()
+        self.kinds = [kind for kind in (kinds or []) if kind in SOURCES]
+        self._count = None
+
+    def where(self):
+        source, params, rank, rank_params, snippet = search_sql(self.query)
+        if self.kinds:
+            source += f" AND e.kind IN ({', '.join(['%s'] * len(self.kinds))})"
+            params = params + self.kinds
+
+        return source, params, rank, rank_params, snippet
+
+    def count(self):
+        if self._count is None:
+            if not TOKEN_RE.search(self.query):
+                self._count = 0
+            else:
+                source, params, *_ = self.where()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) {source}', params)
+                    self._count = cursor.fetchone()[0]
+
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or not TOKEN_RE.search(self.query):
+            return []
+
+        source, params, rank, rank_params, snippet = self.where()
+        start, stop = item.start or 0, item.stop if item.stop is not None else self.count()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT e.kind, e.object_id, e.title, {snippet}, {rank} AS rank {source} '
+                f'ORDER BY rank, e.id LIMIT %s OFFSET %s',
+                rank_params + params + [max(stop - start, 0), start],
+            )
+            rows = cursor.fetchall()
+
+        return resolve_results(rows)
+
+
+def object_urls(kind, ids):
+    if kind == 'project':
+        return {pk: reverse('project_details', kwargs={'slug': slug})
+                for pk, slug in Project.objects.filter(pk__in=ids).values_list('id', 'slug')}
+
+    if kind == 'client':
+        return {pk: reverse('client_details', kwargs={'slug': slug})
+                for pk, slug in Client.objects.filter(pk__in=ids).values_list('id', 'slug')}
+
+    if kind == 'meeting':
+        return {pk: reverse('meeting_details', kwargs={'meeting_id': pk}) for pk in ids}
+
+    if kind == 'task':
+        urls = {}
+        for pk, project_slug, meeting_id in Task.objects.filter(pk__in=ids).values_list(
+                'id', 'project__slug', 'meeting_id'):
+            if project_slug:
+                urls[pk] = reverse('project_details', kwargs={'slug': project_slug})
+            elif meeting_id:
+                urls[pk] = reverse('meeting_details', kwargs={'meeting_id': meeting_id})
+        return urls
+
+    urls = {}
+    for pk, client_slug, office_slug, profile_slug in Document.objects.filter(pk__in=ids).values_list(
+            'id', 'client__slug', 'office__slug', 'user__profile__slug'):
+        if client_slug:
+            urls[pk] = reverse('client_details', kwargs={'slug': client_slug})
+        elif office_slug:
+            urls[pk] = reverse('office_documents', kwargs={'slug': office_slug})
+        elif profile_slug:
+            urls[pk] = reverse('collaborator_details', kwargs={'slug': profile_slug})
+    return urls
+
+
+def resolve_results(rows):
+    # One URL query per kind on the page
+    ids = {}
+    for kind, object_id, *_ in rows:
+        ids.setdefault(kind, []).append(object_id)
+
+    urls = {kind: object_urls(kind, kind_ids) for kind, kind_ids in ids.items()}
+
+    return [{
+        'kind': kind, 'id': object_id, 'title': title, 'snippet': snippet, 'rank': rank,
+        'url': urls[kind].get(object_id),
+    } for kind, object_id, title, snippet, rank in rows]
@@ -0,0 +1,25 @@
+from apps.home.models import Project, Profile, Office, Client
+
+
+SLUGGED = {
+    'projects': lambda: Project.objects.only('id', 'slug', 'title'),
+    'profiles': lambda: Profile.objects.select_related('user').only(
+        'id', 'slug', 'user__id', 'user__first_name', 'user__last_name'),
+    'offices': lambda: Office.objects.only('id', 'slug', 'company_name'),
+    'clients': lambda: Client.objects.only('id', 'slug', 'name'),
+}
+
+
+def reslug(name, batch_size=500):
+    # Only the rows whose slug changed are written, in bulk UPDATEs (no save() and no signals)
+    queryset = SLUGGED[name]()
+
+    changed = []
+    for instance in queryset.iterator(chunk_size=batch_size):
+        slug = instance.build_slug()
+        if instance.slug != slug:
+            instance.slug = slug
+            changed.append(instance)
+
+    queryset.model.objects.bulk_update(changed, ['slug'], batch_size=batch_size)
+    return len(changed)
@@ -1,6 +1,7 @@
 from django import template
 from django.template.defaultfilters import stringfilter
-from apps.home.models import Office, Branch
+from apps.home.lookups import office_names
+from apps.home.filter_spec import parse_filters
 from datetime import datetime
 from django.db.models.query import QuerySet
 
@@ -124,18 +125,17 @@ def split(value, split_tag):
 @register.filter(name='office_name')
 @stringfilter
 def office_name(value):
-    return Office.objects.get(id=int(value)).name
+    return office_names().get(int(value), '') if value.isdigit() else ''
 
 
 @register.filter(name='extract_from_key')
-@stringfilter
 def extract_from_key(value, key):
-    key_pairs = value.split('&')
-    extracted_value = [val for val in key_pairs if val.startswith(key)][0].split('=')[1]
+    spec = parse_filters(value)
+    key = key.rstrip('=')
     if key == 'collaborators':
-        extracted_value = extracted_value.split('-')
-        return [int(val) for val in extracted_value]
+        return spec.ids(key)
 
+    extracted_value = spec.get(key, '')
     if extracted_value.isdigit():
         return int(extracted_value)
     elif '.' in extracted_value:
@@ -151,18 +151,8 @@ def first_filter(value, filter):
 
 
 @register.filter(name='unique')
-@stringfilter
 def unique(value, string):
-    list_of_string = value.split('&')
-    count = 0
-
-    for tag in list_of_string:
-        if string in tag:
-            count += 1
-            if count > 1:
-                return False
-
-    return True
+    return len([key for key in parse_filters(value).keys() if string in key]) <= 1
 
 
 @register.filter(name='without_currency')
@@ -185,54 +175,21 @@ def email_tag(value):
 
 
 @register.filter(name='from_to')
-@stringfilter
 def from_to(value):
-    list_of_string = value.split('&')
-    from_in = False
-    to_in = False
-    for tag in list_of_string:
-        if tag.startswith('from'):
-            from_in = True
-        elif tag.startswith('to'):
-            to_in = True
-
-        if from_in and to_in:
-            return True
-    else:
-        return False
+    spec = parse_filters(value)
+    return spec.has('from') and spec.has('to')
 
 
 @register.filter(name='both_from_to')
-@stringfilter
 def both_from_to(value):
-    list_of_string = value.split('&')
-    from_in = False
-    to_in = False
-    for tag in list_of_string:
-        if tag.startswith('from'):
-            from_in = True
-        elif tag.startswith('to'):
-            to_in = True
-
-        if from_in and to_in:
-            return True
-    else:
-        return False
+    spec = parse_filters(value)
+    return spec.has('from') and spec.has('to')
 
 
 @register.filter(name='xor_from_to')
-@stringfilter
 def xor_from_to(value):
-    list_of_string = value.split('&')
-    from_in = False
-    to_in = False
-    for tag in list_of_string:
-        if tag.startswith('from='):
-            from_in = True
-        elif tag.startswith('to='):
-            to_in = True
-    else:
-        return from_in != to_in
+    spec = parse_filters(value)
+    return spec.has('from') != spec.has('to')
 
 
 @register.filter(name='time_to_date')
@@ -3,6 +3,299 @@
 Copyright (c) 2019 - present AppSeed.us
 """
 
-from django.test import TestCase
+import tempfile
+from datetime import date
+from decimal import Decimal
+from django.db.models import Q, Sum
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from djmoney.money import Money
+from apps.home.models import Bill, BillInstallment, Project, UploadedFile, Blob, Task, SubTask
+from apps.home.ledger import bill_batch, create_installments, set_installments_paid
+from apps.home.progress import complete_subtasks, repair_counters
 
-# Create your tests here.
+
+class LedgerTests(TestCase):
+    # Bill totals are maintained from installment deltas (apps.home.ledger)
+
+    def setUp(self):
+        self.bill = Bill.objects.create(
+            title='Ledger', category='Prestação de serviços', installments_number=3, due_date=date(2030, 1, 1)
+        )
+
+    def add(self, value, paid=False, partial_id=1, bill=None):
+        installment = BillInstallment(partial_id=partial_id, value=Money(value, 'BRL'), paid=paid,
+                                      due_date=date(2030, partial_id, 1))
+        if bill is not None:
+            installment.bill = bill
+        else:
+            installment.bill_id = self.bill.id
+        installment.save()
+        return installment
+
+    def assertTotals(self, total, partial):
+        bill = Bill.objects.get(pk=self.bill.pk)
+        self.assertEqual((bill.total.amount, bill.partial.amount), (Decimal(total), Decimal(partial)))
+
+        # Same values as re-summing the installments
+        expected = bill.installments.aggregate(total=Sum('value'), partial=Sum('value', filter=Q(paid=True)))
+        self.assertEqual(bill.total.amount, expected['total'] or 0)
+        self.assertEqual(bill.partial.amount, expected['partial'] or 0)
+
+    def test_create(self):
+        self.add('10.50', partial_id=1)
+        self.assertTotals('10.50', '0')
+
+        self.add('20.25', paid=True, partial_id=2)
+        self.assertTotals('30.75', '20.25')
+
+    def test_create_in_batch(self):
+        with bill_batch():
+            self.add('10.50', partial_id=1)
+            self.add('20.25', paid=True, partial_id=2)
+
+            # Deltas are flushed once, when the batch exits
+            self.assertEqual(Bill.objects.get(pk=self.bill.pk).total.amount, Decimal('0'))
+
+        self.assertTotals('30.75', '20.25')
+
+    def test_edit(self):
+        installment = self.add('10.00', partial_id=1)
+        self.add('5.00', partial_id=2)
+
+        installment.value = Money('12.00', 'BRL')
+        installment.save()
+        self.assertTotals('17.00', '0')
+
+        installment.paid = True
+        installment.save()
+        self.assertTotals('17.00', '12.00')
+
+        installment.value = Money('7.00', 'BRL')
+        installment.paid = False
+        installment.save()
+        self.assertTotals('12.00', '0')
+
+    def test_edit_in_batch(self):
+        first = self.add('10.00', partial_id=1)
+        second = self.add('5.00', paid=True, partial_id=2)
+
+        with bill_batch():
+            first.value = Money('3.00', 'BRL')
+            first.paid = True
+            first.save()
+            second.paid = False
+            second.save()
+            first.value = Money('4.00', 'BRL')
+            first.save()
+
+        self.assertTotals('9.00', '4.00')
+
+    def test_delete(self):
+        self.add('10.00', partial_id=1)
+        paid = self.add('5.00', paid=True, partial_id=2)
+
+        paid.delete()
+        self.assertTotals('10.00', '0')
+        self.assertEqual(Bill.objects.get(pk=self.bill.pk).installments_number, 2)
+
+    def test_delete_in_batch(self):
+        installments = [self.add('10.00', paid=i == 2, partial_id=i) for i in range(1, 4)]
+
+        with bill_batch():
+            for installment in installments[:2]:
+                installment.delete()
+
+        self.assertTotals('10.00', '0')
+        self.assertEqual(Bill.objects.get(pk=self.bill.pk).installments_number, 1)
+
+    def test_bulk_helpers(self):
+        with bill_batch():
+            create_installments(self.bill, 3, Money('9.99', 'BRL'), '2030-01-01', 30)
+        self.assertTotals('29.97', '0')
+
+        set_installments_paid(self.bill, self.bill.installments.filter(partial_id__lte=2), True, date(2030, 1, 1))
+        self.assertTotals('29.97', '19.98')
+
+        set_installments_paid(self.bill, self.bill.installments.all(), False)
+        self.assertTotals('29.97', '0')
+
+    def test_held_bill_is_not_overwritten(self):
+        # The bill instance an installment was saved through gets the deltas, so saving it afterwards keeps them
+        self.add('15.00', partial_id=1, bill=self.bill)
+        self.add('15.00', paid=True, partial_id=2, bill=self.bill)
+        self.assertEqual(self.bill.total.amount, Decimal('30.00'))
+
+        self.bill.title = 'Renamed'
+        self.bill.save()
+        self.assertTotals('30.00', '15.00')
+
+    def test_failed_batch_changes_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with bill_batch():
+                self.add('10.00', partial_id=1)
+                raise RuntimeError
+
+        self.assertFalse(BillInstallment.objects.exists())
+        self.assertTotals('0', '0')
+
+
+class BlobReferenceTests(TestCase):
+    # Rows with the same content share one stored Blob (apps.home.blobs), deleted with its last reference
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=self.media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.project = Project.objects.create(title='Blobs')
+
+    def upload(self, content, name='file.txt'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return UploadedFile.objects.create(project=self.project, uploaded_by=None, file=ContentFile(content, name))
+
+    def delete(self, instance):
+        with self.captureOnCommitCallbacks(execute=True):
+            instance.delete()
+
+    def references(self, blob_id):
+        return Blob.objects.get(pk=blob_id).references
+
+    def test_identical_uploads_share_a_blob(self):
+        first = self.upload(b'same content', 'a.txt')
+        second = self.upload(b'same content', 'b.txt')
+        other = self.upload(b'other content', 'c.txt')
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(Blob.objects.get(pk=first.blob_id).name, first.file.name)
+        self.assertEqual(self.references(first.blob_id), 2)
+        self.assertEqual(self.references(other.blob_id), 1)
+        self.assertEqual(Blob.objects.count(), 2)
+
+    def test_file_is_deleted_with_its_last_reference(self):
+        first = self.upload(b'shared')
+        second = self.upload(b'shared')
+        storage = first.file.storage
+
+        self.delete(first)
+        self.assertEqual(self.references(second.blob_id), 1)
+        self.assertTrue(storage.exists(second.file.name))
+
+        self.delete(second)
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(storage.exists(second.file.name))
+
+    def test_replacing_the_file_releases_the_old_blob(self):
+        uploaded = self.upload(b'before')
+        kept = self.upload(b'before')
+        old_blob = uploaded.blob_id
+
+        with self.captureOnCommitCallbacks(execute=True):
+            uploaded.file = ContentFile(b'after', 'after.txt')
+            uploaded.save()
+
+        self.assertNotEqual(uploaded.blob_id, old_blob)
+        self.assertEqual(self.references(old_blob), 1)
+        self.assertEqual(self.references(uploaded.blob_id), 1)
+        self.assertTrue(kept.file.storage.exists(kept.file.name))
+
+
+class ProgressCounterTests(TestCase):
+    # Task and subtask counters are maintained by apps.home.progress; progress counts every task and subtask once
+
+    def setUp(self):
+        self.project = Project.objects.create(title='Progress')
+        self.other = Project.objects.create(title='Other')
+
+    def task(self, project=None, completed=False):
+        return Task.objects.create(project=project or self.project, title='Task', description='', completed=completed,
+                                   created_by=None)
+
+    def subtask(self, task, completed=False):
+        return SubTask.objects.create(task=task, title='Subtask', description='', completed=completed, created_by=None)
+
+    def assertProgress(self, project, tasks, subtasks, completition):
+        project = Project.objects.get(pk=project.pk)
+        self.assertEqual((project.tasks_total, project.tasks_completed), tasks)
+        self.assertEqual((project.subtasks_total, project.subtasks_completed), subtasks)
+        self.assertEqual(project.completition, completition)
+
+    def assertSubtasks(self, task, subtasks):
+        task = Task.objects.get(pk=task.pk)
+        self.assertEqual((task.subtasks_total, task.subtasks_completed), subtasks)
+
+    def test_tasks(self):
+        first = self.task()
+        self.task(completed=True)
+        self.assertProgress(self.project, (2, 1), (0, 0), 50)
+
+        first.completed = True
+        first.save()
+        self.assertProgress(self.project, (2, 2), (0, 0), 100)
+
+        first.delete()
+        self.assertProgress(self.project, (1, 1), (0, 0), 100)
+
+    def test_subtasks_complete_their_task(self):
+        task = self.task()
+        subtasks = [self.subtask(task) for _ in range(3)]
+        self.assertSubtasks(task, (3, 0))
+        self.assertProgress(self.project, (1, 0), (3, 0), 0)
+
+        for subtask in subtasks[:2]:
+            subtask.completed = True
+            subtask.save()
+        self.assertProgress(self.project, (1, 0), (3, 2), 50)
+
+        subtasks[2].completed = True
+        subtasks[2].save()
+        self.assertTrue(Task.objects.get(pk=task.pk).completed)
+        self.assertProgress(self.project, (1, 1), (3, 3), 100)
+
+        subtasks[0].delete()
+        self.assertSubtasks(task, (2, 2))
+        self.assertProgress(self.project, (1, 1), (2, 2), 100)
+
+    def test_complete_subtasks_in_bulk(self):
+        task = self.task()
+        for _ in range(3):
+            self.subtask(task)
+
+        complete_subtasks(Task.objects.get(pk=task.pk), None)
+        self.assertSubtasks(task, (3, 3))
+        self.assertProgress(self.project, (1, 0), (3, 3), 75)
+
+    def test_task_moves_to_another_project(self):
+        task = self.task(completed=True)
+        self.subtask(task, completed=True)
+        self.subtask(task)
+        # An open subtask reopens its task
+        self.assertProgress(self.project, (1, 0), (2, 1), 33)
+
+        task = Task.objects.get(pk=task.pk)
+        task.project = self.other
+        task.save()
+        self.assertProgress(self.project, (0, 0), (0, 0), 0)
+        self.assertProgress(self.other, (1, 0), (2, 1), 33)
+
+    def test_deleting_a_task_removes_its_subtasks(self):
+        task = self.task()
+        self.subtask(task, completed=True)
+        self.subtask(task)
+        self.task(completed=True)
+        self.assertProgress(self.project, (2, 1), (2, 1), 50)
+
+        Task.objects.get(pk=task.pk).delete()
+        self.assertProgress(self.project, (1, 1), (0, 0), 100)
+
+    def test_repair_counters(self):
+        task = self.task()
+        self.subtask(task, completed=True)
+        Project.objects.update(tasks_total=9, subtasks_completed=0, completition=3)
+        Task.objects.update(subtasks_total=0)
+
+        self.assertEqual(repair_counters(), (1, 2))
+        self.assertSubtasks(task, (1, 1))
+        self.assertProgress(self.project, (1, 1), (1, 1), 100)
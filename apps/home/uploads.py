@@ -0,0 +1,264 @@
+import os
+import hashlib
+from datetime import timedelta
+from tempfile import SpooledTemporaryFile
+from django.utils import timezone
+from django.db import transaction
+from django.core.files.storage import default_storage
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+from apps.home.models import UploadedFile, UploadSession, custom_upload_path_projects
+from apps.home.blobs import content_hash, stored_hash, adopt
+
+
+# Resumable uploads: the client opens a session, PUTs the file in chunks at explicit offsets and completes it.
+# On S3 every chunk becomes a part of a multipart upload, otherwise chunks are written in place into the session's
+# own .part file, which is moved to a free path on completion. Either way the file is written to storage once.
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # S3 parts must be at least 5 MB, except the last one
+READ_SIZE = 1024 * 1024
+UPLOAD_SESSION_TTL = timedelta(days=1)
+UPLOAD_PARTS_DIR = 'uploads/parts'
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def is_multipart(storage):
+    return isinstance(storage, S3Boto3Storage)
+
+
+def storage_key(storage, name):
+    return storage._normalize_name(clean_name(name))
+
+
+def part_path(storage, session):
+    return storage.path(f'{UPLOAD_PARTS_DIR}/{session.id}.part')
+
+
+def multipart_name(storage, name):
+    # The S3 key is fixed when the multipart upload starts and completing it overwrites whatever is stored there:
+    # names already stored or held by another open session get a random suffix instead
+    name = storage.get_available_name(name)
+    while UploadSession.objects.filter(name=name, completed=False).exists():
+        root, ext = os.path.splitext(name)
+        name = storage.get_available_name(storage.get_alternative_name(root, ext))
+
+    return name
+
+
+def move_into_place(part, storage, name):
+    # The final name is picked on completion; a hard link never replaces an existing file, so a path taken in the
+    # meantime only means trying the next free one (as FileSystemStorage does when saving)
+    while True:
+        name = storage.get_available_name(name)
+        path = storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        try:
+            os.link(part, path)
+        except FileExistsError:
+            continue
+
+        os.remove(part)
+        return name
+
+
+def create_session(project, user, filename, size, checksum='', metadata=None, storage=default_storage):
+    if size <= 0:
+        raise UploadError('Empty file')
+
+    session = UploadSession(
+        project=project, uploaded_by=user, filename=filename, size=size,
+        name=custom_upload_path_projects(UploadedFile(project=project), filename),
+        checksum=checksum.lower(), metadata=metadata or {},
+    )
+
+    if is_multipart(storage):
+        session.name = multipart_name(storage, session.name)
+        session.multipart_id = storage.bucket.meta.client.create_multipart_upload(
+            Bucket=storage.bucket.name, Key=storage_key(storage, session.name)
+        )['UploadId']
+    else:
+        os.makedirs(os.path.dirname(part_path(storage, session)), exist_ok=True)
+        open(part_path(storage, session), 'wb').close()
+
+    session.save()
+    return session
+
+
+def read_chunk(stream, length, checksum=None):
+    # The chunk is spooled (memory up to one read, disk beyond) and verified before anything reaches storage
+    buffer = SpooledTemporaryFile(max_size=READ_SIZE)
+    digest = hashlib.sha256()
+    remaining = length
+
+    while remaining > 0:
+        data = stream.read(min(READ_SIZE, remaining))
+        if not data:
+            break
+        digest.update(data)
+        buffer.write(data)
+        remaining -= len(data)
+
+    if remaining:
+        buffer.close()
+        raise UploadError('Incomplete chunk')
+
+    if checksum and checksum.lower() != digest.hexdigest():
+        buffer.close()
+        raise UploadError('Chunk checksum mismatch')
+
+    buffer.seek(0)
+    return buffer
+
+
+def check_offset(session, offset):
+    if session.completed:
+        raise UploadError('Upload already completed', 409)
+
+    if offset != session.received:
+        raise UploadError('Unexpected offset', 409)
+
+
+def write_chunk(session, offset, stream, length, checksum=None, storage=default_storage):
+    # The chunk is read, verified and stored without holding the session lock (an 8 MB part upload takes a while);
+    # the offset is checked again under the lock when the chunk is recorded. A chunk sent twice is stored twice at
+    # the same place (same part number or file offset), so a concurrent retry can't corrupt the upload.
+    check_offset(session, offset)
+
+    last = offset + length == session.size
+    if length <= 0 or length > UPLOAD_CHUNK_SIZE or offset + length > session.size:
+        raise UploadError('Invalid chunk size')
+
+    if is_multipart(storage) and length != UPLOAD_CHUNK_SIZE and not last:
+        raise UploadError(f'Chunks must be {UPLOAD_CHUNK_SIZE} bytes, except the last one')
+
+    chunk = read_chunk(stream, length, checksum)
+
+    part = None
+    try:
+        if is_multipart(storage):
+            part_number = offset // UPLOAD_CHUNK_SIZE + 1
+            response = storage.bucket.meta.client.upload_part(
+                Bucket=storage.bucket.name, Key=storage_key(storage, session.name),
+                UploadId=session.multipart_id, PartNumber=part_number, Body=chunk, ContentLength=length,
+            )
+            part = {'PartNumber': part_number, 'ETag': response['ETag']}
+        else:
+            try:
+                with open(part_path(storage, session), 'r+b') as file:
+                    file.seek(offset)
+                    while data := chunk.read(READ_SIZE):
+                        file.write(data)
+            except FileNotFoundError:
+                raise UploadError('Upload expired', 410)
+    finally:
+        chunk.close()
+
+    return record_chunk(session, offset, length, part)
+
+
+def record_chunk(session, offset, length, part=None):
+    with transaction.atomic():
+        locked = UploadSession.objects.select_for_update().filter(pk=session.pk).first()
+        if locked is None:
+            raise UploadError('Upload aborted', 410)
+
+        check_offset(locked, offset)
+
+        if part:
+            locked.parts = [stored for stored in locked.parts if stored['PartNumber'] != part['PartNumber']]
+            locked.parts.append(part)
+        locked.received = offset + length
+        locked.save(update_fields=['received', 'parts', 'updated_at'])
+
+    session.received, session.parts = locked.received, locked.parts
+    return session.received
+
+
+def finish_session(session, storage=default_storage):
+    if session.completed:
+        return session.uploaded_file
+
+    if session.received != session.size:
+        raise UploadError('Upload is incomplete', 409)
+
+    uploaded_file = UploadedFile(project=session.project, uploaded_by=session.uploaded_by)
+
+    if is_multipart(storage):
+        # S3 objects are read back, verified and deduplicated by verify_upload after the request
+        storage.bucket.meta.client.complete_multipart_upload(
+            Bucket=storage.bucket.name, Key=storage_key(storage, session.name), UploadId=session.multipart_id,
+            MultipartUpload={'Parts': sorted(session.parts, key=lambda part: part['PartNumber'])},
+        )
+        uploaded_file.file.name = session.name
+
+    else:
+        # Local files are checked before they are moved into place
+        try:
+            with open(part_path(storage, session), 'rb') as file:
+                digest, size = content_hash(file)
+        except FileNotFoundError:
+            raise UploadError('Upload expired', 410)
+
+        if session.checksum and digest != session.checksum:
+            abort_session(session, storage)
+            raise UploadError('File checksum mismatch', 422)
+
+        session.name = move_into_place(part_path(storage, session), storage, session.name)
+        uploaded_file.file.name = session.name
+        uploaded_file.blob = adopt(uploaded_file.file, digest, size)
+        session.verified = bool(session.checksum) or None
+
+    session.uploaded_file = uploaded_file
+    session.completed = True
+
+    return uploaded_file
+
+
+def abort_session(session, storage=default_storage):
+    if not session.completed:
+        if is_multipart(storage):
+            storage.bucket.meta.client.abort_multipart_upload(
+                Bucket=storage.bucket.name, Key=storage_key(storage, session.name), UploadId=session.multipart_id
+            )
+        elif os.path.exists(part_path(storage, session)):
+            os.remove(part_path(storage, session))
+
+    session.delete()
+
+
+def verify_upload(session_id, storage=default_storage):
+    session = UploadSession.objects.select_related('uploaded_file').filter(pk=session_id, completed=True).first()
+    if session is None or not session.checksum or session.verified is not None:
+        return None
+
+    digest, size = stored_hash(session.name, storage)
+    session.verified = digest == session.checksum
+
+    uploaded_file = session.uploaded_file
+    if uploaded_file and not session.verified:
+        uploaded_file.delete()
+    elif uploaded_file and not uploaded_file.blob_id:
+        uploaded_file.blob = adopt(uploaded_file.file, digest, size)
+        UploadedFile.objects.filter(pk=uploaded_file.pk).update(file=uploaded_file.file.name, blob=uploaded_file.blob)
+
+    UploadSession.objects.filter(pk=session.pk).update(verified=session.verified)
+    return session.verified
+
+
+def expire_sessions(storage=default_storage):
+    # Abandoned sessions keep a .part file or unfinished S3 parts around, which are billed until aborted
+    expired = UploadSession.objects.filter(completed=False, updated_at__lt=timezone.now() - UPLOAD_SESSION_TTL)
+
+    count = 0
+    for session in expired:
+        abort_session(session, storage)
+        count += 1
+
+    UploadSession.objects.filter(completed=True, updated_at__lt=timezone.now() - UPLOAD_SESSION_TTL).delete()
+    return count
@@ -3,7 +3,7 @@ from django.conf.urls.static import static
 from django.urls import path, re_path
 from apps.home.views import (
     assets, collaborators, equipments, login, profile, projects, balance, clients, offices,
-    meetings
+    meetings, search
 )
 
 projects_list_urls = [
@@ -37,6 +37,9 @@ projects_page_urls = [
     path('projects/<slug:slug>/edit', projects.edit, name='project_edit'),
 
     path('projects/<slug:slug>/upload', projects.upload_file, name='upload_file'),
+    path('projects/<slug:slug>/uploads', projects.start_upload, name='start_upload'),
+    path('projects/<slug:slug>/uploads/<uuid:upload_id>', projects.upload_chunk, name='upload_chunk'),
+    path('projects/<slug:slug>/uploads/<uuid:upload_id>/complete', projects.complete_upload, name='complete_upload'),
     path('projects/<slug:slug>/delete=<int:file_id>', projects.delete_file, name='delete_file'),
     path('download_file/<int:file_id>/', projects.download_file, name='download_file'),
 
@@ -331,6 +334,10 @@ meetings_urls = [
          name='meeting_delete_subtask'),
 ]
 
+search_urls = [
+    path('search', search.search, name='search'),
+]
+
 base_urls = [
     path('', login.index, name='home'),
     # Matches any html file
@@ -340,7 +347,7 @@ base_urls = [
 urlpatterns = [
     *projects_list_urls, *projects_page_urls, *assets_urls, *collaborators_page_urls, *collaborators_list_urls,
     *balance_urls, *equipments_urls, *profile_urls, *clients_list_urls, *offices_urls, *client_page_urls,
-    *client_balance_urls, *client_documents_urls, *meetings_urls, *base_urls
+    *client_balance_urls, *client_documents_urls, *meetings_urls, *search_urls, *base_urls
 ]
 
 if settings.DEBUG:
@@ -1,7 +1,7 @@
 from django.db.models import Sum, Q
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_POST
-from apps.home.models import UploadedFile, Profile, Client
+from apps.home.models import UploadedFile, Client
 from django.core.paginator import Paginator
 import os
 
@@ -21,8 +21,6 @@ def get_paginated_files(request, category=None):
 
 
 def assets_list(request, category=None):
-    user_profile = Profile.objects.get(user=request.user)
-
     if category == '3d-models':
         title = '3D Models'
         paginator, files = get_paginated_files(request, category)
@@ -42,15 +40,12 @@ def assets_list(request, category=None):
         'files_list': files,
         'category': category,
         'title': title,
-        'user_profile': user_profile
     }
 
     return render(request, "home/inventory/assets/home.html", context)
 
 
 def assets_hub(request):
-    user_profile = Profile.objects.get(user=request.user)
-
     other_categories = ['clouds', 'executable', 'folders', 'database', 'office', 'images', 'video', 'others']
 
     category_filter = Q(category__in=other_categories)
@@ -77,7 +72,6 @@ def assets_hub(request):
         'scripts_value': values_scripts if values_scripts is not None else 0,
         'unity_value': values_unity if values_unity is not None else 0,
         'others_value': values_others if values_others is not None else 0,
-        'user_profile': user_profile,
         'segment': 'inventory',
         # 'clients': Client.objects.all()
     }
@@ -88,10 +82,6 @@ def assets_hub(request):
 @require_POST
 def delete_file_from_storage(request, file_id):
     uploaded_file = get_object_or_404(UploadedFile, pk=file_id)
-    file_path = uploaded_file.file
-    file_path.delete(save=False)
-    uploaded_file.value = 0
-    uploaded_file.save()
     uploaded_file.delete()
 
     return redirect('assets_hub')
@@ -100,10 +90,6 @@ def delete_file_from_storage(request, file_id):
 @require_POST
 def delete_file_from_storage_with_category(request, category, file_id):
     uploaded_file = get_object_or_404(UploadedFile, pk=file_id)
-    file_path = uploaded_file.file
-    file_path.delete(save=False)
-    uploaded_file.value = 0
-    uploaded_file.save()
     uploaded_file.delete()
 
     return redirect('assets_list', category=category)
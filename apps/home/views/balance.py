@@ -1,137 +1,60 @@
 import os
-from django.core.files.storage import default_storage
 from datetime import datetime
-from django.db.models import Q
-from django.http import HttpResponse
+from django.db.models import Q, F, Sum, Count, Max
+from django.core import signing
 from django.shortcuts import render, redirect
-from apps.home.models import Project, Profile, Office, Bill, Client, unmask_money
-
-
-INCOME_CATEGORIES = [
-    ############ Receita Bruta ###########
-    'Juros Obtidos',
-    'Integralização de capital',
-    'Rendimentos de aplicações financeiras',
-    'Vendas de mercadorias',
-    'Vendas de equipamentos',
-    'Prestação de serviços',
-    'Royalties',
-    'Outros não operacionais',
-]
-
-EXPENSE_CATEGORIES = [
-    ######### Deduções de impostos ########
-    'COFINS',
-    'CSLL',
-    'ICMS',
-    'IPI',
-    'IRPJ',
-    'PIS',
-    'ISS',
-    'Simples nacional',
-    'IRPJ trimestral',
-    'CSLL trimestral',
-    ############ Custos diretos ###########
-    'Custos diretos',
-    ########## Despesas comerciais ########
-    'Endomarketing',
-    'Taxa de propaganda e publicidade',
-    ### Despesas administrativas/gerais ###
-    'Agua',
-    'Aluguel',
-    'Aluguel de máquinas',
-    'Associações/Convênios',
-    'Cartorio/Documentos',
-    'Cetificado Digital',
-    'Combustível/Estacionamento',
-    'Condomínio',
-    'Consultoria',
-    'Contabilidade',
-    'Energia elétrica',
-    'Jurídico',
-    'Marketing e publicidade',
-    'Material de escritório',
-    'Monitoramento e segurança',
-    'Multas gerais',
-    'Reembolso geral',
-    'Seguro',
-    'Software/Sistemas',
-    'Suporte TI',
-    'Telefone/Internet/TV',
-    'Transporte/Uber',
-    'Uso interno',
-    'Viagem/Hospedagem',
-    'Depreciação e amortização',
-    ######## Despesas com ocupação #######
-    'Estadual',
-    'IPTU',
-    'Licenças/Alvarás',
-    'Municipal',
-    'Prefeitura',
-    'Sindicato patronal',
-    ########## Despesas pessoal ##########
-    'Adiantamento salarial',
-    'Alimentação',
-    'Contribuição sindical',
-    'FGTS',
-    'Imposto de renda IRPF',
-    'INSS',
-    'Medicina do trabalho',
-    'Premiação/Bonificação/Confraternização',
-    'Provisão 13',
-    'Provisão férias',
-    'Rescisão',
-    'Salário',
-    'Terceirização de pessoal',
-    'Treinamento',
-    'Uniforme/EPI',
-    'Vale transporte',
-    ###### Despesas de provisionados ######
-    'Amortização de empréstimo',
-    'FGTS 13',
-    'INSS 13',
-    'Pagamento 13',
-    'Pagamento férias',
-    ####### Despesas com manutenção #######
-    'Manutenção de veículos',
-    'Manutenção de equipamentos',
-    'Material de limpeza e higiene',
-    'Reparos/Obras',
-    'Utensílios',
-    ######### Despesas com banco ##########
-    'Tarifas bancárias',
-    ######### Despesas financeiras ########
-    'Cartão pré-pago',
-    'IOF/IR sobre aplicações',
-    'Juros e multa (atraso)',
-    'Juros empréstimos',
-    ############ Investimentos ############
-    'Aplicações financeiras',
-    'Equipamentos',
-    'Cotas outras empresas',
-    'Colaboradores',
-    'Veículos',
-    'Obras',
-    # Imposto de renda e contribuição social #
-    'Imposto de renda e contribuição social',
-]
+from djmoney.money import Money
+from apps.home.models import Project, Office, Bill, Client, unmask_money, INCOME_CATEGORIES, EXPENSE_CATEGORIES
+from apps.home.filter_spec import parse_filters, date_range_query
+from apps.home.downloads import download_response
+from apps.home.bounds import bill_bounds
+
 
 BALANCE_CATEGORIES = INCOME_CATEGORIES + EXPENSE_CATEGORIES
 
+BILL_AGGREGATES = {
+    'to_receive': Q(category__in=INCOME_CATEGORIES),
+    'to_receive_pending': Q(category__in=INCOME_CATEGORIES, paid=False),
+    'to_receive_late': Q(category__in=INCOME_CATEGORIES, late=True),
+    'received': Q(category__in=INCOME_CATEGORIES, paid=True),
+    'to_pay': Q(category__in=EXPENSE_CATEGORIES),
+    'to_pay_pending': Q(category__in=EXPENSE_CATEGORIES, paid=False),
+    'to_pay_late': Q(category__in=EXPENSE_CATEGORIES, late=True),
+    'paid': Q(category__in=EXPENSE_CATEGORIES, paid=True),
+    'pending': Q(paid=False),
+    'late': Q(late=True),
+}
+
 
 def get_permission(request, permission_type, model='bill'):
     return request.user.has_perm(f'home.{permission_type}_{model}')
 
 
-def check_late_bills():
-    late_bills = Bill.objects.filter(Q(due_date__lt=datetime.now().date()) & Q(paid=False))
-    unlate_bills = Bill.objects.filter(Q(due_date__gte=datetime.now().date()) & Q(paid=False) & Q(late=True))
-    for bill in late_bills:
-        bill.save()
+def aggregate_bills(bills):
+    # One grouped query per call: every total and count of BILL_AGGREGATES, split by currency.
+    aggregates = {}
+    for name, condition in BILL_AGGREGATES.items():
+        aggregates[f'{name}_total'] = Sum('total', filter=condition)
+        aggregates[f'{name}_count'] = Count('id', filter=condition)
 
-    for bill in unlate_bills:
-        bill.late = False
-        bill.save()
+    rows = bills.order_by().values('total_currency').annotate(**aggregates)
+
+    totals = {}
+    for row in rows:
+        currency = row.pop('total_currency')
+        totals[currency] = {}
+        for key, value in row.items():
+            if key.endswith('_total'):
+                totals[currency][key] = Money(value, currency) if value is not None else 0
+            else:
+                totals[currency][key] = value
+
+    return totals
+
+
+def get_bill_totals(bills, currency):
+    empty = {f'{name}_{kind}': 0 for name in BILL_AGGREGATES for kind in ('total', 'count')}
+    return aggregate_bills(bills).get(currency, empty)
 
 
 def filter_options(value):
@@ -155,183 +78,186 @@ def filter_options(value):
         return value.replace('-', ' ').capitalize()
 
 
-def filter_bill_objects(filters):
-    bills = Bill.objects.all()
+def bill_query(spec, normalize_method=True):
+    query = date_range_query(spec, 'due_date')
 
-    if filters is not None:
-        filters_list = filters.split('&')
+    for key in ['payer', 'office', 'client']:
+        value = spec.get(key, 'all')
+        if value != 'all':
+            query &= Q(**{f'{key}__id': int(value)})
 
-        office, method, category, client = 'all', 'all', 'all', 'all'
-        from_date, to_date = False, False
-        late, paid, pending = True, True, True
-        min_value, max_value = None, None
+    method = spec.get('method', 'all')
+    if method != 'all':
+        query &= Q(method=method.replace('-', ' ').capitalize() if normalize_method else method)
 
-        for item in filters_list:
-            office = item.split('=')[1] if item.startswith('office') else office
-            from_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('from') else from_date
-            to_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('to') else to_date
-            method = item.split('=')[1] if item.startswith('method') else method
-            client = item.split('=')[1] if item.startswith('client') else client
-            category = item.split('=')[1] if item.startswith('category') else category
-            late = item.split('=')[1] if item.startswith('late') else late
-            paid = item.split('=')[1] if item.startswith('paid') else paid
-            pending = item.split('=')[1] if item.startswith('pending') else pending
-            min_value = item.split('=')[1] if item.startswith('value_min') else min_value
-            max_value = item.split('=')[1] if item.startswith('value_max') else max_value
+    category = spec.get('category', 'all')
+    if category == 'income':
+        query &= Q(category__in=INCOME_CATEGORIES)
+    elif category == 'expense':
+        query &= Q(category__in=EXPENSE_CATEGORIES)
+    elif category != 'all':
+        query &= Q(category=category)
 
-            if office != 'all':
-                bills = bills.filter(office__id=int(office))
+    origin = spec.get('origin', 'all')
+    if origin != 'all':
+        query &= Q(origin=origin)
 
-            if from_date and to_date and from_date < to_date:
-                bills = bills.filter(due_date__gte=from_date)
-                bills = bills.filter(due_date__lte=to_date)
-            elif from_date:
-                bills = bills.filter(due_date__gte=from_date)
-            elif to_date:
-                bills = bills.filter(due_date__lte=to_date)
+    has_code = Q(code__isnull=False) & ~Q(code='')
+    has_link = Q(link__isnull=False) & ~Q(link='')
+    match spec.get('code', 'all'):
+        case 'code':
+            query &= has_code
+        case 'link':
+            query &= has_link
+        case 'both':
+            query &= has_code & has_link
+        case _:
+            pass
 
-            if method != 'all':
-                bills = bills.filter(method=method)
+    if spec.get('late') == 'false':
+        query &= Q(late=False)
 
-            if client != 'all':
-                bills = bills.filter(client__id=client)
+    if spec.get('paid') == 'false':
+        query &= Q(paid=False)
 
-            if category != 'all':
-                if category == 'income':
-                    bills = bills.filter(category__in=INCOME_CATEGORIES)
-                elif category == 'expense':
-                    bills = bills.filter(category__in=EXPENSE_CATEGORIES)
-                else:
-                    bills = bills.filter(category=category)
+    if spec.get('pending') == 'false':
+        query &= Q(paid=True, late=False) | Q(paid=False, late=True)
 
-            if late == 'false':
-                bills = bills.filter(late=False)
+    if spec.get('value_min'):
+        query &= Q(total__gte=spec.get('value_min'))
 
-            if paid == 'false':
-                bills = bills.filter(paid=False)
+    if spec.get('value_max'):
+        query &= Q(total__lte=spec.get('value_max'))
 
-            if pending == 'false':
-                bills = bills.filter(Q(paid=True, late=False) | Q(paid=False, late=True))
+    installments = spec.get('installments', 'all')
+    if installments == 'true':
+        query &= Q(installments_number__gte=1)
+    elif installments != 'all':
+        query &= Q(installments_number__lt=1)
 
-            if min_value:
-                bills = bills.filter(total__gte=min_value)
+    return query
 
-            if max_value:
-                bills = bills.filter(total__lte=max_value)
 
-    return bills, bills.order_by('-id').first().id if bills.count() > 0 else 0
+def filter_bill_objects(filters):
+    bills = Bill.objects.filter(bill_query(parse_filters(filters), normalize_method=False))
 
+    return bills, bills.aggregate(max_id=Max('id'))['max_id'] or 0
 
-def sort_bill_objects(bills, sorted_by, sort_type):
-    if sorted_by is not None:
-        sorted_by = sorted_by.replace('-', '_')
 
-    if sorted_by == 'client':
-        all_bills = sorted(bills, key=lambda bill: getattr(bill.client, 'name', ''))
+BILL_SORT_FIELDS = {
+    'client': 'client__name',
+    'office': 'office__company_name',
+    'value': 'total',
+}
 
-    elif sorted_by == 'office':
-        all_bills = sorted(bills, key=lambda bill: getattr(bill.office, 'name', ''))
+BILLS_PER_PAGE = 50
 
-    elif sorted_by == 'project':
-        all_bills = sorted(bills, key=lambda bill: getattr(bill.project, 'title', ''))
 
-    else:
-        sorted_by = 'total' if sorted_by == 'value' else sorted_by
-        sorted_by = 'created_at' if sorted_by is None else sorted_by
-        all_bills = sorted(bills, key=lambda bill: getattr(bill, sorted_by, ''))
+def sort_bill_objects(bills, sorted_by, sort_type):
+    # Bills have no project relation, so an unknown column falls back to created_at.
+    sorted_by = sorted_by.replace('-', '_') if sorted_by is not None else 'created_at'
+    field = BILL_SORT_FIELDS.get(sorted_by, sorted_by)
+    if field not in BILL_SORT_FIELDS.values() and field not in [f.name for f in Bill._meta.concrete_fields]:
+        field = 'created_at'
+
+    bills = bills.select_related('client', 'office', 'payer')
+    if sort_type == 'desc':
+        return bills.order_by(F(field).desc(nulls_last=True), '-id'), field
 
+    return bills.order_by(F(field).asc(nulls_first=True), 'id'), field
+
+
+def keyset_query(field, sort_type, cursor):
+    value, last_id = cursor
     if sort_type == 'desc':
-        all_bills = reversed(all_bills)
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'id__lt': last_id})
+        return (Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': last_id}) |
+                Q(**{f'{field}__isnull': True}))
+
+    if value is None:
+        return Q(**{f'{field}__isnull': True, 'id__gt': last_id}) | Q(**{f'{field}__isnull': False})
+    return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': last_id})
 
-    return all_bills
+
+def paginate_bills(bills, field, sort_type, after=None, per_page=BILLS_PER_PAGE):
+    # Cursors are signed with the sort they were built for; one from another sort starts over at the first page
+    sort_type = 'desc' if sort_type == 'desc' else 'asc'
+    if after:
+        try:
+            cursor_field, cursor_sort, value, last_id = signing.loads(after)
+        except (signing.BadSignature, TypeError, ValueError):
+            cursor_field = cursor_sort = None
+
+        if (cursor_field, cursor_sort) == (field, sort_type):
+            bills = bills.filter(keyset_query(field, sort_type, (value, last_id)))
+
+    page = list(bills.annotate(cursor_value=F(field))[:per_page + 1])
+    next_cursor = None
+    if len(page) > per_page:
+        page = page[:per_page]
+        last = page[-1].cursor_value
+        next_cursor = signing.dumps([field, sort_type, str(last) if last is not None else None, page[-1].id])
+
+    return page, next_cursor
 
 
 def home(request, sorted_by=None, sort_type=None, filters=None):
     if not get_permission(request, 'view', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
-
-    check_late_bills()
+        return render(request, 'home/page-404.html')
 
     currency = request.POST.get('currency', 'BRL')
 
     all_bills, max_id = filter_bill_objects(filters)
 
     bills_to_receive = all_bills.filter(category__in=INCOME_CATEGORIES)
-    bills_received = all_bills.filter(category__in=INCOME_CATEGORIES, paid=True)
     bills_to_pay = all_bills.filter(category__in=EXPENSE_CATEGORIES)
-    bills_paid = all_bills.filter(category__in=EXPENSE_CATEGORIES, paid=True)
-    bills_pending = all_bills.filter(paid=False)
-    bills_late = all_bills.filter(late=True)
-
-    bills_to_receive_total = sum([bill.total for bill in bills_to_receive])
-    bills_to_receive_pending_total = sum([bill.total for bill in bills_to_receive if not bill.paid])
-    bills_to_receive_late_total = sum([bill.total for bill in bills_to_receive if bill.late])
-    bills_received_total = sum([bill.total for bill in bills_received])
-    bills_to_pay_total = sum([bill.total for bill in bills_to_pay])
-    bills_to_pay_pending_total = sum([bill.total for bill in bills_to_pay if not bill.paid])
-    bills_to_pay_late_total = sum([bill.total for bill in bills_to_pay if bill.late])
-    bills_paid_total = sum([bill.total for bill in bills_paid])
-    bills_pending_total = sum([bill.total for bill in bills_pending])
-    bills_late_total = sum([bill.total for bill in bills_late])
-
-    bills_to_receive_count = bills_to_receive.count()
-    bills_received_count = bills_received.count()
-    bills_to_pay_count = bills_to_pay.count()
-    bills_paid_count = bills_paid.count()
-    bills_pending_count = bills_pending.count()
-    bills_late_count = bills_late.count()
+
+    totals = get_bill_totals(all_bills, currency)
+    min_value, max_value = bill_bounds(currency)
 
     context = {
-        'user_profile': Profile.objects.get(user=request.user),
         'offices': Office.objects.all(),
         'clients': Client.objects.all(),
-        'bills_to_receive': bills_to_receive,
-        'bills_to_pay': bills_to_pay,
-        'received': bills_received_count,
-        'received_value': bills_received_total,
-        'paid': bills_paid_count,
-        'paid_value': bills_paid_total,
-        'to_receive': bills_to_receive_count,
-        'to_receive_value': bills_to_receive_total,
-        'to_receive_late_value': bills_to_receive_late_total,
-        'to_receive_pending_value': bills_to_receive_pending_total,
-        'to_pay': bills_to_pay_count,
-        'to_pay_value': bills_to_pay_total,
-        'to_pay_late_value': bills_to_pay_late_total,
-        'to_pay_pending_value': bills_to_pay_pending_total,
-        'pending': bills_pending_count,
-        'pending_value': bills_pending_total,
-        'late': bills_late_count,
-        'late_value': bills_late_total,
+        'bills_to_receive': bills_to_receive.select_related('client', 'office', 'payer'),
+        'bills_to_pay': bills_to_pay.select_related('client', 'office', 'payer'),
+        'received': totals['received_count'],
+        'received_value': totals['received_total'],
+        'paid': totals['paid_count'],
+        'paid_value': totals['paid_total'],
+        'to_receive': totals['to_receive_count'],
+        'to_receive_value': totals['to_receive_total'],
+        'to_receive_late_value': totals['to_receive_late_total'],
+        'to_receive_pending_value': totals['to_receive_pending_total'],
+        'to_pay': totals['to_pay_count'],
+        'to_pay_value': totals['to_pay_total'],
+        'to_pay_late_value': totals['to_pay_late_total'],
+        'to_pay_pending_value': totals['to_pay_pending_total'],
+        'pending': totals['pending_count'],
+        'pending_value': totals['pending_total'],
+        'late': totals['late_count'],
+        'late_value': totals['late_total'],
         'currency': currency,
         'date_now': datetime.now().date(),
         'currency_symbol': '$' if currency == 'USD' else 'R$' if currency == 'BRL' else '€',
         'sorted_by': sorted_by.replace('-', '_') if sorted_by else None,
         'sort_type': sort_type.replace('-', '_') if sort_type else None,
         'filters': filters,
-        'min_value': str(Bill.objects.all().order_by('total').first().total).replace(
-            '$' if currency == 'USD' else 'R$' if currency == 'BRL' else '€', '').replace(',',
-                                                                                          '') if Bill.objects.all().count() > 0 else 0,
-        'max_value': str(Bill.objects.all().order_by('-total').first().total).replace(
-            '$' if currency == 'USD' else 'R$' if currency == 'BRL' else '€', '').replace(',',
-                                                                                          '') if Bill.objects.all().count() > 0 else 0,
+        'min_value': min_value,
+        'max_value': max_value,
         'segment': 'administrative',
     }
 
-    context.update({'bills': sort_bill_objects(all_bills, sorted_by, sort_type), 'max_id': max_id})
+    bills, field = sort_bill_objects(all_bills, sorted_by, sort_type)
+    page, next_cursor = paginate_bills(bills, field, sort_type, request.GET.get('after'))
+    context.update({'bills': page, 'next_cursor': next_cursor, 'max_id': max_id})
 
     return render(request, 'home/bills.html', context)
 
 
 def new_bill(request):
     if not get_permission(request, 'add', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     if request.method == 'POST':
         currency = request.POST.get('currency', 'USD')
@@ -388,10 +314,7 @@ def new_bill(request):
 
 def delete_bill(request, bill_id):
     if not get_permission(request, 'delete', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     if request.method == 'POST':
         Bill.objects.get(id=bill_id).delete()
@@ -412,10 +335,7 @@ def delete_bill(request, bill_id):
 
 def change_status(request, bill_id):
     if not get_permission(request, 'change', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     bill = Bill.objects.get(id=bill_id)
     if not bill.paid:
@@ -455,14 +375,7 @@ def sort_and_filter_bills(request):
 
 
 def filter_bills(request):
-    universal_min_value = str(Bill.objects.all().order_by('total').first().total).replace(
-        '$' if request.POST.get('currency', 'BRL') == 'USD' else 'R$' if request.POST.get('currency',
-                                                                                          'BRL') == 'BRL' else '€',
-        '').replace(',', '') if Bill.objects.all().count() > 0 else 0
-    universal_max_value = str(Bill.objects.all().order_by('-total').first().total).replace(
-        '$' if request.POST.get('currency', 'BRL') == 'USD' else 'R$' if request.POST.get('currency',
-                                                                                          'BRL') == 'BRL' else '€',
-        '').replace(',', '') if Bill.objects.all().count() > 0 else 0
+    universal_min_value, universal_max_value = map(str, bill_bounds(request.POST.get('currency', 'BRL')))
 
     office = request.POST['office']
     from_date = request.POST['start_date']
@@ -518,25 +431,16 @@ def filter_bills(request):
 
 def download_bill(request, bill_id):
     if not get_permission(request, 'view', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     bill = Bill.objects.get(id=bill_id)
     file_name = bill.proof.name
-    file_content = default_storage.open(file_name).read()
-    response = HttpResponse(file_content, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{file_name.split("/")[-1]}"'
-    return response
+    return download_response(request, file_name)
 
 
 def edit_bill(request, bill_id):
     if not get_permission(request, 'change', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     bill = Bill.objects.get(id=bill_id)
     if request.method == 'POST':
@@ -1,13 +1,18 @@
-import json
 from datetime import datetime, timedelta
-from django.db.models import Q, Sum, F
+from django.db.models import Q, Sum, F, Max
 from django.shortcuts import render, redirect, get_object_or_404
-from apps.home.models import Profile, Client, Office, Document, Bill, BillInstallment, BillProof, Branch
-from apps.home.views.balance import INCOME_CATEGORIES, EXPENSE_CATEGORIES, unmask_money, check_late_bills
-from django.core.files.storage import default_storage
-from django.http import HttpResponse, JsonResponse
-from core.settings import CORE_DIR
+from apps.home.models import (
+    Profile, Client, Office, Document, Bill, BillInstallment, BillProof, Branch, CashFlowMonth,
+    INCOME_CATEGORIES, EXPENSE_CATEGORIES,
+)
+from apps.home.views.balance import unmask_money, bill_query
+from apps.home.filter_spec import parse_filters, document_query
+from apps.home.ledger import bill_batch, create_installments, set_installments_paid
+from django.http import JsonResponse
 from djmoney.money import Money
+from apps.home.downloads import download_response
+from apps.home.bounds import bill_bounds, queryset_bounds
+from apps.home.lookups import world
 
 
 MONTHS = {
@@ -17,19 +22,6 @@ MONTHS = {
 }
 
 
-def check_expired_documents():
-    expired_documents = Document.objects.filter(Q(expiration__lt=datetime.now().date()) & Q(expired=False))
-    for doc in expired_documents:
-        doc.expired = True
-        doc.save()
-
-    unexpected_expired_documents = Document.objects.filter(
-        Q(expiration__gt=datetime.now().date()) & Q(expired=True))
-    for doc in unexpected_expired_documents:
-        doc.expired = False
-        doc.save()
-
-
 def get_permission(request, permission_type, model='client'):
     return request.user.has_perm(f'home.{permission_type}_{model}')
 
@@ -74,8 +66,6 @@ def home(request, filters=None, sorted_by=None, sort_type=None):
     if not get_permission(request, 'view'):
         return render(request, 'home/page-404.html')
 
-    check_expired_documents()
-
     clients = filter_clients_objects(request, filters)
     clients = sort_clients_objects(clients, sorted_by, sort_type)
 
@@ -88,56 +78,27 @@ def home(request, filters=None, sorted_by=None, sort_type=None):
     current_month_index = datetime.now().month
     current_year = datetime.now().year
     start_month_index = (current_month_index - 6 + 12) % 12
-    months_numbers = [(start_month_index + i) % 12 + 1 for i in range(6)]
-
-    received_list = []
-    paid_list = []
-
-    for month in months_numbers:
-        year = current_year
-        if month > current_month_index:
-            year -= 1
-
-        query = (Q(paid_at__month=month) & Q(paid_at__year=year))
 
-        at_sight = Bill.objects.filter(
-            query & Q(installments_number=0) & Q(client__in=clients)
-        ).distinct()
+    start_month = datetime(current_year, current_month_index, 1).date()
+    for _ in range(5):
+        start_month = (start_month - timedelta(days=1)).replace(day=1)
 
-        income_bills = at_sight.filter(category__in=INCOME_CATEGORIES)
-        expense_bills = at_sight.filter(category__in=EXPENSE_CATEGORIES)
+    months = [start_month]
+    for _ in range(5):
+        months.append((months[-1] + timedelta(days=32)).replace(day=1))
 
-        received_at_sight = sum([bill.partial for bill in income_bills])
-        paid_at_sight = sum([bill.partial for bill in expense_bills])
-
-        received_list.append(received_at_sight)
-        paid_list.append(paid_at_sight)
-
-        with_installments = Bill.objects.filter(
-            (query | Q(partial__lt=F('total'))) & Q(installments_number__gt=1) & Q(client__in=clients)
-        ).distinct()
-
-        income_bills_installments = with_installments.filter(category__in=INCOME_CATEGORIES)
-        expense_bills_installments = with_installments.filter(category__in=EXPENSE_CATEGORIES)
-
-        received_installments = sum([
-            installment.value
-            for bill in income_bills_installments
-            for installment in bill.installments.filter(paid_at__month=month, paid_at__year=year)
-        ])
-
-        paid_installments = sum([
-            installment.value
-            for bill in expense_bills_installments
-            for installment in bill.installments.filter(paid_at__month=month, paid_at__year=year)
-        ])
+    rollup = {
+        (row['month'], row['kind']): row['amount']
+        for row in CashFlowMonth.objects.filter(
+            client__in=clients, currency='BRL', month__gte=start_month
+        ).values('month', 'kind').annotate(amount=Sum('total'))
+    }
 
-        received_list[-1] += received_installments
-        paid_list[-1] += paid_installments
+    received_list = [Money(rollup.get((month, 'income'), 0), 'BRL') for month in months]
+    paid_list = [Money(rollup.get((month, 'expense'), 0), 'BRL') for month in months]
 
     context = {
         'upcoming_bills': Bill.objects.filter(upcoming_query).distinct(),
-        'user_profile': Profile.objects.get(user=request.user),
         'clients': clients,
         'offices': Office.objects.all(),
         'filters': filters,
@@ -209,16 +170,9 @@ def sort(request):
 def filter_clients_objects(request, filters):
     clients = Client.objects.all()
 
-    if filters:
-        filters_list = filters.split('&')
-
-        office = 'all'
-
-        for item in filters_list:
-            office = item.split('=')[1] if item.startswith('office') else office
-
-        if office != 'all':
-            clients = clients.filter(office=office if office else None)
+    office = parse_filters(filters).get('office', 'all')
+    if office != 'all':
+        clients = clients.filter(office=office if office else None)
 
     return clients
 
@@ -282,8 +236,6 @@ def details(request, slug):
     if not get_permission(request, 'change'):
         return render(request, 'home/page-404.html')
 
-    check_expired_documents()
-
     client = Client.objects.get(slug=slug)
 
     if request.method == 'POST':
@@ -346,7 +298,6 @@ def details(request, slug):
 
     context = {
         'currency': 'BRL',  # TODO: Change to currency variable when implemented
-        'user_profile': Profile.objects.get(user=request.user),
         'client': client,
         'collaborators': Profile.objects.filter(user__username__endswith='@infinitefoundry.com').exclude(
             user__username__startswith='admin').exclude(user__username__startswith='hub'),
@@ -359,7 +310,7 @@ def details(request, slug):
         'expense_categories': EXPENSE_CATEGORIES,
         'bills_in_progress': bills_in_progress,
         'offices': Office.objects.all(),
-        'world': json.load(open(f'{CORE_DIR}/apps/static/assets/world.json', 'r', encoding='utf-8')),
+        'world': world(),
         'highlight_documents': Document.objects.filter(client=client).order_by('-id')[:5],
     }
 
@@ -446,8 +397,6 @@ def documents_page(request, slug, sorted_by=None, sort_type=None, filters=None):
     if not get_permission(request, 'view', 'document'):
         return render(request, 'home/page-404.html')
 
-    check_expired_documents()
-
     client = Client.objects.get(slug=slug)
     documents = filter_documents_objects(filters, slug)[0]
     if sorted_by is not None and sorted_by != 'regional':
@@ -456,7 +405,6 @@ def documents_page(request, slug, sorted_by=None, sort_type=None, filters=None):
         documents = documents.order_by(f'{"-" if sort_type == "desc" else ""}branch__name')
 
     context = {
-        'user_profile': Profile.objects.get(user=request.user),
         'client': client,
         'sorted_by': sorted_by,
         'sort_type': sort_type,
@@ -512,10 +460,6 @@ def delete_document(request, slug, document_id):
     if request.method == 'POST':
         redirect_to = request.POST.get('redirect_to', 'client_details')
         document = Document.objects.get(id=document_id)
-        file = document.file
-        if file:
-            file.delete(save=False)
-
         document.delete()
 
         if redirect_to == 'client_documents':
@@ -531,10 +475,7 @@ def download_document(request, slug, document_id):
     document = get_object_or_404(Document, id=document_id)
 
     document_name = document.file.name
-    file_content = default_storage.open(document_name).read()
-    response = HttpResponse(file_content, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{document_name.split("/")[-1]}"'
-    return response
+    return download_response(request, document_name)
 
 
 def sort_and_filter_documents(request, slug):
@@ -545,35 +486,9 @@ def sort_and_filter_documents(request, slug):
 
 
 def filter_documents_objects(filters, slug):
-    documents = Document.objects.filter(client=Client.objects.get(slug=slug))
-
-    if filters is not None:
-        filters_list = filters.split('&')
+    documents = Document.objects.filter(client__slug=slug).filter(document_query(parse_filters(filters)))
 
-        category, regional = 'all', 'all'
-        from_date, to_date = False, False
-
-        for item in filters_list:
-            from_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('from') else from_date
-            to_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('to') else to_date
-            category = item.split('=')[1] if item.startswith('category') else category
-            regional = item.split('=')[1] if item.startswith('regional') else regional
-
-            if from_date and to_date and from_date < to_date:
-                documents = documents.filter(expiration__gte=from_date)
-                documents = documents.filter(expiration__lte=to_date)
-            elif from_date:
-                documents = documents.filter(expiration__gte=from_date)
-            elif to_date:
-                documents = documents.filter(expiration__lte=to_date)
-
-            if category != 'all':
-                documents = documents.filter(category=category)
-
-            if regional != 'all':
-                documents = documents.filter(branch__id=regional)
-
-    return documents, documents.order_by('-id').first().id if documents.count() > 0 else 0
+    return documents, documents.aggregate(max_id=Max('id'))['max_id'] or 0
 
 
 def filter_documents(request, slug):
@@ -610,8 +525,6 @@ def balance_page(request, slug, sorted_by=None, sort_type=None, filters=None):
     if not get_permission(request, 'view', 'document'):
         return render(request, 'home/page-404.html')
 
-    check_late_bills()
-
     client = Client.objects.get(slug=slug)
     bills = filter_bill_objects(filters, slug)[0]
     if sorted_by is not None:
@@ -649,8 +562,9 @@ def balance_page(request, slug, sorted_by=None, sort_type=None, filters=None):
             due_date__lte=datetime.now().date()) if not installment.paid
     ]) if bill.late and bill.installments_number > 1 else bill.total if bill.late else 0 for bill in expense_bills])
 
+    min_value, max_value = queryset_bounds(bills)
+
     context = {
-        'user_profile': Profile.objects.get(user=request.user),
         'client': client,
         'bills': bills,
         'received': sum([bill.partial for bill in income_bills]),
@@ -667,8 +581,8 @@ def balance_page(request, slug, sorted_by=None, sort_type=None, filters=None):
         'sorted_by': sorted_by,
         'sort_type': sort_type,
         'filters': filters,
-        'min_value': str(bills.order_by('total').first().total)[2:].replace(',', '') if bills.count() > 0 else 0,
-        'max_value': str(bills.order_by('-total').first().total)[2:].replace(',', '') if bills.count() > 0 else 0,
+        'min_value': min_value,
+        'max_value': max_value,
     }
 
     return render(request, 'home/clients/balance.html', context)
@@ -676,10 +590,7 @@ def balance_page(request, slug, sorted_by=None, sort_type=None, filters=None):
 
 def new_bill(request, slug):
     if not get_permission(request, 'add', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     if request.method == 'POST':
         currency = request.POST.get('currency', 'USD')
@@ -706,31 +617,27 @@ def new_bill(request, slug):
             link=request.POST.get('link', None),
         )
 
-        bill.save()
+        with bill_batch():
+            bill.save()
 
-        if int(bill.installments_number) > 1 and request.POST.get('installments_value'):
-            installments_value = unmask_money(request.POST.get('installments_value', ''), currency)
-            bill.installments_frequency = request.POST.get('installments_frequency', 0)
-            if bill.installments_frequency == '':
-                bill.installments_frequency = 0
+            if int(bill.installments_number) > 1 and request.POST.get('installments_value'):
+                installments_value = unmask_money(request.POST.get('installments_value', ''), currency)
+                bill.installments_frequency = request.POST.get('installments_frequency', 0)
+                if bill.installments_frequency == '':
+                    bill.installments_frequency = 0
 
-            for i in range(1, int(bill.installments_number) + 1):
-                installment = BillInstallment(
-                    bill=bill,
-                    partial_id=i,
-                    value=installments_value,
-                    due_date=datetime.strptime(
-                        str(bill.issue_date), "%Y-%m-%d"
-                    ) + timedelta(days=int(bill.installments_frequency) * i) if bill.issue_date else None,
-                )
-                installment.save()
+                # The first installment is due one period after the issue date
+                first_due_date = datetime.strptime(str(bill.issue_date), "%Y-%m-%d") + timedelta(
+                    days=int(bill.installments_frequency)) if bill.issue_date else None
 
-            bill.save()
+                create_installments(bill, bill.installments_number, installments_value,
+                                    first_due_date, bill.installments_frequency)
+                bill.save()
 
-        else:
-            bill.installments_number = 0
-            bill.installments_frequency = 0
-            bill.save()
+            else:
+                bill.installments_number = 0
+                bill.installments_frequency = 0
+                bill.save()
 
         for file in request.FILES.getlist('proofs'):
             BillProof.objects.create(
@@ -745,10 +652,7 @@ def new_bill(request, slug):
 
 def delete_bill(request, slug, bill_id):
     if not get_permission(request, 'delete', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     Bill.objects.get(id=bill_id).delete()
 
@@ -760,10 +664,7 @@ def delete_bill(request, slug, bill_id):
 
 def edit_bill(request, slug, bill_id):
     if not get_permission(request, 'change', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     bill = Bill.objects.get(id=bill_id)
     if request.method == 'POST':
@@ -805,16 +706,10 @@ def edit_bill(request, slug, bill_id):
 
 def download_bill(request, slug, bill_id, proof_id):
     if not get_permission(request, 'view', 'bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     file_name = Bill.objects.get(id=bill_id).proofs.get(id=proof_id).file.name
-    file_content = default_storage.open(file_name).read()
-    response = HttpResponse(file_content, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{file_name.split("/")[-1]}"'
-    return response
+    return download_response(request, file_name)
 
 
 def change_status(request, slug, bill_id):
@@ -832,19 +727,13 @@ def change_status(request, slug, bill_id):
         bill.payment_info = request.POST.get('payment_info', '')
         bill.paid = True
         if bill.installments_number > 1:
-            for installment in bill.installments.filter(paid=False):
-                installment.paid = True
-                installment.paid_at = bill.paid_at
-                installment.save()
+            set_installments_paid(bill, bill.installments.all(), True, bill.paid_at)
 
     else:
         bill.paid = False
         bill.payment_info = ''
         if bill.installments_number > 1:
-            for installment in bill.installments.filter(paid=True, paid_at=bill.paid_at):
-                installment.paid = False
-                installment.paid_at = None
-                installment.save()
+            set_installments_paid(bill, bill.installments.filter(paid_at=bill.paid_at), False)
 
         bill.paid_at = None
 
@@ -867,105 +756,13 @@ def sort_and_filter_bills(request, slug):
 
 
 def filter_bill_objects(filters, slug):
-    bills = Bill.objects.filter(client=Client.objects.get(slug=slug))
-
-    if filters is not None:
-        filters_list = filters.split('&')
-
-        office, method, category, payer, origin, installments, code = ['all'] * 7
-        from_date, to_date = [False] * 2
-        late, paid, pending = [True] * 3
-        min_value, max_value = [None] * 2
-
-        for item in filters_list:
-            payer = item.split('=')[1] if item.startswith('payer') else payer
-            office = item.split('=')[1] if item.startswith('office') else office
-            from_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('from') else from_date
-            to_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('to') else to_date
-            method = item.split('=')[1] if item.startswith('method') else method
-            category = item.split('=')[1] if item.startswith('category') else category
-            origin = item.split('=')[1] if item.startswith('origin') else origin
-            installments = item.split('=')[1] if item.startswith('installments') else installments
-            code = item.split('=')[1] if item.startswith('code') else code
-            late = item.split('=')[1] if item.startswith('late') else late
-            paid = item.split('=')[1] if item.startswith('paid') else paid
-            pending = item.split('=')[1] if item.startswith('pending') else pending
-            min_value = item.split('=')[1] if item.startswith('value_min') else min_value
-            max_value = item.split('=')[1] if item.startswith('value_max') else max_value
-
-        if payer != 'all':
-            bills = bills.filter(payer__id=int(payer))
-
-        if office != 'all':
-            bills = bills.filter(office__id=int(office))
-
-        if from_date and to_date and from_date < to_date:
-            bills = bills.filter(due_date__gte=from_date, due_date__lte=to_date)
-        elif from_date:
-            bills = bills.filter(due_date__gte=from_date)
-        elif to_date:
-            bills = bills.filter(due_date__lte=to_date)
-
-        if method != 'all':
-            bills = bills.filter(method=method.replace('-', ' ').capitalize())
-
-        if category != 'all':
-            if category == 'income':
-                bills = bills.filter(category__in=INCOME_CATEGORIES)
-            elif category == 'expense':
-                bills = bills.filter(category__in=EXPENSE_CATEGORIES)
-            else:
-                bills = bills.filter(category=category)
-
-        if origin != 'all':
-            bills = bills.filter(origin=origin)
-
-        if code != 'all':
-            match code:
-                case 'code':
-                    bills = bills.filter(Q(code__isnull=False) & ~Q(code=''))
-                case 'link':
-                    bills = bills.filter(Q(link__isnull=False) & ~Q(link=''))
-                case 'both':
-                    bills = bills.filter(
-                        Q(code__isnull=False) & ~Q(code='') & Q(link__isnull=False) & ~Q(link='')
-                    )
-                case _:
-                    pass
-
-        if late == 'false':
-            bills = bills.filter(late=False)
-
-        if paid == 'false':
-            bills = bills.filter(paid=False)
-
-        if pending == 'false':
-            bills = bills.filter(Q(paid=True, late=False) | Q(paid=False, late=True))
-
-        if min_value:
-            bills = bills.filter(total__gte=min_value)
-
-        if max_value:
-            bills = bills.filter(total__lte=max_value)
-
-        if installments != 'all':
-            if installments == 'true':
-                bills = bills.filter(installments_number__gte=1)
-            else:
-                bills = bills.filter(installments_number__lt=1)
+    bills = Bill.objects.filter(client__slug=slug).filter(bill_query(parse_filters(filters)))
 
-    return bills, bills.order_by('-id').first().id if bills.count() > 0 else 0
+    return bills, bills.aggregate(max_id=Max('id'))['max_id'] or 0
 
 
 def filter_bills(request, slug):
-    universal_min_value = str(Bill.objects.all().order_by('total').first().total).replace(
-        '$' if request.POST.get('currency', 'BRL') == 'USD' else 'R$' if request.POST.get('currency',
-                                                                                          'BRL') == 'BRL' else '€',
-        '').replace(',', '') if Bill.objects.all().count() > 0 else 0
-    universal_max_value = str(Bill.objects.all().order_by('-total').first().total).replace(
-        '$' if request.POST.get('currency', 'BRL') == 'USD' else 'R$' if request.POST.get('currency',
-                                                                                          'BRL') == 'BRL' else '€',
-        '').replace(',', '') if Bill.objects.all().count() > 0 else 0
+    universal_min_value, universal_max_value = map(str, bill_bounds(request.POST.get('currency', 'BRL')))
 
     payer = request.POST['payer']
     office = request.POST['office']
@@ -1086,24 +883,24 @@ def installment_change_status(request, slug, bill_id, installment_id):
     current.receipt = request.POST.get('receipt', None)
     current.authentication_key = request.POST.get('authentication_key', None)
     current.payment_info = request.POST.get('installment_info', current.payment_info)
-    current.save()
 
-    installments = BillInstallment.objects.filter(bill__id=bill_id).order_by('due_date')
-    unpaid = installments.filter(paid=False)
+    with bill_batch():
+        current.save()
 
-    if unpaid.count() > 0:
-        current.bill.due_date = unpaid[0].due_date
-        if current.bill.paid:
-            current.bill.paid = False
-            current.bill.paid_at = current.paid_at
-            current.bill.save()
+        installments = BillInstallment.objects.filter(bill__id=bill_id).order_by('due_date')
+        unpaid = installments.filter(paid=False)
 
-    else:
-        current.bill.paid = True
-        current.bill.paid_at = installments.last().paid_at
-        current.bill.save()
+        if unpaid.count() > 0:
+            current.bill.due_date = unpaid[0].due_date
+            if current.bill.paid:
+                current.bill.paid = False
+                current.bill.paid_at = current.paid_at
 
-    current.bill.save()
+        else:
+            current.bill.paid = True
+            current.bill.paid_at = installments.last().paid_at
+
+        current.bill.save()
 
     if request.POST.get('client_page', False):
         return redirect('client_details', slug=slug)
@@ -1130,7 +927,6 @@ def installment_edit(request, slug, bill_id, installment_id):
     currency = request.POST.get('currency', 'BRL')
 
     installment = BillInstallment.objects.get(id=installment_id)
-    bill = Bill.objects.get(id=bill_id)
 
     new_installment_value = unmask_money(request.POST.get('installment_value', 0), currency)
     due_date = request.POST.get('installment_due_date', installment.due_date)
@@ -1143,6 +939,7 @@ def installment_edit(request, slug, bill_id, installment_id):
     installment.payment_info = request.POST.get('installment_info', installment.payment_info)
     installment.save()
 
+    bill = Bill.objects.get(id=bill_id)
     if installment.due_date is None:
         try:
             installment.bill.due_date = installment.bill.installments.filter(
@@ -1171,18 +968,19 @@ def installments_edit_all(request, slug, bill_id):
     values = {key: value for key, value in request.POST.items() if key.startswith('installment_value')}
     due_dates = {key: value for key, value in request.POST.items() if key.startswith('installment_due_date')}
 
-    for value, due_date in zip(values.items(), due_dates.items()):
-        installment_id = value[0].split('_')[2]
-        value = unmask_money(value[1], currency)
-        due_date = due_date[1] if due_date[1] != '' else None
-        installment = BillInstallment.objects.get(id=installment_id)
+    with bill_batch():
+        for value, due_date in zip(values.items(), due_dates.items()):
+            installment_id = value[0].split('_')[2]
+            value = unmask_money(value[1], currency)
+            due_date = due_date[1] if due_date[1] != '' else None
+            installment = BillInstallment.objects.get(id=installment_id)
 
-        if (Money(value, currency=currency) != installment.value or
-                datetime.strptime(due_date, '%Y-%m-%d').date() != installment.due_date):
+            if (Money(value, currency=currency) != installment.value or
+                    datetime.strptime(due_date, '%Y-%m-%d').date() != installment.due_date):
 
-            installment.value = value
-            installment.due_date = due_date
-            installment.save()
+                installment.value = value
+                installment.due_date = due_date
+                installment.save()
 
     return process_filters(request, 'balance', slug)
 
@@ -1203,9 +1001,10 @@ def installment_delete(request, slug, bill_id, installment_id):
 
     installment.bill.save()
 
-    for i, installment in enumerate(ordered_installments):
+    installments = list(ordered_installments)
+    for i, installment in enumerate(installments):
         installment.partial_id = i + 1
-        installment.save()
+    BillInstallment.objects.bulk_update(installments, ['partial_id'])
 
     sorted_by = request.POST['sort_by'] if request.POST.get('sort_by', False) else ''
     sort_type = request.POST.get('sort_type', None) if request.POST.get('sort_type', None) != 'None' else None
@@ -1,48 +1,15 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from apps.home.models import Profile, Office, Document, BankAccount, BANKS
-from django.core.files.storage import default_storage
-from django.http import HttpResponse, Http404
+from apps.home.models import Profile, Office, Document, BankAccount, banks
+from apps.home.filter_spec import parse_filters, document_query, date_range_query
+from django.http import Http404
 from django.contrib.auth.models import User
-from django.db.models import Q
 import datetime
 import os
-
-
-def check_expired_documents():
-    expired_documents = Document.objects.filter(Q(expiration__lt=datetime.datetime.now().date()) & Q(expired=False))
-    for doc in expired_documents:
-        doc.expired = True
-        doc.save()
+from apps.home.downloads import download_response
 
 
 def filter_documents_objects(user, filters):
-    documents = Document.objects.filter(user=user)
-
-    if filters:
-        filters_list = filters.split('&')
-
-        category = 'all'
-        from_date, to_date = False, False
-        expired, up_to_date = True, True
-
-        for item in filters_list:
-            from_date = datetime.datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith(
-                'from') else from_date
-            to_date = datetime.datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('to') else to_date
-            category = item.split('=')[1] if item.startswith('category') else category
-
-            if from_date and to_date and from_date < to_date:
-                documents = documents.filter(expiration__gte=from_date)
-                documents = documents.filter(expiration__lte=to_date)
-            elif from_date:
-                documents = documents.filter(expiration__gte=from_date)
-            elif to_date:
-                documents = documents.filter(expiration__lte=to_date)
-
-            if category != 'all':
-                documents = documents.filter(category=category if category else None)
-
-    return documents
+    return Document.objects.filter(user=user).filter(document_query(parse_filters(filters)))
 
 
 def sort_documents_objects(documents, sorted_by, sort_type):
@@ -64,8 +31,6 @@ def get_permission(request, permission_type, model='bill'):
 
 
 def page_list(request, filters=None, sorted_by=None, sort_type=None):
-    check_expired_documents()
-
     collaborators = filter_collaborators_objects(request, filters)
     collaborators = sort_collaborators_objects(collaborators, sorted_by, sort_type)
 
@@ -79,7 +44,6 @@ def page_list(request, filters=None, sorted_by=None, sort_type=None):
         'sort_type': sort_type.replace('-', '_') if sort_type else None,
         'filters': filters,
         'collaborators': collaborators,
-        'user_profile': Profile.objects.get(user=request.user),
         'offices': Office.objects.all(),
         'min_aso_date': min_aso_date,
         'max_aso_date': max_aso_date,
@@ -90,12 +54,7 @@ def page_list(request, filters=None, sorted_by=None, sort_type=None):
 
 def details(request, slug, sorted_by=None, sort_type=None, filters=None):
     if not get_permission(request, 'view', 'document'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
-
-    check_expired_documents()
+        return render(request, 'home/page-404.html')
 
     collab = Profile.objects.get(slug=slug)
     documents = filter_documents_objects(collab.user, filters)
@@ -115,13 +74,12 @@ def details(request, slug, sorted_by=None, sort_type=None, filters=None):
         'collaborator': collab,
         'collaborator_documents': documents,
         'collaborator_all_documents': Document.objects.filter(user=collab.user).count(),
-        'user_profile': Profile.objects.get(user=request.user),
         'aso_date': aso_document.expiration if aso_document else None,
         'aso_expiration': days_to_aso,
         'expired_documents': expired_documents_count,
         'expired_documents_percentage': (expired_documents_count / Document.objects.filter(
             user=collab.user).count()) * 100 if Document.objects.filter(user=collab.user).count() > 0 else 0,
-        'banks': BANKS.items(),
+        'banks': banks().items(),
     }
 
     return render(request, 'home/collaborators/details.html', context)
@@ -155,10 +113,6 @@ def change_status(request, collab_id):
 
 def delete_document(request, slug, document_id):
     document = get_object_or_404(Document, id=document_id)
-    document_path = document.file
-    if document_path:
-        document_path.delete(save=False)
-
     document.delete()
 
     return redirect('collaborator_details', slug=slug)
@@ -183,10 +137,7 @@ def download_document(request, document_id):
     document = get_object_or_404(Document, id=document_id)
 
     document_name = document.file.name
-    file_content = default_storage.open(document_name).read()
-    response = HttpResponse(file_content, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{document_name.split("/")[-1]}"'
-    return response
+    return download_response(request, document_name)
 
 
 def download_collaborator_qrcode(request, slug):
@@ -194,10 +145,7 @@ def download_collaborator_qrcode(request, slug):
     qr = collaborator.qrcode
 
     file_name = qr.name
-    file_content = default_storage.open(file_name).read()
-    response = HttpResponse(file_content, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{file_name.split("/")[-1]}"'
-    return response
+    return download_response(request, file_name)
 
 
 def sort_docs(request, slug):
@@ -328,39 +276,23 @@ def filter_collaborators_objects(request, filters):
         ]
     }
 
-    if filters:
-        filters_list = filters.split('&')
-
-        office, group = 'all', 'all'
-        from_date, to_date = None, None
-        disabled, active = True, True
-
-        for item in filters_list:
-            office = item.split('=')[1] if item.startswith('office') else office
-            group = item.split('=')[1] if item.startswith('group') else group
-            from_date = datetime.datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith(
-                'from') else from_date
-            to_date = datetime.datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('to') else to_date
-            disabled = False if item.startswith('disabled') else disabled
-            active = False if item.startswith('active') else active
-
-        if office != 'all':
-            collaborators = collaborators.filter(office=office if office else None)
+    spec = parse_filters(filters)
 
-        if group != 'all':
-            collaborators = collaborators.filter(user__username__in=groups[group])
+    office = spec.get('office', 'all')
+    if office != 'all':
+        collaborators = collaborators.filter(office=office if office else None)
 
-        if to_date is not None:
-            collaborators = collaborators.filter(birthday__lte=to_date)
+    group = spec.get('group', 'all')
+    if group != 'all':
+        collaborators = collaborators.filter(user__username__in=groups[group])
 
-        if from_date is not None:
-            collaborators = collaborators.filter(birthday__gte=from_date)
+    collaborators = collaborators.filter(date_range_query(spec, 'birthday', ordered=False))
 
-        if not disabled:
-            collaborators = collaborators.filter(user__is_active=True)
+    if spec.has('disabled'):
+        collaborators = collaborators.filter(user__is_active=True)
 
-        if not active:
-            collaborators = collaborators.filter(user__is_active=False)
+    if spec.has('active'):
+        collaborators = collaborators.filter(user__is_active=False)
 
     return collaborators
 
@@ -431,8 +363,7 @@ def add_bank_account(request, slug):
     collaborator = Profile.objects.get(slug=slug)
 
     if not request.user.has_perm('home.add_bankaccount'):
-        context = {'user_profile': Profile.objects.get(user=request.user)}
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     bank_account = BankAccount(
         user=collaborator.user,
@@ -450,8 +381,7 @@ def add_bank_account(request, slug):
 
 def edit_bank_account(request, slug, bank_account_id):
     if not request.user.has_perm('home.change_bankaccount'):
-        context = {'user_profile': Profile.objects.get(user=request.user)}
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     bank_account = get_object_or_404(BankAccount, id=bank_account_id)
 
@@ -468,8 +398,7 @@ def edit_bank_account(request, slug, bank_account_id):
 
 def delete_bank_account(request, slug, bank_account_id):
     if not request.user.has_perm('home.delete_bankaccount'):
-        context = {'user_profile': Profile.objects.get(user=request.user)}
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     bank_account = get_object_or_404(BankAccount, id=bank_account_id)
     bank_account.delete()
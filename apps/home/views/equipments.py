@@ -1,9 +1,8 @@
 import datetime
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
-from apps.home.models import Profile, Equipments
+from apps.home.models import Equipments
 from django.core.paginator import Paginator
-from django.core.files.storage import default_storage
+from apps.home.downloads import download_response
 
 
 def get_paginated_equipments(request):
@@ -42,11 +41,9 @@ def inventory_list(request):
         return redirect('inventory_list')
 
     paginator, equipments = get_paginated_equipments(request)
-    user_profile = Profile.objects.get(user=request.user)
 
     context = {
         'equipment_list': equipments,
-        'user_profile': user_profile,
         'segment': 'inventory',
     }
 
@@ -56,10 +53,7 @@ def inventory_list(request):
 def download_qrcode_inventory(request, equipment_id):
     equipment = get_object_or_404(Equipments, pk=equipment_id)
     qrcode_name = equipment.qrcode.name
-    file_content = default_storage.open(qrcode_name).read()
-    response = HttpResponse(file_content, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{qrcode_name.split("/")[-1]}"'
-    return response
+    return download_response(request, qrcode_name)
 
 
 def delete_equipment(request, id):
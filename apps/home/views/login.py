@@ -3,16 +3,12 @@ from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse, HttpResponseRedirect
 from django.template import loader
 from django.urls import reverse
-from apps.home.models import Profile
 
 
 @login_required(login_url="/login/")
 def index(request):
-    user_profile, create = Profile.objects.get_or_create(user=request.user)
-
     context = {
         'segment': 'index',
-        'user_profile': user_profile,
     }
 
     html_template = loader.get_template('home/index.html')
@@ -23,10 +19,7 @@ def index(request):
 def pages(request):
     # All resource paths end in .html.
     # Pick out the html file name from the url. And load that template.
-    user_profile, create = Profile.objects.get_or_create(user=request.user)
-    context = {
-        'user_profile': user_profile,
-    }
+    context = {}
 
     try:
         load_template = request.path.split('/')[-1]
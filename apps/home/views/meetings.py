@@ -3,6 +3,8 @@ from django.shortcuts import render
 from django.shortcuts import redirect
 from django.contrib.auth.models import User
 from apps.home.models import Meeting, Project, Task, Profile, SubTask
+from apps.home.progress import complete_subtasks
+from apps.home.participants import listed_meetings, meetings_with_domain
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 
@@ -24,12 +26,16 @@ def get_paginated_meetings(request, meetings_list):
 
 def home(request):
     user = request.user
-    meetings_list = Meeting.objects.all().order_by('-start')
+    domain = request.GET.get('domain', '')
+    meetings_list = listed_meetings()
+    if domain:
+        meetings_list = meetings_with_domain(meetings_list, domain)
+
     meetings, paginator = get_paginated_meetings(request, meetings_list)
     context = {
-        'user_profile': user.profile,
         'meetings_list': meetings,
         'paginator': paginator,
+        'domain': domain,
     }
 
     return render(request, 'home/meetings/home.html', context)
@@ -63,7 +69,6 @@ def details(request, meeting_id):
 
     context = {
         'meeting': meeting,
-        'user_profile': request.user.profile,
         'requests_to_attend': requests.filter(completed=False).count(),
         'projects': Project.objects.filter(archive=False).order_by('title'),
         'segment': 'meetings',
@@ -113,9 +118,7 @@ def change_task_status(request, meeting_id, task_id):
             task.completed = True
             task.completed_by = request.user
             task.completed_at = datetime.now()
-            task.subtasks.filter(completed=False).update(
-                completed=True, completed_by=request.user, completed_at=datetime.now()
-            )
+            complete_subtasks(task, request.user)
 
         task.save()
 
@@ -151,7 +154,6 @@ def submit_subtask(request, meeting_id, task_id):
 def delete_subtask(request, meeting_id, task_id, subtask_id):
     subtask = SubTask.objects.get(id=subtask_id, task__id=task_id)
     subtask.delete()
-    subtask.task.project.save(update_tasks=True)
 
     return redirect('meeting_details', meeting_id=meeting_id)
 
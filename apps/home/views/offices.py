@@ -1,13 +1,17 @@
-from apps.home.views.balance import INCOME_CATEGORIES, EXPENSE_CATEGORIES, unmask_money, check_late_bills
+from apps.home.views.balance import unmask_money, bill_query
+from apps.home.filter_spec import parse_filters, document_query
+from apps.home.ledger import bill_batch, create_installments, set_installments_paid
 from django.shortcuts import render, redirect, get_object_or_404
-from apps.home.models import Profile, Office, Document, Bill, Client, Branch, BillInstallment, BANKS, BankAccount
-from django.core.files.storage import default_storage
+from apps.home.models import (
+    Profile, Office, Document, Bill, Client, Branch, BillInstallment, banks, BankAccount,
+    INCOME_CATEGORIES, EXPENSE_CATEGORIES,
+)
 from django.core.paginator import Paginator
-from django.db.models import Q, Sum, F
-from django.http import HttpResponse
+from django.db.models import Q, Sum, F, Max
 from datetime import datetime
 from datetime import timedelta
-from djmoney.money import Money
+from apps.home.downloads import download_response
+from apps.home.bounds import bill_bounds, queryset_bounds
 
 
 def get_paginated_offices(request, order_by):
@@ -26,107 +30,8 @@ def get_paginated_offices(request, order_by):
     return paginator, clients
 
 
-def check_expired_documents():
-    expired_documents = Document.objects.filter(Q(expiration__lt=datetime.now().date()) & Q(expired=False))
-    for doc in expired_documents:
-        doc.expired = True
-        doc.save()
-
-    unexpected_expired_documents = Document.objects.filter(
-        Q(expiration__gt=datetime.now().date()) & Q(expired=True))
-    for doc in unexpected_expired_documents:
-        doc.expired = False
-        doc.save()
-
-
 def filter_bill_objects(filters, bills):
-
-    if filters is not None:
-        filters_list = filters.split('&')
-
-        office, method, category, payer, origin, installments, code = ['all'] * 7
-        from_date, to_date = [False] * 2
-        late, paid, pending = [True] * 3
-        min_value, max_value = [None] * 2
-
-        for item in filters_list:
-            payer = item.split('=')[1] if item.startswith('payer') else payer
-            office = item.split('=')[1] if item.startswith('office') else office
-            from_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('from') else from_date
-            to_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('to') else to_date
-            method = item.split('=')[1] if item.startswith('method') else method
-            category = item.split('=')[1] if item.startswith('category') else category
-            origin = item.split('=')[1] if item.startswith('origin') else origin
-            installments = item.split('=')[1] if item.startswith('installments') else installments
-            code = item.split('=')[1] if item.startswith('code') else code
-            late = item.split('=')[1] if item.startswith('late') else late
-            paid = item.split('=')[1] if item.startswith('paid') else paid
-            pending = item.split('=')[1] if item.startswith('pending') else pending
-            min_value = item.split('=')[1] if item.startswith('value_min') else min_value
-            max_value = item.split('=')[1] if item.startswith('value_max') else max_value
-
-        if payer != 'all':
-            bills = bills.filter(payer__id=int(payer))
-
-        if office != 'all':
-            bills = bills.filter(office__id=int(office))
-
-        if from_date and to_date and from_date < to_date:
-            bills = bills.filter(due_date__gte=from_date, due_date__lte=to_date)
-        elif from_date:
-            bills = bills.filter(due_date__gte=from_date)
-        elif to_date:
-            bills = bills.filter(due_date__lte=to_date)
-
-        if method != 'all':
-            bills = bills.filter(method=method.replace('-', ' ').capitalize())
-
-        if category != 'all':
-            if category == 'income':
-                bills = bills.filter(category__in=INCOME_CATEGORIES)
-            elif category == 'expense':
-                bills = bills.filter(category__in=EXPENSE_CATEGORIES)
-            else:
-                bills = bills.filter(category=category)
-
-        if origin != 'all':
-            bills = bills.filter(origin=origin)
-
-        if code != 'all':
-            match code:
-                case 'code':
-                    bills = bills.filter(Q(code__isnull=False) & ~Q(code=''))
-                case 'link':
-                    bills = bills.filter(Q(link__isnull=False) & ~Q(link=''))
-                case 'both':
-                    bills = bills.filter(
-                        Q(code__isnull=False) & ~Q(code='') & Q(link__isnull=False) & ~Q(link='')
-                    )
-                case _:
-                    pass
-
-        if late == 'false':
-            bills = bills.filter(late=False)
-
-        if paid == 'false':
-            bills = bills.filter(paid=False)
-
-        if pending == 'false':
-            bills = bills.filter(Q(paid=True, late=False) | Q(paid=False, late=True))
-
-        if min_value:
-            bills = bills.filter(total__gte=min_value)
-
-        if max_value:
-            bills = bills.filter(total__lte=max_value)
-
-        if installments != 'all':
-            if installments == 'true':
-                bills = bills.filter(installments_number__gte=1)
-            else:
-                bills = bills.filter(installments_number__lt=1)
-
-    return bills
+    return bills.filter(bill_query(parse_filters(filters)))
 
 
 #############################################################
@@ -139,7 +44,6 @@ def home(request, order_by=None):
     paginator, offices = get_paginated_offices(request, order_by=order_by)
 
     context = {
-        'user_profile': Profile.objects.get(user=request.user),
         'offices': offices,
         'segment': 'administrative',
     }
@@ -184,8 +88,6 @@ def details(request, slug):
     if not request.user.has_perm('home.change_office'):
         return render(request, 'home/page-404.html')
 
-    check_expired_documents()
-
     office = Office.objects.get(slug=slug)
 
     query = Q(office=office) & (Q(paid=True) | Q(installments__paid=True))
@@ -233,7 +135,6 @@ def details(request, slug):
     context = {
         'currency': 'BRL',  # TODO: Change to currency variable when implemented
         'office': office,
-        'user_profile': Profile.objects.get(user=request.user),
         'segment': 'offices',
         'collaborators': Profile.objects.filter(user__username__endswith='@infinitefoundry.com').exclude(
             user__username__startswith='admin').exclude(user__username__startswith='hub'),
@@ -246,7 +147,7 @@ def details(request, slug):
         'last_month_balance': last_month_balance,
         'last_month_balance_percentage': round(last_month_percentage, 1),
         'clients': Client.objects.all(),
-        'banks': BANKS.items(),
+        'banks': banks().items(),
     }
 
     return render(request, 'home/offices/details.html', context)
@@ -286,8 +187,6 @@ def balance(request, slug, sorted_by=None, sort_type=None, filters=None):
     if not request.user.has_perm('home.add_bill'):
         return render(request, 'home/page-404.html')
 
-    check_late_bills()
-
     office = Office.objects.get(slug=slug)
     bills = filter_bill_objects(filters, Bill.objects.filter(office=office))
 
@@ -326,10 +225,11 @@ def balance(request, slug, sorted_by=None, sort_type=None, filters=None):
             due_date__lte=datetime.now().date()) if not installment.paid
     ]) if bill.late and bill.installments_number > 1 else bill.total if bill.late else 0 for bill in expense_bills])
 
+    min_value, max_value = queryset_bounds(bills)
+
     context = {
         'office': office,
         'bills': bills,
-        'user_profile': Profile.objects.get(user=request.user),
         'segment': 'offices',
         'income_categories': INCOME_CATEGORIES,
         'expense_categories': EXPENSE_CATEGORIES,
@@ -345,8 +245,8 @@ def balance(request, slug, sorted_by=None, sort_type=None, filters=None):
         'sorted_by': sorted_by,
         'sort_type': sort_type,
         'filters': filters,
-        'min_value': str(bills.order_by('total').first().total)[2:].replace(',', '') if bills.count() > 0 else 0,
-        'max_value': str(bills.order_by('-total').first().total)[2:].replace(',', '') if bills.count() > 0 else 0,
+        'min_value': min_value,
+        'max_value': max_value,
     }
 
     return render(request, 'home/offices/balance.html', context)
@@ -354,10 +254,7 @@ def balance(request, slug, sorted_by=None, sort_type=None, filters=None):
 
 def new_bill(request, slug):
     if not request.user.has_perm('home.add_bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     if request.method == 'POST':
         currency = request.POST.get('currency', 'USD')
@@ -393,32 +290,23 @@ def new_bill(request, slug):
         if 'reconciled' in status:
             bill.reconciled = True
 
-        bill.save()
-
-        if int(request.POST.get('installments', 1)) > 1 and request.POST.get('installments_value'):
-            installments = request.POST.get('installments')
-            installments_value = unmask_money(request.POST.get('installments_value', ''), currency)
-            bill.installments_frequency = request.POST.get('installments_frequency', 0)
-            if bill.installments_frequency == '':
-                bill.installments_frequency = 0
+        with bill_batch():
+            bill.save()
 
-            for i in range(1, int(installments) + 1):
-                installment = BillInstallment(
-                    bill=bill,
-                    partial_id=i,
-                    value=installments_value,
-                    due_date=datetime.strptime(
-                        str(bill.due_date), "%Y-%m-%d"
-                    ) + timedelta(days=int(bill.installments_frequency) * (i - 1)) if bill.due_date else None,
-                )
-                installment.save()
+            if int(request.POST.get('installments', 1)) > 1 and request.POST.get('installments_value'):
+                installments = request.POST.get('installments')
+                installments_value = unmask_money(request.POST.get('installments_value', ''), currency)
+                bill.installments_frequency = request.POST.get('installments_frequency', 0)
+                if bill.installments_frequency == '':
+                    bill.installments_frequency = 0
 
-            bill.save()
+                create_installments(bill, installments, installments_value, bill.due_date, bill.installments_frequency)
+                bill.save()
 
-        else:
-            bill.installments_number = 0
-            bill.installments_frequency = 0
-            bill.save()
+            else:
+                bill.installments_number = 0
+                bill.installments_frequency = 0
+                bill.save()
 
         sorted_by = request.POST['sort_by'] if request.POST.get('sort_by', False) else ''
         sort_type = request.POST.get('sort_type', None) if request.POST.get('sort_type', None) != 'None' else None
@@ -439,10 +327,7 @@ def new_bill(request, slug):
 
 def delete_bill(request, slug, bill_id):
     if not request.user.has_perm('home.delete_bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     Bill.objects.get(id=bill_id).delete()
 
@@ -466,10 +351,7 @@ def delete_bill(request, slug, bill_id):
 
 def edit_bill(request, slug, bill_id):
     if not request.user.has_perm('home.change_bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     bill = Bill.objects.get(id=bill_id)
     if request.method == 'POST':
@@ -511,40 +393,33 @@ def edit_bill(request, slug, bill_id):
             installments_value_from_form > 0,
         ]
 
-        if all(freq_change) and bill.due_date is not None:
-            bill.installments_frequency = installments_frequency_from_form
-            for installment in bill.installments.all():
-                installment.due_date = datetime.strptime(
-                    str(bill.due_date), "%Y-%m-%d"
-                ) + timedelta(days=int(installments_frequency_from_form) * (installment.partial_id - 1))
-                installment.save()
-
-        if all(num_change):
-            installments = BillInstallment.objects.filter(bill=bill)
-            installments.delete()
-            bill.installments_number = installments_number_from_form
-            for i in range(1, installments_number_from_form + 1):
-                installment = BillInstallment(
-                    bill=bill,
-                    partial_id=i,
-                    value=installments_value_from_form,
-                    due_date=datetime.strptime(
+        with bill_batch():
+            if all(freq_change) and bill.due_date is not None:
+                bill.installments_frequency = installments_frequency_from_form
+                for installment in bill.installments.all():
+                    installment.due_date = datetime.strptime(
                         str(bill.due_date), "%Y-%m-%d"
-                    ) + timedelta(days=int(bill.installments_frequency) * (i - 1)) if bill.due_date else None,
-                )
-                installment.save()
-
-        elif num_change[0] and not num_change[1]:
-            installments = BillInstallment.objects.filter(bill=bill)
-            installments.delete()
-            bill.installments_number = 0
-            bill.installments_frequency = 0
-
-        elif not num_change[0] and all(val_change):
-            installments = BillInstallment.objects.filter(bill=bill)
-            for installment in installments:
-                installment.value = installments_value_from_form
-                installment.save()
+                    ) + timedelta(days=int(installments_frequency_from_form) * (installment.partial_id - 1))
+                    installment.save()
+
+            if all(num_change):
+                installments = BillInstallment.objects.filter(bill=bill)
+                installments.delete()
+                bill.installments_number = installments_number_from_form
+                create_installments(bill, installments_number_from_form, installments_value_from_form,
+                                    bill.due_date, bill.installments_frequency)
+
+            elif num_change[0] and not num_change[1]:
+                installments = BillInstallment.objects.filter(bill=bill)
+                installments.delete()
+                bill.installments_number = 0
+                bill.installments_frequency = 0
+
+            elif not num_change[0] and all(val_change):
+                installments = BillInstallment.objects.filter(bill=bill)
+                for installment in installments:
+                    installment.value = installments_value_from_form
+                    installment.save()
 
         if request.FILES.get('proof') and request.FILES.get('proof') != bill.proof and bill.proof:
             file = bill.proof
@@ -575,17 +450,11 @@ def edit_bill(request, slug, bill_id):
 
 def download_bill(request, slug, bill_id):
     if not request.user.has_perm('home.view_bill'):
-        context = {
-            'user_profile': Profile.objects.get(user=request.user),
-        }
-        return render(request, 'home/page-404.html', context)
+        return render(request, 'home/page-404.html')
 
     bill = Bill.objects.get(id=bill_id)
     file_name = bill.proof.name
-    file_content = default_storage.open(file_name).read()
-    response = HttpResponse(file_content, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{file_name.split("/")[-1]}"'
-    return response
+    return download_response(request, file_name)
 
 
 def change_status(request, slug, bill_id):
@@ -600,19 +469,13 @@ def change_status(request, slug, bill_id):
         bill.payment_info = request.POST.get('payment_info', '')
         bill.paid = True
         if bill.installments_number > 1:
-            for installment in bill.installments.filter(paid=False):
-                installment.paid = True
-                installment.paid_at = bill.paid_at
-                installment.save()
+            set_installments_paid(bill, bill.installments.all(), True, bill.paid_at)
 
     else:
         bill.paid = False
         bill.payment_info = ''
         if bill.installments_number > 1:
-            for installment in bill.installments.filter(paid=True, paid_at=bill.paid_at):
-                installment.paid = False
-                installment.paid_at = None
-                installment.save()
+            set_installments_paid(bill, bill.installments.filter(paid_at=bill.paid_at), False)
 
         bill.paid_at = None
 
@@ -656,14 +519,7 @@ def sort_and_filter_bills(request, slug):
 
 
 def filter_bills(request, slug):
-    universal_min_value = str(Bill.objects.all().order_by('total').first().total).replace(
-        '$' if request.POST.get('currency', 'BRL') == 'USD' else 'R$' if request.POST.get('currency',
-                                                                                          'BRL') == 'BRL' else '€',
-        '').replace(',', '') if Bill.objects.all().count() > 0 else 0
-    universal_max_value = str(Bill.objects.all().order_by('-total').first().total).replace(
-        '$' if request.POST.get('currency', 'BRL') == 'USD' else 'R$' if request.POST.get('currency',
-                                                                                          'BRL') == 'BRL' else '€',
-        '').replace(',', '') if Bill.objects.all().count() > 0 else 0
+    universal_min_value, universal_max_value = map(str, bill_bounds(request.POST.get('currency', 'BRL')))
 
     payer = request.POST['payer']
     office = request.POST['office']
@@ -739,24 +595,24 @@ def installment_change_status(request, slug, bill_id, installment_id):
 
     current.paid = not current.paid
     current.payment_info = request.POST.get('installment_info', current.payment_info)
-    current.save()
 
-    installments = BillInstallment.objects.filter(bill__id=bill_id).order_by('due_date')
-    unpaid = installments.filter(paid=False)
+    with bill_batch():
+        current.save()
 
-    if unpaid.count() > 0:
-        current.bill.due_date = unpaid[0].due_date
-        if current.bill.paid:
-            current.bill.paid = False
-            current.bill.paid_at = current.paid_at
-            current.bill.save()
+        installments = BillInstallment.objects.filter(bill__id=bill_id).order_by('due_date')
+        unpaid = installments.filter(paid=False)
 
-    else:
-        current.bill.paid = True
-        current.bill.paid_at = installments.last().paid_at
-        current.bill.save()
+        if unpaid.count() > 0:
+            current.bill.due_date = unpaid[0].due_date
+            if current.bill.paid:
+                current.bill.paid = False
+                current.bill.paid_at = current.paid_at
 
-    current.bill.save()
+        else:
+            current.bill.paid = True
+            current.bill.paid_at = installments.last().paid_at
+
+        current.bill.save()
 
     if request.POST.get('office_page', False):
         return redirect('office_details', slug=slug)
@@ -783,9 +639,7 @@ def installment_edit(request, slug, bill_id, installment_id):
     currency = request.POST.get('currency', 'BRL')
 
     current = BillInstallment.objects.get(id=installment_id)
-    bill = Bill.objects.get(id=bill_id)
 
-    prev_installment_value = current.value if current.value else 0
     new_installment_value = unmask_money(request.POST.get('installment_value', 0), currency)
     due_date = request.POST.get('installment_due_date', current.due_date)
     installment_payment_info = request.POST.get('installment_info', current.payment_info)
@@ -795,10 +649,7 @@ def installment_edit(request, slug, bill_id, installment_id):
     current.payment_info = installment_payment_info
     current.save()
 
-    if prev_installment_value != new_installment_value:
-        bill.total -= prev_installment_value
-        bill.total += Money(new_installment_value, currency=bill.total.currency)
-        bill.save()
+    bill = Bill.objects.get(id=bill_id)
 
     if current.due_date is None:
         try:
@@ -836,13 +687,6 @@ def installment_delete(request, slug, bill_id, installment_id):
         return render(request, 'home/page-404.html')
 
     installment = BillInstallment.objects.get(id=installment_id)
-
-    installment.bill.total -= installment.value
-    installment.bill.installments_number -= 1
-    installment.bill.due_date = installment.bill.installments.filter(paid=False).order_by('due_date').first().due_date
-    if installment.paid:
-        installment.bill.partial -= installment.value
-
     installment.delete()
 
     if installment.bill.installments_number == 1:
@@ -856,9 +700,10 @@ def installment_delete(request, slug, bill_id, installment_id):
 
     installment.bill.save()
 
-    for i, installment in enumerate(BillInstallment.objects.filter(bill__id=bill_id).order_by('due_date')):
+    installments = list(BillInstallment.objects.filter(bill__id=bill_id).order_by('due_date'))
+    for i, installment in enumerate(installments):
         installment.partial_id = i + 1
-        installment.save()
+    BillInstallment.objects.bulk_update(installments, ['partial_id'])
 
     sorted_by = request.POST['sort_by'] if request.POST.get('sort_by', False) else ''
     sort_type = request.POST.get('sort_type', None) if request.POST.get('sort_type', None) != 'None' else None
@@ -882,8 +727,6 @@ def documents(request, slug, sorted_by=None, sort_type=None, filters=None):
     if not request.user.has_perm('home.add_document'):
         return render(request, 'home/page-404.html')
 
-    check_expired_documents()
-
     office = Office.objects.get(slug=slug)
     documents = filter_documents_objects(filters, slug)[0]
 
@@ -894,7 +737,6 @@ def documents(request, slug, sorted_by=None, sort_type=None, filters=None):
 
     context = {
         'office': office,
-        'user_profile': Profile.objects.get(user=request.user),
         'segment': 'offices',
         'documents': documents,
         'filters': filters,
@@ -953,10 +795,7 @@ def download_document(request, slug, document_id):
     document = get_object_or_404(Document, id=document_id)
 
     document_name = document.file.name
-    file_content = default_storage.open(document_name).read()
-    response = HttpResponse(file_content, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{document_name.split("/")[-1]}"'
-    return response
+    return download_response(request, document_name)
 
 
 def sort_and_filter_documents(request, slug):
@@ -976,35 +815,9 @@ def sort_and_filter_documents(request, slug):
 
 
 def filter_documents_objects(filters, slug):
-    documents = Document.objects.filter(office=Office.objects.get(slug=slug))
-
-    if filters is not None:
-        filters_list = filters.split('&')
-
-        category, regional = 'all', 'all'
-        from_date, to_date = False, False
-
-        for item in filters_list:
-            from_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('from') else from_date
-            to_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('to') else to_date
-            category = item.split('=')[1] if item.startswith('category') else category
-            regional = item.split('=')[1] if item.startswith('regional') else regional
-
-            if from_date and to_date and from_date < to_date:
-                documents = documents.filter(expiration__gte=from_date)
-                documents = documents.filter(expiration__lte=to_date)
-            elif from_date:
-                documents = documents.filter(expiration__gte=from_date)
-            elif to_date:
-                documents = documents.filter(expiration__lte=to_date)
-
-            if category != 'all':
-                documents = documents.filter(category=category)
-
-            if regional != 'all':
-                documents = documents.filter(branch__id=regional)
+    documents = Document.objects.filter(office__slug=slug).filter(document_query(parse_filters(filters)))
 
-    return documents, documents.order_by('-id').first().id if documents.count() > 0 else 0
+    return documents, documents.aggregate(max_id=Max('id'))['max_id'] or 0
 
 
 def filter_documents(request, slug):
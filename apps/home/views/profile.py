@@ -1,14 +1,12 @@
 import datetime
 import os
-import json
-from core.settings import CORE_DIR
 from django.contrib import messages
-from django.http import HttpResponse
 from django.contrib.auth.models import User
 from django.shortcuts import render, redirect
-from django.core.files.storage import default_storage
 from apps.home.models import Profile, Task, Office, Document, UploadedFile
 from django.db.models import Q
+from apps.home.downloads import download_response
+from apps.home.lookups import world
 
 
 def details(request):
@@ -29,7 +27,6 @@ def details(request):
 
     context = {
         'tasks_count': all_tasks.count(),
-        'user_profile': Profile.objects.get(user=user),
         'shared_documents': shared_documents,
         'tasks': sorted(tasks_to_do, key=lambda x: x.deadline if x.deadline else datetime.date.max),
         'projects': reversed(sorted(projects_to_do, key=lambda x: x.completition)),
@@ -98,7 +95,7 @@ def edit(request):
         user_profile = Profile.objects.get(user=request.user)
 
         context = {
-            "world": json.load(open(f'{CORE_DIR}/apps/static/assets/world.json', 'r', encoding='utf-8')),
+            "world": world(),
             "offices": Office.objects.all(),
             "user": user_profile,
             "edit_profile": True,
@@ -109,11 +106,6 @@ def edit(request):
 
 def delete_file(request, file_id):
     uploaded_file = UploadedFile.objects.get(id=file_id)
-    file_path = uploaded_file.file
-    file_path.delete(save=False)
-    uploaded_file.value = 0
-    uploaded_file.save()
-
     uploaded_file.delete()
 
     return redirect('profile')
@@ -126,10 +118,7 @@ def download_qrcode(request):
 
     if qrcode:
         file_name = qrcode.name
-        file_content = default_storage.open(file_name).read()
-        response = HttpResponse(file_content, content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{file_name.split("/")[-1]}"'
-        return response
+        return download_response(request, file_name)
     else:
         messages.error(request, 'QR Code not found.')
 
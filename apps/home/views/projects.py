@@ -1,14 +1,22 @@
 from datetime import datetime
-from django.db.models import Q
+from django.db.models import Q, Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from urllib.parse import urlencode
 from django.core.paginator import Paginator
 from django.contrib.auth.models import User
-from django.http import HttpResponse, JsonResponse
-from django.core.files.storage import default_storage
-from django.views.decorators.http import require_POST
+from django.db import transaction
+from django.http import JsonResponse, HttpResponse
+from django.views.decorators.http import require_POST, require_http_methods
 from django.shortcuts import render, redirect, get_object_or_404
-from apps.home.models import Project, UploadedFile, Profile, Task, Client, Link, SubTask
+from apps.home.models import Project, UploadedFile, UploadSession, Profile, Task, Client, Link, SubTask
+from apps.home.filter_spec import parse_filters, date_range_query
+from apps.home.downloads import download_response
+from apps.home.progress import complete_subtasks
+from apps.home.pickers import client_picker, collaborator_picker
+from apps.home.uploads import (UploadError, UPLOAD_CHUNK_SIZE, create_session, write_chunk, finish_session,
+                               abort_session)
+from apps.tasks import verify_upload_celery
 
 
 def change_archive(request, slug, situation_page=None):
@@ -121,6 +129,17 @@ def change_project_status(request, slug, situation_page=None):
             return redirect('project_list', situation=situation_page)
 
 
+def with_card_relations(projects):
+    # Everything a project card shows, in a fixed number of queries per page. The collaborator count is a
+    # subquery so a collaborators filter on the same join cannot change it.
+    assigned = Project.assigned_to.through.objects.filter(project=OuterRef('pk')).values('project').annotate(
+        count=Count('pk')).values('count')
+
+    return projects.select_related('client', 'client_branch').prefetch_related(
+        Prefetch('assigned_to', queryset=User.objects.select_related('profile'))
+    ).annotate(assigned_count=Coalesce(Subquery(assigned), 0))
+
+
 def get_paginated_projects(request, projects=None, situation=None, sorted_by=None, sort_type=None, page=None):
     if projects is None:
         projects_list = Project.objects.all()
@@ -134,6 +153,8 @@ def get_paginated_projects(request, projects=None, situation=None, sorted_by=Non
     elif situation == 'finished':
         projects_list = projects_list.filter(finished=True)
 
+    projects_list = with_card_relations(projects_list)
+
     if sorted_by is not None and sorted_by == 'client':
         projects_list = projects_list.order_by(f'{"-" if sort_type == "desc" else ""}client__name')
     elif sorted_by is not None and sorted_by == 'performance':
@@ -159,7 +180,6 @@ def client_branches(request):
 
 
 def home(request, situation=None, filters=None, sorted_by=None, sort_type=None, page=None):
-    user_profile = Profile.objects.get(user=request.user)
     projects = filter_project_objects(filters)
 
     if situation is not None:
@@ -171,11 +191,9 @@ def home(request, situation=None, filters=None, sorted_by=None, sort_type=None,
 
     context = {
         'projects_list': projects,
-        'user_profile': user_profile,
         'situation': situation,
-        'clients': sorted(Client.objects.all(), key=lambda x: x.name),
-        'collaborators': Profile.objects.filter(user__username__endswith='@infinitefoundry.com').exclude(
-            user__username__startswith='admin@'),
+        'clients': client_picker(),
+        'collaborators': collaborator_picker(),
         'segment': 'projects',
         'sorted_by': sorted_by,
         'sort_type': sort_type,
@@ -233,12 +251,9 @@ def create_project(request):
 
         project_id = request.GET.get('id')
 
-        user_profile = Profile.objects.get(user=request.user)
-
         request_project = Project.objects.get(id=project_id)
 
-        return render(request, 'home/projects/details.html', {'project': request_project,
-                                                     'user_profile': user_profile})
+        return render(request, 'home/projects/details.html', {'project': request_project})
 
     # Handle GET request or invalid form submission
     return render(request, 'home/page-404.html')
@@ -339,72 +354,49 @@ def sort_and_filter_projects(request):
         return redirect('project_list')
 
 
+def situation_query(archive, working, finished):
+    if archive == 'on' and working == 'off' and finished == 'off':
+        return Q(archive=True)
+    elif archive == 'on' and working == 'off':
+        return Q(working=False)
+    elif archive == 'on' and finished == 'off':
+        return Q(archive=True) | Q(working=True)
+    elif working == 'off':
+        return Q(working=False, archive=False)
+    elif finished == 'off':
+        return Q(finished=False, archive=False)
+    elif archive == 'on':
+        return Q()
+
+    return Q(archive=False)
+
+
 def filter_project_objects(filters):
-    projects = Project.objects.all()
-    if filters is not None:
-        filters_list = filters.split('&')
-
-        client, country, schedule = 'all', 'all', 'all'
-        from_date, to_date = False, False
-        archive, working, finished = True, True, True
-        collaborators = None
-
-        for item in filters_list:
-            from_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('from') else from_date
-            to_date = datetime.strptime(item.split('=')[1], '%Y-%m-%d') if item.startswith('to') else to_date
-            client = item.split('=')[1] if item.startswith('client') else client
-            country = item.split('=')[1] if item.startswith('country') else country
-            schedule = item.split('=')[1] if item.startswith('schedule') else schedule
-            collaborators = item.split('=')[1] if item.startswith('collaborators') else collaborators
-            archive = item.split('=')[1] if item.startswith('archive') else archive
-            working = item.split('=')[1] if item.startswith('working') else working
-            finished = item.split('=')[1] if item.startswith('finished') else finished
-
-        if archive == 'on' and working == 'off' and finished == 'off':
-            filtered_projects = projects.filter(archive=True)
-        elif archive == 'on' and working == 'off':
-            filtered_projects = projects.filter(working=False)
-        elif archive == 'on' and finished == 'off':
-            filtered_projects = projects.filter(Q(archive=True) | Q(working=True))
-        elif working == 'off':
-            filtered_projects = projects.filter(working=False, archive=False)
-        elif finished == 'off':
-            filtered_projects = projects.filter(finished=False, archive=False)
-        elif archive == 'on':
-            filtered_projects = projects
-        else:
-            filtered_projects = projects.filter(archive=False)
+    spec = parse_filters(filters)
+    query = situation_query(spec.get('archive'), spec.get('working'), spec.get('finished'))
 
-        if from_date and to_date:
-            filtered_projects = filtered_projects.filter(deadline__gte=from_date, deadline__lte=to_date)
-        elif from_date:
-            filtered_projects = filtered_projects.filter(deadline__gte=from_date)
-        elif to_date:
-            filtered_projects = filtered_projects.filter(deadline__lte=to_date)
+    if spec:
+        query &= date_range_query(spec, 'deadline', ordered=False)
 
+        client = spec.get('client', 'all')
         if client != 'all':
-            filtered_projects = filtered_projects.filter(client=Client.objects.get(id=client))
+            query &= Q(client__id=client)
 
+        country = spec.get('country', 'all')
         if country != 'all':
-            filtered_projects = filtered_projects.filter(country=country)
+            query &= Q(country=country)
 
-        if schedule != 'all':
-            if schedule == 'late':
-                filtered_projects = filtered_projects.filter(deadline__lt=datetime.now(), finished=False)
-            elif schedule == 'ontime':
-                filtered_projects = filtered_projects.filter(deadline__gte=datetime.now())
+        schedule = spec.get('schedule', 'all')
+        if schedule == 'late':
+            query &= Q(deadline__lt=datetime.now(), finished=False)
+        elif schedule == 'ontime':
+            query &= Q(deadline__gte=datetime.now())
 
-        if collaborators is not None:
-            collaborators = collaborators.split('-')
-            query = Q()
-            for collaborator_id in collaborators:
-                collaborator_user = User.objects.get(id=collaborator_id)
-                query |= Q(assigned_to=collaborator_user)
+    filtered_projects = Project.objects.filter(query)
 
-            filtered_projects = filtered_projects.filter(query).distinct().order_by('id')
-
-    else:
-        filtered_projects = projects.filter(archive=False)
+    if spec.has('collaborators'):
+        filtered_projects = filtered_projects.filter(
+            assigned_to__id__in=spec.ids('collaborators')).distinct().order_by('id')
 
     return filtered_projects
 
@@ -491,7 +483,6 @@ def filter_projects(request):
 def details(request, slug):
     project = Project.objects.get(slug=slug)
 
-    user_profile = Profile.objects.get(user=request.user)
     tasks = sorted(
         Task.objects.filter(project=project), key=lambda x: x.deadline if x.deadline else datetime.max.date()
     )
@@ -505,7 +496,6 @@ def details(request, slug):
 
     context = {
         'project': project,
-        'user_profile': user_profile,
         'tasks': tasks,
         'collaborators': Profile.objects.filter(user__username__endswith='@infinitefoundry.com').exclude(
             user__username__startswith='admin'),
@@ -559,6 +549,28 @@ def edit(request, slug):
 #####################################################
 
 
+UPLOAD_DETAILS = ['file_description', 'file_value', 'file_type', 'file_custom_name']
+
+
+def apply_file_details(uploaded_file, data):
+    uploaded_file.description = data.get('file_description', '')
+
+    masked_value = data.get('file_value', 'USD 0.00')
+    masked_value = masked_value.replace('USD ', '')
+    masked_value = masked_value.replace(',', '')
+
+    uploaded_file.value = masked_value if masked_value != '' else 0
+
+    input_category = data.get('file_type', 'none')
+
+    if input_category != 'none':
+        uploaded_file.category = input_category
+    else:
+        uploaded_file.category = uploaded_file.fileCategory() or 'others'
+
+    uploaded_file.custom_name = data.get('file_custom_name', '')
+
+
 def upload_file(request, slug):
     project = Project.objects.get(slug=slug)
 
@@ -566,26 +578,11 @@ def upload_file(request, slug):
         file = request.FILES['file']
 
         uploaded_file = UploadedFile.objects.create(project=project, file=file)
-        uploaded_file.description = request.POST.get('file_description', '')
-
-        masked_value = request.POST.get('file_value', 'USD 0.00')
-        masked_value = masked_value.replace('USD ', '')
-        masked_value = masked_value.replace(',', '')
-
-        uploaded_file.value = masked_value if masked_value != '' else 0
-
-        input_category = request.POST.get('file_type')
-
-        if input_category != 'none':
-            uploaded_file.category = input_category
-        else:
-            uploaded_file.category = uploaded_file.fileCategory()
+        apply_file_details(uploaded_file, request.POST)
 
         uploaded_by = request.user
         uploaded_file.uploaded_by = uploaded_by
 
-        uploaded_file.custom_name = request.POST.get('file_custom_name', '')
-
         uploaded_file.save()
 
         return redirect('project_details', slug=project.slug)
@@ -593,13 +590,93 @@ def upload_file(request, slug):
     return redirect('project_details', slug=project.slug)
 
 
+# Resumable uploads (see apps.home.uploads): start, then PUT chunks with an Upload-Offset header (GET tells where to
+# resume after a dropped connection, DELETE aborts) and complete.
+
+def upload_session(request, slug, upload_id, lock=False):
+    sessions = UploadSession.objects.select_for_update() if lock else UploadSession.objects
+    return get_object_or_404(sessions, pk=upload_id, project__slug=slug, uploaded_by=request.user)
+
+
+def complete_session(session):
+    uploaded_file = finish_session(session)
+
+    apply_file_details(uploaded_file, session.metadata)
+    uploaded_file.save()
+    session.save()
+
+    if session.checksum and session.verified is None:
+        transaction.on_commit(lambda: verify_upload_celery.delay(str(session.id)))
+
+
+@require_POST
+def start_upload(request, slug):
+    project = get_object_or_404(Project, slug=slug)
+
+    try:
+        session = create_session(
+            project, request.user, request.POST['filename'], int(request.POST['size']),
+            checksum=request.POST.get('checksum', ''),
+            metadata={key: request.POST[key] for key in UPLOAD_DETAILS if key in request.POST},
+        )
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Invalid upload'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+
+    return JsonResponse({'id': str(session.id), 'offset': 0, 'chunk_size': UPLOAD_CHUNK_SIZE}, status=201)
+
+
+@require_http_methods(['GET', 'PUT', 'DELETE'])
+def upload_chunk(request, slug, upload_id):
+    if request.method == 'GET':
+        session = upload_session(request, slug, upload_id)
+        return JsonResponse({'id': str(session.id), 'offset': session.received, 'size': session.size,
+                             'chunk_size': UPLOAD_CHUNK_SIZE, 'completed': session.completed})
+
+    if request.method == 'DELETE':
+        with transaction.atomic():
+            abort_session(upload_session(request, slug, upload_id, lock=True))
+        return HttpResponse(status=204)
+
+    # The chunk is received and stored outside any transaction, the session is only locked to record it
+    session = upload_session(request, slug, upload_id)
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Missing Upload-Offset or Content-Length'}, status=400)
+
+    try:
+        received = write_chunk(session, offset, request, length, request.headers.get('X-Chunk-SHA256'))
+    except UploadError as e:
+        if e.status == 409:
+            # Another request moved the offset; the client resumes from the current one
+            session.refresh_from_db(fields=['received'])
+        return JsonResponse({'error': str(e), 'offset': session.received}, status=e.status)
+
+    return JsonResponse({'offset': received})
+
+
+@require_POST
+def complete_upload(request, slug, upload_id):
+    with transaction.atomic():
+        session = upload_session(request, slug, upload_id, lock=True)
+
+        if not session.completed:
+            try:
+                complete_session(session)
+            except UploadError as e:
+                return JsonResponse({'error': str(e), 'offset': session.received}, status=e.status)
+
+    return JsonResponse({'file': session.uploaded_file_id,
+                         'redirect': reverse('project_details', kwargs={'slug': slug})})
+
+
 @require_POST
 def delete_file(request, slug, file_id):
     uploaded_file = get_object_or_404(UploadedFile, pk=file_id)
-    file_path = uploaded_file.file
-    file_path.delete(save=False)
-    uploaded_file.value = 0
-    uploaded_file.save()
     uploaded_file.delete()
 
     return redirect('project_details', slug=slug)
@@ -608,10 +685,7 @@ def delete_file(request, slug, file_id):
 def download_file(request, file_id):
     uploaded_file = get_object_or_404(UploadedFile, pk=file_id)
     file_name = uploaded_file.file.name
-    file_content = default_storage.open(file_name).read()
-    response = HttpResponse(file_content, content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{file_name.split("/")[-1]}"'
-    return response
+    return download_response(request, file_name)
 
 
 #####################################################
@@ -643,7 +717,6 @@ def submit_task(request, slug):
 def delete_task(request, slug, task_id):
     task = Task.objects.get(id=task_id, project__slug=slug)
     task.delete()
-    task.project.save(update_tasks=True)
 
     return redirect('project_details', slug=slug)
 
@@ -677,9 +750,7 @@ def change_task_status(request, slug, task_id):
             task.completed = True
             task.completed_by = request.user
             task.completed_at = datetime.now()
-            task.subtasks.filter(completed=False).update(
-                completed=True, completed_by=request.user, completed_at=datetime.now()
-            )
+            complete_subtasks(task, request.user)
 
         task.save()
 
@@ -719,7 +790,6 @@ def submit_subtask(request, slug, task_id):
 def delete_subtask(request, slug, task_id, subtask_id):
     subtask = SubTask.objects.get(id=subtask_id, task__id=task_id)
     subtask.delete()
-    subtask.task.project.save(update_tasks=True)
 
     return redirect('project_details', slug=slug)
 
@@ -0,0 +1,23 @@
+from django.http import JsonResponse
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from apps.home.search import SearchResults
+
+SEARCH_PAGE_SIZE = 20
+
+
+def search(request):
+    query = request.GET.get('q', '')
+    results = SearchResults(query, request.GET.getlist('kind'))
+
+    paginator = Paginator(results, SEARCH_PAGE_SIZE)
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+
+    return JsonResponse({
+        'query': query, 'page': page.number, 'pages': paginator.num_pages, 'count': paginator.count,
+        'results': list(page.object_list),
+    })
@@ -0,0 +1,161 @@
+// Resumable chunked uploads for forms with a data-chunked-upload attribute (the start URL).
+// The session id is kept in localStorage, so choosing the same file again after a dropped connection or a
+// reload resumes from the last offset the server acknowledged.
+
+(function () {
+    const RETRIES = 5;
+    // SubtleCrypto hashes a whole buffer at once: larger files are only verified chunk by chunk
+    const CHECKSUM_LIMIT = 256 * 1024 * 1024;
+
+    function csrfToken(form) {
+        return form.querySelector('[name=csrfmiddlewaretoken]').value;
+    }
+
+    function storageKey(form, file) {
+        return 'upload:' + form.dataset.chunkedUpload + ':' + file.name + ':' + file.size + ':' + file.lastModified;
+    }
+
+    async function sha256(blob) {
+        if (!window.crypto || !window.crypto.subtle) {
+            return null;
+        }
+
+        const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    function sleep(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function request(url, options) {
+        for (let attempt = 0; ; attempt++) {
+            try {
+                const response = await fetch(url, options);
+                if (response.status < 500 || attempt >= RETRIES) {
+                    return response;
+                }
+            } catch (error) {
+                if (attempt >= RETRIES) {
+                    throw error;
+                }
+            }
+            await sleep(1000 * 2 ** attempt);
+        }
+    }
+
+    function forgetExpired(form, file, response) {
+        // An expired or aborted session can't be resumed, the next attempt starts a new one
+        if (response.status === 404 || response.status === 410) {
+            localStorage.removeItem(storageKey(form, file));
+        }
+    }
+
+    async function openSession(form, file) {
+        const key = storageKey(form, file);
+        const stored = localStorage.getItem(key);
+
+        if (stored) {
+            const response = await request(stored, {credentials: 'same-origin'});
+            if (response.ok) {
+                const status = await response.json();
+                if (!status.completed) {
+                    return {url: stored, offset: status.offset, chunkSize: status.chunk_size};
+                }
+            }
+            localStorage.removeItem(key);
+        }
+
+        const data = new FormData();
+        data.append('filename', file.name);
+        data.append('size', file.size);
+
+        // Lets the server check the assembled file
+        const checksum = file.size <= CHECKSUM_LIMIT ? await sha256(file) : null;
+        if (checksum) {
+            data.append('checksum', checksum);
+        }
+        form.querySelectorAll('[name^=file_]').forEach(input => data.append(input.name, input.value));
+
+        const response = await request(form.dataset.chunkedUpload, {
+            method: 'POST', body: data, credentials: 'same-origin', headers: {'X-CSRFToken': csrfToken(form)},
+        });
+        if (!response.ok) {
+            throw new Error((await response.json()).error);
+        }
+
+        const session = await response.json();
+        const url = form.dataset.chunkedUpload + '/' + session.id;
+        localStorage.setItem(key, url);
+
+        return {url: url, offset: session.offset, chunkSize: session.chunk_size};
+    }
+
+    async function upload(form, file, progress) {
+        const session = await openSession(form, file);
+        let offset = session.offset;
+
+        while (offset < file.size) {
+            const chunk = file.slice(offset, offset + session.chunkSize);
+            const headers = {'X-CSRFToken': csrfToken(form), 'Upload-Offset': offset};
+
+            const checksum = await sha256(chunk);
+            if (checksum) {
+                headers['X-Chunk-SHA256'] = checksum;
+            }
+
+            const response = await request(session.url, {
+                method: 'PUT', body: chunk, credentials: 'same-origin', headers: headers,
+            });
+            const result = await response.json();
+
+            if (response.ok || response.status === 409) {
+                offset = result.offset;
+                progress(offset / file.size);
+            } else {
+                forgetExpired(form, file, response);
+                throw new Error(result.error);
+            }
+        }
+
+        const response = await request(session.url + '/complete', {
+            method: 'POST', credentials: 'same-origin', headers: {'X-CSRFToken': csrfToken(form)},
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            forgetExpired(form, file, response);
+            throw new Error(result.error);
+        }
+
+        localStorage.removeItem(storageKey(form, file));
+        return result;
+    }
+
+    document.querySelectorAll('form[data-chunked-upload]').forEach(form => {
+        form.addEventListener('submit', async event => {
+            const file = form.querySelector('input[type=file]').files[0];
+            if (!file || !window.fetch) {
+                return;
+            }
+
+            event.preventDefault();
+            const button = document.querySelector('[type=submit][form="' + form.id + '"]');
+            const label = button ? button.innerHTML : '';
+
+            try {
+                const result = await upload(form, file, fraction => {
+                    if (button) {
+                        button.innerHTML = Math.floor(fraction * 100) + '%';
+                    }
+                });
+                window.location.href = result.redirect;
+            } catch (error) {
+                if (button) {
+                    button.innerHTML = label;
+                    button.removeAttribute('disabled');
+                }
+                alert('Upload interrupted, select the same file again to resume. ' + (error.message || ''));
+            }
+        });
+    });
+})();
@@ -3,6 +3,11 @@ from datetime import datetime
 from celery import shared_task
 from core.settings import EMAIL_HOST_USER
 from django.core.mail import send_mail
+from apps.home.jobs import flag_late_bills, expire_documents
+from apps.home.favicons import resolve_favicon, apply_favicon
+from apps.home.qrcodes import refresh_equipment_qrcode, refresh_profile_qrcode
+from apps.home.uploads import verify_upload, expire_sessions
+from apps.api.inbox import process, record_failure, stale_deliveries, MAX_ATTEMPTS
 # TODO: Implement email templates
 
 
@@ -55,3 +60,65 @@ def reset_password_confirmation_email(self, username):
     email_from = EMAIL_HOST_USER
     to_email = [username]
     send_mail_celery.delay(subject, message, email_from, to_email)
+
+
+@shared_task(bind=True)
+def flag_late_bills_celery(self):
+    result = flag_late_bills()
+    return 'Skipped' if result is None else f'Done! {result}'
+
+
+@shared_task(bind=True)
+def expire_documents_celery(self):
+    result = expire_documents()
+    return 'Skipped' if result is None else f'Done! {result}'
+
+
+@shared_task(bind=True)
+def fetch_favicon_celery(self, url):
+    icon = resolve_favicon(url)
+    return f'Done! {apply_favicon(url, icon)} links'
+
+
+@shared_task(bind=True)
+def equipment_qrcode_celery(self, equipment_id, force=False):
+    return 'Done!' if refresh_equipment_qrcode(equipment_id, force) else 'Skipped'
+
+
+@shared_task(bind=True)
+def profile_qrcode_celery(self, profile_id, force=False):
+    return 'Done!' if refresh_profile_qrcode(profile_id, force) else 'Skipped'
+
+
+@shared_task(bind=True)
+def verify_upload_celery(self, session_id):
+    result = verify_upload(session_id)
+    return 'Skipped' if result is None else ('Done!' if result else 'Checksum mismatch, file removed')
+
+
+@shared_task(bind=True)
+def expire_upload_sessions_celery(self):
+    return f'Done! {expire_sessions()}'
+
+
+@shared_task(bind=True, max_retries=MAX_ATTEMPTS)
+def process_webhook_celery(self, delivery_id):
+    try:
+        meeting = process(delivery_id)
+    except Exception as e:
+        # The backoff follows the delivery's attempts, so requeued deliveries keep backing off
+        countdown = record_failure(delivery_id, e)
+        if countdown is not None:
+            raise self.retry(exc=e, countdown=countdown)
+        return f'Failed: {e}'
+
+    return 'Skipped' if meeting is None else f'Done! Meeting {meeting.id}'
+
+
+@shared_task(bind=True)
+def requeue_webhooks_celery(self):
+    deliveries = stale_deliveries()
+    for delivery_id in deliveries:
+        process_webhook_celery.delay(delivery_id)
+
+    return f'Done! {len(deliveries)}'
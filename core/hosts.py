@@ -0,0 +1,56 @@
+import os
+import time
+from decouple import config
+
+
+# Optional discovery of the server's public IP for ALLOWED_HOSTS. Off unless PUBLIC_IP_DISCOVERY is set, and the
+# answer is cached in a file, so starting a process (server, command, worker) never waits on the network.
+
+PUBLIC_IP_URL = 'https://api.ipify.org'
+
+
+def read_cache(path, ttl):
+    try:
+        fresh = time.time() - os.path.getmtime(path) < ttl
+        with open(path, encoding='utf-8') as file:
+            return file.read().strip(), fresh
+    except OSError:
+        return '', False
+
+
+def discover_public_ip(path, ttl, timeout):
+    cached, fresh = read_cache(path, ttl)
+    if fresh:
+        return cached
+
+    from urllib.request import urlopen
+
+    try:
+        with urlopen(PUBLIC_IP_URL, timeout=timeout) as response:
+            address = response.read().decode('utf-8').strip()
+    except (OSError, ValueError):
+        # Offline or slow: keep the last known address, if any
+        return cached
+
+    try:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(address)
+    except OSError:
+        pass
+
+    return address
+
+
+def public_hosts(cache_dir):
+    hosts = [host for host in config('PUBLIC_IP', default='').split(',') if host]
+
+    if config('PUBLIC_IP_DISCOVERY', default=False, cast=bool):
+        address = discover_public_ip(
+            config('PUBLIC_IP_CACHE', default=os.path.join(cache_dir, '.public_ip')),
+            config('PUBLIC_IP_CACHE_TTL', default=24 * 60 * 60, cast=int),
+            config('PUBLIC_IP_TIMEOUT', default=2, cast=float),
+        )
+        if address:
+            hosts.append(address)
+
+    return hosts
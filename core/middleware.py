@@ -1,24 +1,50 @@
-from django.urls import resolve, reverse
+from django.urls import reverse
 from django.shortcuts import redirect
 from core.settings import DEBUG
 
+PUBLIC_VIEWS = ('apps.api.views', 'apps.members.views')
+AUTH_VIEWS = ('apps.authentication.views',)
+
 
 class SessionExpiredMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        # View module -> 'public', 'auth' or 'app'; URLs are resolved once by Django's handler
+        self.areas = {}
+
+    def area(self, view_func):
+        module = view_func.__module__
+        if module not in self.areas:
+            if module.startswith(PUBLIC_VIEWS):
+                self.areas[module] = 'public'
+            elif module.startswith(AUTH_VIEWS):
+                self.areas[module] = 'auth'
+            else:
+                self.areas[module] = 'app'
+
+        return self.areas[module]
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Anonymous requests are redirected before the view (and its queries) runs
+        if not DEBUG and not request.user.is_authenticated and self.area(view_func) == 'app':
+            return redirect(reverse('login'))
+
+        return None
 
     def __call__(self, request):
         response = self.get_response(request)
 
-        in_api = resolve(request.path).func.__module__.startswith('apps.api.views')
-        in_members = resolve(request.path).func.__module__.startswith('apps.members.views')
-        in_auth = resolve(request.path).func.__module__.startswith('apps.authentication.views')
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+
+        area = self.area(match.func)
 
-        if in_members or in_api:
+        if area == 'public':
             return response
-        elif not DEBUG and not request.user.is_authenticated and not in_auth:
+        elif not DEBUG and not request.user.is_authenticated and area != 'auth':
             return redirect(reverse('login'))
-        elif request.user.is_authenticated and in_auth:
+        elif request.user.is_authenticated and area == 'auth':
             return redirect(reverse('home'))
 
-        return response
\ No newline at end of file
+        return response
@@ -1,7 +1,7 @@
 import os
 from unipath import Path
-from requests import get
 from decouple import config
+from core.hosts import public_hosts
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = Path(__file__).parent
@@ -13,8 +13,8 @@ SECRET_KEY = config('SECRET_KEY', default='S#perS3crEt_1122')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=True, cast=bool)
 
-# load production server from .env
-ALLOWED_HOSTS = config('SERVER', default='127.0.0.1').split(',') + [get('https://api.ipify.org').content.decode('utf8')]
+# load production server from .env; the public IP can be set (PUBLIC_IP) or discovered (PUBLIC_IP_DISCOVERY)
+ALLOWED_HOSTS = config('SERVER', default='127.0.0.1').split(',') + public_hosts(CORE_DIR)
 
 # Static files S3 settings
 USE_S3 = config('S3', default=False, cast=bool)
@@ -63,6 +63,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.home.context_processors.user_profile',
             ],
         },
     },
@@ -129,6 +130,9 @@ if USE_S3:
     DEFAULT_FILE_STORAGE = 'apps.home.storage_backends.PublicMediaStorage'
     PRIVATE_MEDIA_LOCATION = 'private'
     PRIVATE_FILE_STORAGE = 'apps.home.storage_backends.PrivateMediaStorage'
+    # Redirect downloads to short-lived signed S3 URLs instead of streaming them through the app
+    PRESIGNED_DOWNLOADS = config('PRESIGNED_DOWNLOADS', default=False, cast=bool)
+    PRESIGNED_DOWNLOADS_EXPIRE = config('PRESIGNED_DOWNLOADS_EXPIRE', default=300, cast=int)
 else:
     MEDIA_URL = '/mediafiles/'
     MEDIA_ROOT = os.path.join(BASE_DIR, 'mediafiles')
@@ -149,11 +153,46 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='YOUR-SES-USERNAME')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='YOUR-SES-PASSWORD')
 #############################################################
 
+# Cache settings
+# Versioned entries (apps.home.pickers) are invalidated on model changes; with several workers use a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache), the local memory default only sees its own process
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='infinitehub'),
+    }
+}
+PICKERS_CACHE_TIMEOUT = config('PICKERS_CACHE_TIMEOUT', default=300, cast=int)
+PROFILE_CACHE_TIMEOUT = config('PROFILE_CACHE_TIMEOUT', default=60, cast=int)
+LOOKUPS_VERSION_TTL = config('LOOKUPS_VERSION_TTL', default=1, cast=float)
+#############################################################
+
 # Celery settings
 CELERY_BROKER_URL = config('BROKER_URL', default='amqp://guest@localhost:5672//')
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TASK_SERIALIZER = 'json'
+CELERY_IMPORTS = ['apps.tasks']
+
+# Hourly ticks; each job keeps a daily watermark, so it only writes once per day
+CELERY_BEAT_SCHEDULE = {
+    'flag-late-bills': {
+        'task': 'apps.tasks.flag_late_bills_celery',
+        'schedule': 60 * 60,
+    },
+    'expire-documents': {
+        'task': 'apps.tasks.expire_documents_celery',
+        'schedule': 60 * 60,
+    },
+    'expire-upload-sessions': {
+        'task': 'apps.tasks.expire_upload_sessions_celery',
+        'schedule': 60 * 60,
+    },
+    'requeue-webhooks': {
+        'task': 'apps.tasks.requeue_webhooks_celery',
+        'schedule': 10 * 60,
+    },
+}
 
 #############################################################
 